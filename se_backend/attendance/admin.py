@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import Attendance
+from .models import Attendance, AttendanceDayMetrics
 
-admin.site.register(Attendance)
\ No newline at end of file
+admin.site.register(Attendance)
+admin.site.register(AttendanceDayMetrics)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import csv
+import io
+import logging
+
+from django.db import transaction
+
+from .models import Attendance
+from .serializers import AttendanceImportSerializer
+from .tasks import schedule_recomputes_for_days
+from users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+IMPORT_UPDATE_FIELDS = ['status', 'check_in_time', 'check_out_time', 'manual_override']
+
+
+def read_csv_rows(file):
+    """Read an uploaded CSV file into a list of dicts keyed by its header row."""
+    return list(csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig')))
+
+
+def validate_import_rows(rows):
+    """
+    Validate many import rows at once.
+    Returns the valid rows as unsaved Attendance objects and the errors of the others, keyed by row index.
+    """
+    errors = []
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = AttendanceImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({"row": index, "errors": serializer.errors})
+
+    existing_users = set(
+        CustomUser.objects.filter(id__in={data['user'] for _, data in valid}).values_list('id', flat=True)
+    )
+
+    records = []
+    seen = set()
+    for index, data in valid:
+        key = (data['user'], data['date'])
+        if data['user'] not in existing_users:
+            errors.append({"row": index, "errors": {"user": [f"User {data['user']} does not exist."]}})
+        elif key in seen:
+            errors.append({"row": index, "errors": {"non_field_errors": ["Duplicate row for this user and date."]}})
+        else:
+            seen.add(key)
+            # Imported days are entered by hand, so replaying the punches must not overwrite them
+            records.append(Attendance(user_id=data['user'], manual_override=True, **{
+                field: value for field, value in data.items() if field != 'user'
+            }))
+
+    errors.sort(key=lambda error: error["row"])
+    return records, errors
+
+
+def import_attendance_rows(rows):
+    """
+    Upsert many attendance rows on (user, date) with one bulk statement, bypassing the per-row post_save recompute.
+    One summary recompute is queued per affected (user, period) once the import commits.
+    Returns the number of imported rows and the per-row errors of the rejected ones.
+    """
+    records, errors = validate_import_rows(rows)
+
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=IMPORT_UPDATE_FIELDS,
+        )
+
+        periods = schedule_recomputes_for_days((record.user_id, record.date) for record in records)
+
+    logger.info(f"[import_attendance_rows] Imported {len(records)} attendance rows, rejected {len(errors)}, "
+                f"queued {periods} summary recomputes")
+    return len(records), errors
@@ -0,0 +1,54 @@
+import time as timer
+from datetime import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from shared.computations.attendance_computations import compute_day_metrics, compute_day_metrics_batch
+
+
+def to_time(minutes):
+    return time(int(minutes) // 60, int(minutes) % 60)
+
+
+class Command(BaseCommand):
+    help = "Compare the scalar and vectorized attendance metric computations on synthetic attendance rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Number of synthetic attendance rows")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic rows")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        rng = np.random.default_rng(options["seed"])
+
+        shift_start = rng.choice([360, 480, 540, 600], size=rows)
+        expected_minutes = rng.choice([4, 8, 9], size=rows) * 60
+        check_in = np.clip(shift_start + rng.integers(-45, 90, size=rows), 0, 1439)
+        check_out = np.clip(check_in + rng.integers(0, 720, size=rows), 0, 1439)
+        is_special = rng.random(rows) < 0.03
+        is_regular = rng.random(rows) < 0.03
+
+        # The scalar path works on time objects, so convert outside of the timed section
+        scalar_rows = [
+            (to_time(check_in[i]), to_time(check_out[i]), to_time(shift_start[i]),
+             int(expected_minutes[i]) // 60, bool(is_special[i]), bool(is_regular[i]))
+            for i in range(rows)
+        ]
+
+        started = timer.perf_counter()
+        scalar = [compute_day_metrics(*row) for row in scalar_rows]
+        scalar_seconds = timer.perf_counter() - started
+
+        started = timer.perf_counter()
+        batch = compute_day_metrics_batch(check_in, check_out, shift_start, expected_minutes, is_special, is_regular)
+        batch_seconds = timer.perf_counter() - started
+
+        for field, column in batch.items():
+            if column.tolist() != [metrics[field] for metrics in scalar]:
+                raise CommandError(f"Vectorized {field} does not match the scalar computation")
+
+        self.stdout.write(f"rows:       {rows}")
+        self.stdout.write(f"scalar:     {scalar_seconds * 1000:.1f} ms")
+        self.stdout.write(f"vectorized: {batch_seconds * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"speedup:    {scalar_seconds / batch_seconds:.1f}x, results identical"))
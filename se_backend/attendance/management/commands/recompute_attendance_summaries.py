@@ -0,0 +1,87 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from attendance.services import get_scheduled_user_ids, recompute_summaries_for_users
+from attendance.tasks import recompute_attendance_summaries
+from shared.models import JobCheckpoint
+
+
+def recompute_chunk(args):
+    user_ids, start, end = args
+    return len(recompute_summaries_for_users(user_ids, start, end))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute AttendanceSummary and OvertimeHours for every user over the payroll periods "
+        "starting between --start and --end. Resumes from the last checkpoint unless --restart is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, type=date.fromisoformat, help="First period start (YYYY-MM-DD)")
+        parser.add_argument("--end", required=True, type=date.fromisoformat, help="Last period start (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=100, help="Users per chunk")
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes to spread the chunks over")
+        parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+        parser.add_argument("--celery", action="store_true", help="Dispatch the chunks as a Celery group instead")
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        chunk_size = options["chunk_size"]
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        if options["celery"]:
+            result = recompute_attendance_summaries.delay(start.isoformat(), end.isoformat(), chunk_size)
+            self.stdout.write(f"Dispatched recompute task {result.id}")
+            return
+
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=f"recompute_attendance_summaries:{start}:{end}")
+        if options["restart"] or checkpoint.completed:
+            checkpoint.position, checkpoint.processed, checkpoint.completed = {}, 0, False
+            checkpoint.save()
+
+        after_user_id = checkpoint.position.get("last_user_id")
+        user_ids = get_scheduled_user_ids(start, end, after_user_id=after_user_id)
+        if after_user_id is not None:
+            self.stdout.write(f"Resuming after user {after_user_id} ({checkpoint.processed} users already done)")
+
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        total = checkpoint.processed + len(user_ids)
+        started = time.monotonic()
+
+        jobs = [(chunk, start, end) for chunk in chunks]
+        if options["workers"] > 1:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=connections.close_all,
+            ) as executor:
+                self.run_chunks(checkpoint, chunks, executor.map(recompute_chunk, jobs), total, started)
+        else:
+            self.run_chunks(checkpoint, chunks, map(recompute_chunk, jobs), total, started)
+
+        checkpoint.completed = True
+        checkpoint.save(update_fields=["completed", "updated_at"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed summaries for {len(user_ids)} users in {time.monotonic() - started:.1f}s"
+        ))
+
+    def run_chunks(self, checkpoint, chunks, results, total, started):
+        # Results arrive in submission order, so the checkpoint only ever covers fully finished users
+        for chunk, summaries in zip(chunks, results):
+            checkpoint.position = {"last_user_id": chunk[-1]}
+            checkpoint.processed += len(chunk)
+            checkpoint.save(update_fields=["position", "processed", "updated_at"])
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"[{checkpoint.processed}/{total}] users done, {summaries} summaries in last chunk, {elapsed:.1f}s elapsed"
+            )
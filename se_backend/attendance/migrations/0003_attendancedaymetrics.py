@@ -0,0 +1,35 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0002_remove_attendance_biometric_data_id_attendance_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDayMetrics',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('period_start', models.DateField()),
+                ('actual_minutes', models.IntegerField(default=0)),
+                ('overtime_minutes', models.IntegerField(default=0)),
+                ('late_minutes', models.IntegerField(default=0)),
+                ('undertime_minutes', models.IntegerField(default=0)),
+                ('special_minutes', models.IntegerField(default=0)),
+                ('regular_minutes', models.IntegerField(default=0)),
+                ('attendance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='attendance.attendance')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'period_start'], name='attendance__user_id_e794a4_idx')],
+            },
+        ),
+    ]
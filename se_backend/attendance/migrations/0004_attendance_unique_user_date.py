@@ -0,0 +1,50 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancedaymetrics'),
+        ('attendance_summary', '0001_initial'),
+    ]
+
+    operations = [
+        # Days entered more than once keep their latest copy; summaries follow it and the copies' metrics are rebuilt
+        migrations.RunSQL(
+            sql="""
+                -- Check the foreign keys as rows go, so no deferred checks are pending when the table is altered
+                SET CONSTRAINTS ALL IMMEDIATE;
+
+                UPDATE attendance_summary_attendancesummary summary
+                SET attendance_id_id = copies.latest_id
+                FROM (
+                    SELECT id, MAX(id) OVER (PARTITION BY user_id, date) AS latest_id
+                    FROM attendance_attendance
+                    WHERE user_id IS NOT NULL
+                ) copies
+                WHERE summary.attendance_id_id = copies.id AND copies.id <> copies.latest_id;
+
+                DELETE FROM attendance_attendancedaymetrics metrics
+                USING attendance_attendance duplicate, attendance_attendance latest
+                WHERE metrics.attendance_id = duplicate.id
+                  AND duplicate.user_id = latest.user_id
+                  AND duplicate.date = latest.date
+                  AND duplicate.id < latest.id;
+
+                DELETE FROM attendance_attendance duplicate
+                USING attendance_attendance latest
+                WHERE duplicate.user_id = latest.user_id
+                  AND duplicate.date = latest.date
+                  AND duplicate.id < latest.id;
+
+                SET CONSTRAINTS ALL DEFERRED;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_attendance_user_date'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_unique_user_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='manual_override',
+            field=models.BooleanField(default=False),
+        ),
+    ]
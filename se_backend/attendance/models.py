@@ -11,6 +11,34 @@ class Attendance(models.Model):
     status = models.CharField(max_length=255)
     check_in_time = models.TimeField()
     check_out_time = models.TimeField()
+    # Entered or corrected by hand; rebuilding attendance from the punches leaves it alone
+    manual_override = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_attendance_user_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.user_id}"
+
+class AttendanceDayMetrics(models.Model):
+    id = models.AutoField(primary_key=True)
+    attendance = models.OneToOneField(Attendance, on_delete=models.CASCADE, related_name="metrics")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    date = models.DateField()
+    period_start = models.DateField()
+    actual_minutes = models.IntegerField(default=0)
+    overtime_minutes = models.IntegerField(default=0)
+    late_minutes = models.IntegerField(default=0)
+    undertime_minutes = models.IntegerField(default=0)
+    special_minutes = models.IntegerField(default=0)
+    regular_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "period_start"]),
+        ]
 
     def __str__(self):
-        return f"{self.id} - {self.user_id}"
\ No newline at end of file
+        return f"{self.id} - {self.user_id} - {self.date}"
@@ -4,4 +4,16 @@ from .models import Attendance
 class AttendanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attendance
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class AttendanceImportSerializer(serializers.ModelSerializer):
+    """
+    Validates a single row of a bulk import. The user is checked for existence in batch
+    and (user, date) uniqueness is resolved by the upsert, so no per-row queries run here.
+    """
+    user = serializers.IntegerField()
+
+    class Meta:
+        model = Attendance
+        fields = ['user', 'date', 'status', 'check_in_time', 'check_out_time']
+        validators = []
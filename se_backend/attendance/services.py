@@ -0,0 +1,337 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Attendance, AttendanceDayMetrics
+from attendance_summary.models import AttendanceSummary
+from master_calendar.services import get_period_holidays
+from schedule.models import Schedule
+from schedule.services import get_schedule_for_date, get_shift_map, get_shift_maps
+from shared.computations.attendance_computations import compute_day_metrics_batch, time_to_minutes
+from shared.recompute import OVERTIME_HOURS, mark_dirty
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = (
+    "actual_minutes",
+    "overtime_minutes",
+    "late_minutes",
+    "undertime_minutes",
+    "special_minutes",
+    "regular_minutes",
+)
+
+SUMMARY_UPDATE_FIELDS = (
+    "actual_hours",
+    "overtime_hours",
+    "late_minutes",
+    "undertime",
+    "specialholiday",
+    "regularholiday",
+    "attendance_id",
+)
+
+
+def get_period_schedule(user, date):
+    """Return the schedule whose payroll period includes the given date, from the cached schedule index."""
+    return get_schedule_for_date(user, date)
+
+
+def get_period_bounds(schedule):
+    """Return the (start, end) dates covered by a schedule's payroll period."""
+    start = schedule.payroll_period_start
+    end = schedule.payroll_period_end or start + timedelta(days=14)
+    return start, end
+
+
+def get_schedule_holidays(schedule):
+    """
+    Return the PeriodHolidays of a schedule's payroll period: the cached MasterCalendar holidays
+    plus any dates kept only on the schedule's own holiday arrays.
+    """
+    start, end = get_period_bounds(schedule)
+    return get_period_holidays(start, end).union(
+        regular=schedule.regularholiday or [],
+        special=schedule.specialholiday or [],
+    )
+
+
+def get_period_shift_maps(schedules):
+    """Map each schedule id to the cached {date: shift} dict of its shifts, limited to its payroll period."""
+    bounds = {schedule.id: get_period_bounds(schedule) for schedule in schedules}
+
+    period_maps = {}
+    for schedule_id, shift_map in get_shift_maps(bounds).items():
+        start, end = bounds[schedule_id]
+        period_maps[schedule_id] = {day: shift for day, shift in shift_map.items() if start <= day <= end}
+    return period_maps
+
+
+def build_metrics_rows(days):
+    """
+    Build the unsaved AttendanceDayMetrics rows of many (attendance, shift, period_start, is_special, is_regular)
+    days with a single vectorized pass.
+    """
+    if not days:
+        return []
+
+    metrics = compute_day_metrics_batch(
+        [time_to_minutes(att.check_in_time) for att, *_ in days],
+        [time_to_minutes(att.check_out_time) for att, *_ in days],
+        [time_to_minutes(shift.shift_start) for _, shift, *_ in days],
+        [shift.expected_hours * 60 for _, shift, *_ in days],
+        [is_special for *_, is_special, _ in days],
+        [is_regular for *_, is_regular in days],
+        [time_to_minutes(shift.shift_end) for _, shift, *_ in days],
+    )
+    columns = {field: metrics[field].tolist() for field in SUMMARY_FIELDS}
+
+    return [
+        AttendanceDayMetrics(
+            attendance=att,
+            user_id=att.user_id,
+            date=att.date,
+            period_start=period_start,
+            **{field: columns[field][index] for field in SUMMARY_FIELDS}
+        )
+        for index, (att, shift, period_start, *_) in enumerate(days)
+    ]
+
+
+def refresh_day_metrics(attendance):
+    """
+    Recompute the metrics row of a single attendance day, clearing it when the day has no valid punches or no shift.
+    Returns the period start the day now belongs to and the one it belonged to before, either may be None.
+    """
+    previous = AttendanceDayMetrics.objects.filter(attendance=attendance).values_list('period_start', flat=True).first()
+
+    check_in, check_out = attendance.check_in_time, attendance.check_out_time
+    schedule = get_period_schedule(attendance.user_id, attendance.date)
+    shift = get_shift_map(schedule).get(attendance.date) if schedule else None
+
+    if not check_in or not check_out or check_in == check_out or not shift:
+        logger.warning(f"[refresh_day_metrics] No valid attendance or shift for User: {attendance.user_id} "
+                       f"on {attendance.date}. Clearing metrics.")
+        if previous:
+            AttendanceDayMetrics.objects.filter(attendance=attendance).delete()
+        return None, previous
+
+    start, _ = get_period_bounds(schedule)
+    holidays = get_schedule_holidays(schedule)
+    row, = build_metrics_rows([
+        (attendance, shift, start, holidays.is_special(attendance.date), holidays.is_regular(attendance.date)),
+    ])
+    AttendanceDayMetrics.objects.update_or_create(
+        attendance=attendance,
+        defaults={field: getattr(row, field) for field in ('user_id', 'date', 'period_start') + SUMMARY_FIELDS}
+    )
+    return start, previous
+
+
+def rebuild_metrics_for_schedules(schedules):
+    """
+    Recompute the metrics rows of many schedules' payroll periods.
+    Shifts and attendance are each read once and all rows are written with one bulk upsert.
+    Returns the (user_id, period_start) pairs that were rebuilt.
+    """
+    schedules = list(schedules)
+    if not schedules:
+        return []
+
+    shift_maps = get_period_shift_maps(schedules)
+
+    periods = defaultdict(list)
+    for schedule in schedules:
+        start, end = get_period_bounds(schedule)
+        periods[schedule.user_id_id].append((
+            start,
+            end,
+            shift_maps[schedule.id],
+            get_schedule_holidays(schedule),
+        ))
+
+    attendances = Attendance.objects.filter(
+        user_id__in=periods.keys(),
+        date__gte=min(period[0] for user_periods in periods.values() for period in user_periods),
+        date__lte=max(period[1] for user_periods in periods.values() for period in user_periods),
+    )
+
+    days = []
+    for att in attendances:
+        for start, end, shift_map, holidays in periods[att.user_id]:
+            if not start <= att.date <= end:
+                continue
+            shift = shift_map.get(att.date)
+            if not shift:
+                logger.warning(f"[rebuild_metrics_for_schedules] Skipping attendance on {att.date} due to missing shift.")
+                break
+            days.append((att, shift, start, holidays.is_special(att.date), holidays.is_regular(att.date)))
+            break
+
+    rows = build_metrics_rows(days)
+
+    pairs = [(user_id, period[0]) for user_id, user_periods in periods.items() for period in user_periods]
+
+    # Only the exact (user, period) pairs rebuilt here; user and start filters alone would cross users' periods
+    rebuilt = Q()
+    for user_id, start in pairs:
+        rebuilt |= Q(user_id=user_id, period_start=start)
+    AttendanceDayMetrics.objects.filter(rebuilt).exclude(attendance_id__in=[row.attendance_id for row in rows]).delete()
+    AttendanceDayMetrics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['attendance'],
+        update_fields=['user', 'date', 'period_start', *SUMMARY_FIELDS],
+    )
+    return pairs
+
+
+def rebuild_period_metrics(user, schedule):
+    """Recompute every metrics row of a schedule's payroll period with one read and one bulk upsert."""
+    rebuild_metrics_for_schedules([schedule])
+    return schedule.payroll_period_start
+
+
+def aggregate_period_summaries(pairs, attendance=None):
+    """
+    Upsert the AttendanceSummary of each (user_id, period_start) pair.
+    The totals of every pair come from one SUM ... GROUP BY user, period_start query.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return []
+
+    totals = AttendanceDayMetrics.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        period_start__in={start for _, start in pairs},
+    ).values('user_id', 'period_start').annotate(
+        days=Count('id'),
+        last_attendance=Max('attendance_id'),
+        **{field: Coalesce(Sum(field), 0) for field in SUMMARY_FIELDS}
+    ).order_by()
+
+    existing = {}
+    for summary in AttendanceSummary.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        date__in={start for _, start in pairs},
+    ).order_by('id'):
+        existing.setdefault((summary.user_id_id, summary.date), summary)
+
+    to_update, to_create = [], []
+    aggregated = set()
+    for row in totals:
+        if (row["user_id"], row["period_start"]) not in pairs:
+            continue
+        aggregated.add((row["user_id"], row["period_start"]))
+
+        logger.debug(f"[aggregate_period_summaries] FINAL BIWEEKLY TOTALS for User: {row['user_id']}, "
+                     f"Start: {row['period_start']} — {row}")
+
+        values = {
+            'actual_hours': row["actual_minutes"] // 60,
+            'overtime_hours': row["overtime_minutes"] // 60,
+            'late_minutes': row["late_minutes"],
+            'undertime': row["undertime_minutes"] // 60,
+            'specialholiday': row["special_minutes"] // 60,
+            'regularholiday': row["regular_minutes"] // 60,
+            'attendance_id_id': attendance.id if attendance else row["last_attendance"],
+        }
+        summary = existing.get((row["user_id"], row["period_start"]))
+        if summary is None:
+            to_create.append(AttendanceSummary(user_id_id=row["user_id"], date=row["period_start"], **values))
+            continue
+        for field, value in values.items():
+            setattr(summary, field, value)
+        to_update.append(summary)
+
+    # A period whose days all moved away or were cleared has no metrics left; its summary must not keep their hours
+    for pair in pairs - aggregated:
+        summary = existing.get(pair)
+        if summary is None:
+            continue
+        logger.info(f"[aggregate_period_summaries] No attendance metrics left for User: {pair[0]}, Start: {pair[1]}; "
+                    f"zeroing AttendanceSummary {summary.id}")
+        for field in SUMMARY_UPDATE_FIELDS:
+            if field != 'attendance_id':
+                setattr(summary, field, 0)
+        to_update.append(summary)
+
+    # Bulk writes skip the per-summary receiver; the OvertimeHours of every summary are marked for one batched recompute
+    with transaction.atomic():
+        AttendanceSummary.objects.bulk_update(to_update, fields=SUMMARY_UPDATE_FIELDS)
+        AttendanceSummary.objects.bulk_create(to_create)
+        summaries = to_update + to_create
+        mark_dirty(OVERTIME_HOURS, {(summary.user_id_id, summary.date) for summary in summaries})
+
+    logger.info(f"[aggregate_period_summaries] {len(summaries)} AttendanceSummary rows UPDATED")
+    return summaries
+
+
+def aggregate_period_summary(user, period_start, attendance=None):
+    """Upsert the AttendanceSummary of a single period from a SUM over its metrics rows."""
+    summaries = aggregate_period_summaries([(getattr(user, 'pk', user), period_start)], attendance=attendance)
+    if not summaries:
+        logger.warning(f"[aggregate_period_summary] No attendance metrics for User: {user} in period starting {period_start}")
+        return None
+    return summaries[0]
+
+
+def summarize_attendance_period(user, date, attendance=None):
+    """
+    Rebuild the metrics of the payroll period that includes the given date and upsert its AttendanceSummary.
+    The schedule, its shifts and the period's attendance are loaded in a fixed number of queries.
+    """
+    schedule = get_period_schedule(user, date)
+    if not schedule:
+        logger.warning(f"[summarize_attendance_period] No matching schedule found for User: {user} on Date: {date}")
+        return None
+
+    period_start = rebuild_period_metrics(user, schedule)
+    return aggregate_period_summary(user, period_start, attendance=attendance)
+
+
+def recompute_period_metrics(pairs):
+    """
+    Rebuild the metrics rows of many (user_id, period_start) periods in one batch.
+    The rows of a period no schedule starts any more, because it moved or was deleted, are dropped.
+    Returns the (user_id, period_start) pairs that were rebuilt.
+    """
+    schedules = {}
+    orphaned = Q()
+    for user_id, period_start in pairs:
+        schedule = get_period_schedule(user_id, period_start)
+        if schedule and schedule.payroll_period_start == period_start:
+            schedules[schedule.id] = schedule
+        else:
+            logger.warning(f"[recompute_period_metrics] No schedule starts a period on {period_start} for User: {user_id}")
+            orphaned |= Q(user_id=user_id, period_start=period_start)
+
+    if orphaned:
+        AttendanceDayMetrics.objects.filter(orphaned).delete()
+    return rebuild_metrics_for_schedules(schedules.values())
+
+
+def recompute_summaries_for_users(user_ids, start, end):
+    """
+    Rebuild the AttendanceSummary of every schedule of the given users whose payroll period starts in [start, end].
+    Their OvertimeHours are marked for the recompute graph.
+    """
+    schedules = Schedule.objects.filter(
+        user_id__in=user_ids,
+        payroll_period_start__gte=start,
+        payroll_period_start__lte=end,
+    )
+    pairs = rebuild_metrics_for_schedules(schedules)
+    return aggregate_period_summaries(pairs)
+
+
+def get_scheduled_user_ids(start, end, after_user_id=None):
+    """Return, in id order, the users with a schedule whose payroll period starts in [start, end]."""
+    schedules = Schedule.objects.filter(payroll_period_start__gte=start, payroll_period_start__lte=end)
+    if after_user_id is not None:
+        schedules = schedules.filter(user_id__gt=after_user_id)
+    return list(schedules.order_by('user_id').values_list('user_id', flat=True).distinct())
@@ -0,0 +1,50 @@
+import logging
+from datetime import date
+
+from celery import group, shared_task
+
+from .services import get_scheduled_user_ids, recompute_summaries_for_users
+from schedule.services import get_schedule_indexes
+from shared.recompute import ATTENDANCE_METRICS, deferred_recompute, mark_dirty
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_recomputes_for_days(days):
+    """
+    Mark the (user, period) metrics and summaries covering the given (user_id, date) days for the recompute graph,
+    which drains them once the transaction commits. Returns the number of periods marked.
+    """
+    days = set(days)
+    indexes = get_schedule_indexes({user_id for user_id, _ in days})
+
+    periods = set()
+    for user_id, day in days:
+        schedule = indexes[user_id].covering(day)
+        if schedule:
+            periods.add((user_id, schedule.payroll_period_start))
+        else:
+            logger.warning(f"[schedule_recomputes_for_days] No matching schedule found for User: {user_id} on Date: {day}")
+
+    mark_dirty(ATTENDANCE_METRICS, periods)
+    return len(periods)
+
+
+@shared_task
+@deferred_recompute()
+def recompute_summary_chunk(user_ids, start, end):
+    """Rebuild the summaries of a chunk of users for every payroll period starting in [start, end]."""
+    summaries = recompute_summaries_for_users(user_ids, date.fromisoformat(start), date.fromisoformat(end))
+    return f"Recomputed {len(summaries)} summaries for users {user_ids[0]}-{user_ids[-1]}"
+
+
+@shared_task
+def recompute_attendance_summaries(start, end, chunk_size=100):
+    """Fan the recompute of every summary in [start, end] out to the workers, one task per chunk of users."""
+    user_ids = get_scheduled_user_ids(date.fromisoformat(start), date.fromisoformat(end))
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+    group(recompute_summary_chunk.s(chunk, start, end) for chunk in chunks).apply_async()
+
+    logger.info(f"[recompute_attendance_summaries] Dispatched {len(chunks)} chunks for {len(user_ids)} users")
+    return f"Dispatched {len(chunks)} recompute chunks for {len(user_ids)} users"
@@ -1,9 +1,40 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
 from datetime import time, date
+from decimal import Decimal
 
 from users.models import CustomUser
-from attendance.models import Attendance
+from attendance.importers import import_attendance_rows, read_csv_rows
+from attendance.models import Attendance, AttendanceDayMetrics
+from attendance.views import AttendanceViewSet
+from attendance.services import rebuild_metrics_for_schedules, summarize_attendance_period
+from attendance.tasks import schedule_recomputes_for_days
+from attendance_summary.models import AttendanceSummary
+from overtimehours.models import OvertimeHours
+from benefits.models import SSS
+from earnings.models import Earnings
+from master_calendar.models import MasterCalendar
+from schedule.models import Schedule
+from schedule.services import schedule_index_cache
+from shared.computations.attendance_computations import (
+    compute_day_metrics,
+    compute_day_metrics_batch,
+    time_to_minutes,
+)
+from shared.models import DirtyKey, JobCheckpoint
+from shared.recompute import deferred_recompute
+from shared.recompute_graph import graph
+from shared.tasks import drain_recompute_queue
+from shift.models import Shift
 
 class AttendanceModelTestCase(TestCase):
     def setUp(self):
@@ -42,3 +73,464 @@ class AttendanceModelTestCase(TestCase):
     def test_delete_attendance(self):
         self.attendance.delete()
         self.assertEqual(Attendance.objects.count(), 0)
+
+
+class AttendanceSummaryEngineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Run the debounced drain inline instead of going through the broker
+        patcher = mock.patch.object(
+            drain_recompute_queue,
+            "apply_async",
+            side_effect=lambda countdown: drain_recompute_queue(),
+        )
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = CustomUser.objects.create_user(
+            email="engine@example.com",
+            password="testpassword",
+            role="employee"
+        )
+        self.schedule = Schedule.objects.create(
+            user_id=self.user,
+            payroll_period_start=date(2025, 4, 1),
+            payroll_period_end=date(2025, 4, 15),
+            bi_weekly_start=date(2025, 4, 1),
+            hours=8,
+            specialholiday=[date(2025, 4, 3)],
+        )
+        for day in (1, 2, 3):
+            shift = Shift.objects.create(
+                date=date(2025, 4, day),
+                shift_start=time(9, 0),
+                shift_end=time(17, 0),
+                expected_hours=8
+            )
+            self.schedule.shift_ids.add(shift)
+
+    def create_attendance(self, day, check_in, check_out):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Attendance.objects.create(
+                user=self.user,
+                date=date(2025, 4, day),
+                status="Present",
+                check_in_time=check_in,
+                check_out_time=check_out
+            )
+
+    def test_summary_totals(self):
+        self.create_attendance(1, time(9, 30), time(19, 30))  # 30m late, 9h worked
+        self.create_attendance(2, time(9, 0), time(16, 0))    # 6h worked
+        self.create_attendance(3, time(9, 0), time(18, 0))    # special holiday
+
+        summary = AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1))
+        self.assertEqual(summary.actual_hours, 15)
+        self.assertEqual(summary.overtime_hours, 1)
+        self.assertEqual(summary.late_minutes, 30)
+        self.assertEqual(summary.undertime, 2)
+        self.assertEqual(summary.specialholiday, 8)
+        self.assertEqual(summary.regularholiday, 0)
+
+    def test_day_metrics_are_materialized(self):
+        first = self.create_attendance(1, time(9, 30), time(19, 30))
+        self.create_attendance(2, time(9, 0), time(16, 0))
+
+        metrics = AttendanceDayMetrics.objects.get(attendance=first)
+        self.assertEqual(metrics.period_start, date(2025, 4, 1))
+        self.assertEqual(metrics.actual_minutes, 540)
+        self.assertEqual(metrics.late_minutes, 30)
+
+        first.check_out_time = time(18, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+
+        metrics.refresh_from_db()
+        self.assertEqual(metrics.overtime_minutes, 0)
+        summary = AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1))
+        self.assertEqual(summary.actual_hours, 14)
+
+    def test_summary_of_a_period_left_without_metrics_is_zeroed(self):
+        attendance = self.create_attendance(1, time(9, 30), time(19, 30))
+        self.assertEqual(AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1)).actual_hours, 9)
+
+        attendance.check_out_time = attendance.check_in_time
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance.save()
+
+        summary = AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1))
+        self.assertEqual((summary.actual_hours, summary.overtime_hours, summary.late_minutes), (0, 0, 0))
+        self.assertEqual(OvertimeHours.objects.get(attendancesummary=summary).regularot, 0)
+
+    def test_save_refreshes_only_its_day(self):
+        self.create_attendance(1, time(9, 30), time(19, 30))
+        with mock.patch("attendance.services.rebuild_metrics_for_schedules") as rebuild:
+            self.create_attendance(2, time(9, 0), time(16, 0))
+
+        rebuild.assert_not_called()
+        self.assertEqual(AttendanceDayMetrics.objects.filter(user_id=self.user.id).count(), 2)
+        self.assertEqual(AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1)).actual_hours, 15)
+
+    def test_burst_of_saves_queues_one_recompute(self):
+        self.apply_async.side_effect = None
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance = Attendance.objects.create(
+                user=self.user,
+                date=date(2025, 4, 1),
+                status="Present",
+                check_in_time=time(9, 0),
+                check_out_time=time(12, 0)
+            )
+            for hour in (13, 15, 18):
+                attendance.check_out_time = time(hour, 0)
+                attendance.save()
+
+        self.assertEqual(self.apply_async.call_count, 1)
+        self.assertFalse(AttendanceSummary.objects.filter(user_id=self.user).exists())
+
+    def test_rebuild_applies_holiday_changes(self):
+        attendance = self.create_attendance(2, time(9, 0), time(18, 0))
+        self.schedule.regularholiday = [date(2025, 4, 2)]
+        self.schedule.save()
+
+        summary = summarize_attendance_period(self.user, attendance.date)
+        self.assertEqual(summary.actual_hours, 0)
+        self.assertEqual(summary.regularholiday, 8)
+
+    def test_holiday_added_after_attendance_rebuilds_its_days(self):
+        self.create_attendance(1, time(9, 0), time(18, 0))
+        self.create_attendance(2, time(9, 0), time(18, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MasterCalendar.objects.create(name="Regular", date=date(2025, 4, 2), holiday_type="regular")
+
+        summary = AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1))
+        self.assertEqual((summary.actual_hours, summary.regularholiday), (8, 8))
+
+    def test_shift_change_rebuilds_stored_days(self):
+        self.create_attendance(1, time(9, 0), time(18, 0))
+        shift = self.schedule.shift_ids.get(date=date(2025, 4, 1))
+
+        shift.shift_start = time(8, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            shift.save()
+
+        self.assertEqual(AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1)).late_minutes, 60)
+
+    def test_moved_schedule_rebuilds_both_periods(self):
+        self.create_attendance(1, time(9, 0), time(18, 0))
+
+        self.schedule.payroll_period_start = date(2025, 4, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.save()
+
+        self.assertFalse(AttendanceDayMetrics.objects.filter(user_id=self.user.id).exists())
+        self.assertEqual(AttendanceSummary.objects.get(user_id=self.user, date=date(2025, 4, 1)).actual_hours, 0)
+
+    def test_master_calendar_holidays_apply(self):
+        MasterCalendar.objects.create(name="Regular", date=date(2025, 4, 1), holiday_type="regular")
+        attendance = self.create_attendance(1, time(9, 0), time(18, 0))
+
+        summary = summarize_attendance_period(self.user, attendance.date)
+        self.assertEqual(summary.actual_hours, 0)
+        self.assertEqual(summary.regularholiday, 8)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        attendance = self.create_attendance(1, time(9, 0), time(18, 0))
+        self.create_attendance(2, time(9, 0), time(18, 0))
+
+        with CaptureQueriesContext(connection) as few_rows:
+            summarize_attendance_period(self.user, attendance.date, attendance=attendance)
+
+        self.create_attendance(3, time(9, 0), time(18, 0))
+
+        with CaptureQueriesContext(connection) as more_rows:
+            summarize_attendance_period(self.user, attendance.date, attendance=attendance)
+
+        self.assertEqual(len(few_rows), len(more_rows))
+
+
+class RecomputeAttendanceSummariesCommandTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(drain_recompute_queue, "apply_async")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.users = []
+        self.schedules = []
+        for index in range(3):
+            user = CustomUser.objects.create_user(
+                email=f"bulk{index}@example.com",
+                password="testpassword",
+                role="employee"
+            )
+            schedule = Schedule.objects.create(
+                user_id=user,
+                payroll_period_start=date(2025, 4, 1),
+                payroll_period_end=date(2025, 4, 15),
+                bi_weekly_start=date(2025, 4, 1),
+                hours=8,
+            )
+            schedule.shift_ids.add(Shift.objects.create(
+                date=date(2025, 4, 1),
+                shift_start=time(9, 0),
+                shift_end=time(17, 0),
+                expected_hours=8
+            ))
+            Attendance.objects.create(
+                user=user,
+                date=date(2025, 4, 1),
+                status="Present",
+                check_in_time=time(9, 0),
+                check_out_time=time(19, 0)
+            )
+            self.users.append(user)
+            self.schedules.append(schedule)
+
+    def run_command(self, *args):
+        call_command(
+            "recompute_attendance_summaries",
+            "--start", "2025-04-01",
+            "--end", "2025-04-30",
+            "--chunk-size", "2",
+            *args,
+            stdout=StringIO(),
+        )
+
+    def test_rebuild_leaves_other_periods_of_the_batch_users(self):
+        later = {}
+        for user in self.users[:2]:
+            later[user.id] = Schedule.objects.create(
+                user_id=user,
+                payroll_period_start=date(2025, 4, 16),
+                payroll_period_end=date(2025, 4, 30),
+                bi_weekly_start=date(2025, 4, 16),
+                hours=8,
+            )
+            later[user.id].shift_ids.add(Shift.objects.create(
+                date=date(2025, 4, 16), shift_start=time(9, 0), shift_end=time(17, 0), expected_hours=8
+            ))
+            Attendance.objects.create(user=user, date=date(2025, 4, 16), status="Present",
+                                      check_in_time=time(9, 0), check_out_time=time(18, 0))
+        rebuild_metrics_for_schedules([self.schedules[0], later[self.users[1].id]])
+        rebuild_metrics_for_schedules([later[self.users[0].id], self.schedules[1]])
+
+        for user in self.users[:2]:
+            self.assertEqual(
+                set(AttendanceDayMetrics.objects.filter(user_id=user.id).values_list('period_start', flat=True)),
+                {date(2025, 4, 1), date(2025, 4, 16)},
+            )
+
+    def test_marking_many_days_reads_the_schedule_cache_once(self):
+        days = [(user.id, date(2025, 4, day)) for user in self.users for day in (1, 2, 3)]
+        with mock.patch.object(schedule_index_cache, "get_many", wraps=schedule_index_cache.get_many) as get_many:
+            self.assertEqual(schedule_recomputes_for_days(days), 3)
+        get_many.assert_called_once()
+
+    def test_recomputes_every_user(self):
+        self.run_command()
+
+        summaries = AttendanceSummary.objects.filter(date=date(2025, 4, 1))
+        self.assertEqual(summaries.count(), 3)
+        self.assertEqual({summary.overtime_hours for summary in summaries}, {1})
+        self.assertTrue(JobCheckpoint.objects.get(name__startswith="recompute_attendance_summaries").completed)
+
+    def test_resumes_from_checkpoint(self):
+        JobCheckpoint.objects.create(
+            name="recompute_attendance_summaries:2025-04-01:2025-04-30",
+            position={"last_user_id": self.users[1].id},
+            processed=2,
+        )
+
+        self.run_command()
+
+        recomputed = AttendanceSummary.objects.values_list("user_id", flat=True)
+        self.assertEqual(list(recomputed), [self.users[2].id])
+
+
+class AttendanceImportTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(drain_recompute_queue, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = CustomUser.objects.create_user(
+            email="import@example.com",
+            password="testpassword",
+            role="employee"
+        )
+        Schedule.objects.create(
+            user_id=self.user,
+            payroll_period_start=date(2025, 4, 1),
+            payroll_period_end=date(2025, 4, 15),
+            bi_weekly_start=date(2025, 4, 1),
+            hours=8,
+        )
+
+    def row(self, day, check_out="17:00:00", **overrides):
+        return {
+            "user": self.user.id,
+            "date": f"2025-04-{day:02d}",
+            "status": "Present",
+            "check_in_time": "09:00:00",
+            "check_out_time": check_out,
+            **overrides
+        }
+
+    def test_valid_rows_import_and_errors_are_reported(self):
+        rows = [
+            self.row(1),
+            self.row(2, check_out="not a time"),
+            self.row(3, user=999999),
+            self.row(1, check_out="18:00:00"),
+            self.row(4),
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            imported, errors = import_attendance_rows(rows)
+
+        self.assertEqual(imported, 2)
+        self.assertEqual([error["row"] for error in errors], [1, 2, 3])
+        self.assertIn("check_out_time", errors[0]["errors"])
+        self.assertEqual(Attendance.objects.filter(user=self.user).count(), 2)
+        self.apply_async.assert_called_once_with(countdown=mock.ANY)
+        self.assertEqual(
+            list(DirtyKey.objects.values_list("node", "key")),
+            [("attendance_metrics", [self.user.id, "2025-04-01"])],
+        )
+
+    def test_rows_upsert_on_user_and_date(self):
+        Attendance.objects.create(
+            user=self.user,
+            date=date(2025, 4, 1),
+            status="Absent",
+            check_in_time=time(9, 0),
+            check_out_time=time(9, 0)
+        )
+
+        imported, errors = import_attendance_rows([self.row(1, check_out="18:00:00")])
+
+        self.assertEqual((imported, errors), (1, []))
+        attendance = Attendance.objects.get(user=self.user, date=date(2025, 4, 1))
+        self.assertEqual(attendance.status, "Present")
+        self.assertEqual(attendance.check_out_time, time(18, 0))
+
+    def test_csv_rows(self):
+        upload = SimpleUploadedFile(
+            "attendance.csv",
+            b"user,date,status,check_in_time,check_out_time\n"
+            + f"{self.user.id},2025-04-01,Present,09:00,17:00\n".encode(),
+        )
+
+        imported, errors = import_attendance_rows(read_csv_rows(upload))
+
+        self.assertEqual((imported, errors), (1, []))
+        self.assertTrue(Attendance.objects.get(user=self.user, date=date(2025, 4, 1)).manual_override)
+
+    @mock.patch("shared.utils.get_role_from_token", return_value="admin")
+    def test_unreadable_csv_is_rejected(self, get_role):
+        view = AttendanceViewSet.as_view({"post": "bulk_import"})
+        uploads = [
+            b"user,date\n\xff\xfe,2025-04-01\n",
+            b"user,date\n\"" + b"x" * (1 << 18) + b"\",2025-04-01\n",
+        ]
+        for content in uploads:
+            request = APIRequestFactory().post(
+                "/attendance/bulk-import/",
+                {"file": SimpleUploadedFile("attendance.csv", content)},
+                format="multipart",
+            )
+            force_authenticate(request, user=self.user)
+
+            response = view(request)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Could not read the CSV file", response.data["error"])
+
+
+class AttendanceMetricKernelTestCase(TestCase):
+    def test_batch_matches_scalar(self):
+        days = [
+            (time(9, 30), time(19, 30), time(9, 0), 8, False, False, time(18, 0)),
+            (time(8, 0), time(12, 0), time(9, 0), 8, False, False, time(18, 0)),
+            (time(9, 0), time(9, 30), time(9, 0), 8, False, False, time(18, 0)),
+            (time(10, 0), time(9, 0), time(9, 0), 8, False, False, time(18, 0)),
+            (time(9, 0), time(18, 0), time(9, 0), 8, True, False, time(18, 0)),
+            (time(9, 0), time(18, 0), time(9, 0), 8, False, True, time(18, 0)),
+            (time(9, 0), time(18, 0), time(9, 0), 8, True, True, time(18, 0)),
+            (time(22, 0), time(6, 0), time(22, 0), 8, False, False, time(6, 0)),
+        ]
+
+        batch = compute_day_metrics_batch(
+            [time_to_minutes(day[0]) for day in days],
+            [time_to_minutes(day[1]) for day in days],
+            [time_to_minutes(day[2]) for day in days],
+            [day[3] * 60 for day in days],
+            [day[4] for day in days],
+            [day[5] for day in days],
+            [time_to_minutes(day[6]) for day in days],
+        )
+
+        self.assertEqual(compute_day_metrics(*days[3])["actual_minutes"], 0)
+        self.assertEqual(compute_day_metrics(*days[-1])["actual_minutes"], 420)
+        for index, day in enumerate(days):
+            expected = compute_day_metrics(*day)
+            self.assertEqual({field: int(batch[field][index]) for field in expected}, expected)
+
+
+class DeferredRecomputeTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="deferred@example.com", password="password", role="employee")
+        self.attendance = Attendance.objects.create(user=self.user, date=date(2025, 4, 1), status="Present",
+                                                    check_in_time=time(9, 0), check_out_time=time(18, 0))
+        patcher = mock.patch.object(graph, "run", return_value={})
+        self.run = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_summary(self, overtime_hours):
+        return AttendanceSummary.objects.create(user_id=self.user, attendance_id=self.attendance, date=date(2025, 4, 1),
+                                                actual_hours=8, overtime_hours=overtime_hours, late_minutes=0, undertime=0)
+
+    def test_marks_flush_once_on_commit(self):
+        with mock.patch.object(drain_recompute_queue, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                with deferred_recompute():
+                    summary = self.create_summary(2)
+                    summary.overtime_hours = 3
+                    summary.save()
+                    with deferred_recompute():
+                        Earnings.objects.create(user=self.user, basic_rate=Decimal("8700"))
+                        Earnings.objects.create(user=self.user, basic_rate=Decimal("9000"))
+                    self.run.assert_not_called()
+
+        apply_async.assert_not_called()
+        self.assertFalse(DirtyKey.objects.exists())
+        self.assertFalse(SSS.objects.exists())
+        self.run.assert_called_once()
+        dirty = self.run.call_args.args[0]
+        self.assertEqual(dirty["overtime_hours"], {(self.user.id, date(2025, 4, 1))})
+        self.assertEqual(dirty["contributions"], {self.user.id})
+
+    def test_rolled_back_marks_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with deferred_recompute():
+                try:
+                    with transaction.atomic():
+                        self.create_summary(2)
+                        raise ValueError
+                except ValueError:
+                    pass
+
+        self.run.assert_not_called()
+
+    def test_decorated_function_flushes_its_own_marks(self):
+        @deferred_recompute()
+        def correct_summary():
+            self.create_summary(4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            correct_summary()
+
+        self.assertEqual(self.run.call_args.args[0]["overtime_hours"], {(self.user.id, date(2025, 4, 1))})
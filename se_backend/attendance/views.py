@@ -1,8 +1,12 @@
+import csv
+
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework import status, viewsets
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from shared.utils import role_required
+from .importers import import_attendance_rows, read_csv_rows
 from .models import Attendance
 from .serializers import AttendanceSerializer
 from shared.generic_viewset import GenericViewset
@@ -32,7 +36,7 @@ class AttendanceViewSet(GenericViewset, viewsets.ModelViewSet):
         """Create Attendance record. Accessible by owners and admins."""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        attendance = serializer.save()
+        attendance = serializer.save(manual_override=serializer.validated_data.get('manual_override', True))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @role_required(["owner", "admin"])
@@ -42,7 +46,8 @@ class AttendanceViewSet(GenericViewset, viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        # Edits are kept over the punches unless the request hands the day back with manual_override=false
+        serializer.save(manual_override=serializer.validated_data.get('manual_override', True))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @role_required(["owner", "admin"])
@@ -87,3 +92,29 @@ class AttendanceViewSet(GenericViewset, viewsets.ModelViewSet):
         # Use the existing pagination and serialization from list method
         return super().list(request, *args, **kwargs)
 
+    @action(detail=False, methods=['post'], url_path='bulk-import', parser_classes=[JSONParser, MultiPartParser])
+    @role_required(["owner", "admin"])
+    def bulk_import(self, request, *args, **kwargs):
+        """
+        Import many Attendance records at once, upserting on (user, date):
+        - JSON: a list of {user, date, status, check_in_time, check_out_time}
+        - CSV: a multipart upload in the "file" field, with those columns as its header
+        Invalid rows are reported by index without aborting the rest of the batch.
+        """
+        upload = request.FILES.get('file')
+        try:
+            rows = read_csv_rows(upload) if upload else request.data
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response(
+                {"error": f"Could not read the CSV file, expected UTF-8 with a header row: {e}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not isinstance(rows, list):
+            return Response(
+                {"error": "Expected a list of attendance rows or a CSV file."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        imported, errors = import_attendance_rows(rows)
+        return Response({"imported": imported, "rejected": len(errors), "errors": errors}, status=status.HTTP_200_OK)
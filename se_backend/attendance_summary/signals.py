@@ -1,111 +1,162 @@
 import logging
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils.timezone import now
 from .models import AttendanceSummary
 from overtimehours.models import OvertimeHours
 from schedule.models import Schedule
+from schedule.services import ScheduleIndex
+from shared.recompute import OVERTIME_HOURS, mark_dirty
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
 
-def update_overtime_hours(attendance_summary):
+OVERTIME_BATCH_SIZE = 1000
+
+OVERTIME_VALUE_FIELDS = (
+    'actualhours', 'regularot', 'regularholiday', 'specialholiday', 'nightdiff', 'restday', 'late', 'undertime',
+)
+
+# Schedule fields that feed OvertimeHours: which summaries a schedule covers, and its night differential and rest days
+OVERTIME_SCHEDULE_FIELDS = ('user_id', 'payroll_period_start', 'payroll_period_end', 'nightdiff', 'restday')
+
+
+def get_overtime_values(attendance_summary, schedule):
+    """The OvertimeHours fields of one AttendanceSummary under the schedule covering it."""
+    return {
+        "actualhours": attendance_summary.actual_hours,
+        "regularot": attendance_summary.overtime_hours,
+        "regularholiday": attendance_summary.regularholiday or 0,
+        "specialholiday": attendance_summary.specialholiday or 0,
+        # night differential hours
+        "nightdiff": len(schedule.nightdiff) * 8 if schedule and schedule.nightdiff else 0,
+        "restday": schedule.restday if schedule and schedule.restday else 0,
+        "late": attendance_summary.late_minutes,
+        "undertime": attendance_summary.undertime,
+    }
+
+
+def build_overtime_hours(summaries, schedule_indexes):
+    """Unsaved OvertimeHours for AttendanceSummaries, given the ScheduleIndex of each summary's user id."""
+    return [
+        OvertimeHours(
+            attendancesummary=attendance_summary,
+            user_id=attendance_summary.user_id_id,
+            biweek_start=attendance_summary.date,
+            **get_overtime_values(attendance_summary,
+                                  schedule_indexes[attendance_summary.user_id_id].covering(attendance_summary.date)),
+        )
+        for attendance_summary in summaries
+    ]
+
+
+def upsert_overtime_hours(rows):
+    """Insert or update OvertimeHours on their (attendancesummary, biweek_start) key in one statement per batch."""
+    OvertimeHours.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['attendancesummary', 'biweek_start'],
+        update_fields=['user', *OVERTIME_VALUE_FIELDS],
+        batch_size=OVERTIME_BATCH_SIZE,
+    )
+    return len(rows)
+
+
+def update_overtime_hours_for_summaries(summaries):
+    """Upsert the OvertimeHours of loaded AttendanceSummaries, reading their users' schedules in one query."""
+    if not summaries:
+        return 0
+
+    schedules = {}
+    for schedule in Schedule.objects.filter(user_id__in={summary.user_id_id for summary in summaries}):
+        schedules.setdefault(schedule.user_id_id, []).append(schedule)
+    indexes = {summary.user_id_id: ScheduleIndex(schedules.get(summary.user_id_id, [])) for summary in summaries}
+
+    written = upsert_overtime_hours(build_overtime_hours(summaries, indexes))
+    logger.info(f"[update_overtime_hours_for_summaries] {written} OvertimeHours upserted for {len(indexes)} users")
+    return written
+
+
+def update_overtime_hours_many(summary_ids):
     """
-    Function to create or update an OvertimeHours instance for each new biweekly period.
+    Create or update the OvertimeHours of many AttendanceSummaries at once: one query for the summaries,
+    one for their users' schedules, and a bulk upsert. Returns the number of OvertimeHours written.
     """
-    attendance_summary.refresh_from_db()
-
-    user = attendance_summary.user_id
-    overtime_hours = attendance_summary.overtime_hours
-    late = attendance_summary.late_minutes
-    undertime = attendance_summary.undertime
-    regularholiday_hours = attendance_summary.regularholiday
-    specialholiday_hours = attendance_summary.specialholiday
-    biweek_start = attendance_summary.date
-    actual_hours = attendance_summary.actual_hours
-
-    logger.info(f"Processing OvertimeHours for User {user.id} | AttendanceSummary ID {attendance_summary.id} | "
-                f"Biweek Start: {biweek_start} | Overtime Hours: {overtime_hours} | Late: {late} | Undertime: {undertime}")
-
-    # Fetch Schedule for the same user
-    schedule = Schedule.objects.filter(
-        user_id=user,
-        payroll_period_start__lte=biweek_start,
-        payroll_period_end__gte=biweek_start
-    ).order_by('-payroll_period_start').first()
-
-    if schedule:
-        logger.info(f"Schedule found for User {user.id}: Schedule ID {schedule.id}")
-    else:
-        logger.warning(f"No Schedule found for User {user.id}. Skipping holiday calculations.")
-
-
-    # night differential hours
-    nightdiff_hours = len(schedule.nightdiff) * 8 if schedule and schedule.nightdiff else 0
-    restday_hours = schedule.restday if schedule and schedule.restday else 0
-
-
-    logger.info(f"Computed Overtime Details for User {user.id}:"
-                f"Actual Hours: {actual_hours},"
-                f"Regular Holiday Hours: {regularholiday_hours}, "
-                f"Special Holiday Hours: {specialholiday_hours}, "
-                f"Night Differential Hours: {nightdiff_hours}, "
-                f"Rest Day Hours: {restday_hours}")
-
-    # Check if an OvertimeHours instance exists for the current biweekly period
-    overtime, created = OvertimeHours.objects.get_or_create(
-        attendancesummary=attendance_summary,
-        user=user,
-        biweek_start=biweek_start,
-        defaults={
-            "actualhours": actual_hours,
-            "regularot": overtime_hours,
-            "regularholiday": regularholiday_hours,
-            "specialholiday": specialholiday_hours,
-            "nightdiff": nightdiff_hours,
-            "restday": restday_hours,
-            "late": late,
-            "undertime": undertime
-        }
+    return update_overtime_hours_for_summaries(list(AttendanceSummary.objects.filter(id__in=summary_ids)))
+
+
+def recompute_overtime_hours(keys):
+    """Recompute node of the OvertimeHours of the (user_id, period_start) keys, batched across users."""
+    keys = set(keys)
+    summaries = AttendanceSummary.objects.filter(
+        user_id__in={user_id for user_id, _ in keys},
+        date__in={period_start for _, period_start in keys},
     )
+    return update_overtime_hours_for_summaries(
+        [summary for summary in summaries if (summary.user_id_id, summary.date) in keys]
+    )
+
+
+def get_period_overtime_keys(user_id, periods):
+    """The (user_id, date) keys of a user's AttendanceSummaries dated within any of the (start, end) periods."""
+    period_filter = Q()
+    for start, end in periods:
+        period_filter |= Q(date__range=(start, end))
+    if not period_filter:
+        return set()
+
+    dates = AttendanceSummary.objects.filter(period_filter, user_id=user_id).values_list('date', flat=True)
+    return {(user_id, day) for day in dates}
 
-    if created:
-        logger.info(f"Created new OvertimeHours ID {overtime.id} for AttendanceSummary ID {attendance_summary.id} | Biweek Start: {biweek_start}")
-    else:
-        # If the record already exists, update it
-        overtime.actualhours = actual_hours
-        overtime.regularot = overtime_hours
-        overtime.regularholiday = regularholiday_hours
-        overtime.specialholiday = specialholiday_hours
-        overtime.nightdiff = nightdiff_hours
-        overtime.restday = restday_hours
-        overtime.late = late
-        overtime.undertime = undertime
-        overtime.save()
-        logger.info(f"Updated OvertimeHours ID {overtime.id} with new overtime values.")
 
 @receiver(post_save, sender=AttendanceSummary)
 def handle_attendance_summary_save(sender, instance, update_fields=None, **kwargs):
     """
     Signal triggered when AttendanceSummary is created or updated.
-    Only updates if overtime_hours is actually modified.
+    Only marks its OvertimeHours for a recompute if overtime_hours is actually modified.
     """
     if update_fields is None or "overtime_hours" in update_fields:
-        update_overtime_hours(instance)
+        mark_dirty(OVERTIME_HOURS, [(instance.user_id_id, instance.date)])
 
-@receiver(post_save, sender=Schedule)
-def handle_schedule_update(sender, instance, **kwargs):
+
+def get_schedule_overtime_values(schedule):
+    return {field: schedule.serializable_value(field) for field in OVERTIME_SCHEDULE_FIELDS}
+
+
+@receiver(pre_save, sender=Schedule)
+def remember_schedule_overtime_values(sender, instance, update_fields=None, **kwargs):
     """
-    Signal triggered when a Schedule is updated.
-    It creates or updates OvertimeHours entries for the new biweekly period without modifying past ones.
+    Keep the stored values of the overtime fields, so the post_save handler can tell what changed.
     """
-    logger.info(f"Schedule updated for User {instance.user_id.id}: Processing OvertimeHours for the new biweekly period...")
+    instance._previous_overtime_values = None
+    if instance.pk and (update_fields is None or set(update_fields) & set(OVERTIME_SCHEDULE_FIELDS)):
+        previous = Schedule.objects.filter(pk=instance.pk).first()
+        instance._previous_overtime_values = get_schedule_overtime_values(previous) if previous else None
 
-    # Get all attendance summaries for the user
-    attendance_summaries = AttendanceSummary.objects.filter(user_id=instance.user_id)
 
-    for attendance_summary in attendance_summaries:
-        update_overtime_hours(attendance_summary)
-
-    logger.info(f"OvertimeHours updated for the new biweekly period for User {instance.user_id.id}")
+@receiver(post_save, sender=Schedule)
+def handle_schedule_update(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal triggered when a Schedule is updated.
+    Marks the OvertimeHours of the summaries within the schedule's payroll period, and within its previous
+    period when that moved, for a recompute. Saves that change none of the overtime fields, like the holiday sync, are skipped.
+    """
+    if update_fields is not None and not set(update_fields) & set(OVERTIME_SCHEDULE_FIELDS):
+        return
+
+    current = get_schedule_overtime_values(instance)
+    previous = None if created else getattr(instance, '_previous_overtime_values', None)
+    if previous == current:
+        logger.info(f"[handle_schedule_update] Schedule {instance.id} saved without overtime changes. Skipping.")
+        return
+
+    periods = {}
+    for values in (previous, current):
+        if values and values['payroll_period_start'] and values['payroll_period_end']:
+            periods.setdefault(values['user_id'], set()).add((values['payroll_period_start'], values['payroll_period_end']))
+
+    for user_id, user_periods in periods.items():
+        marked = mark_dirty(OVERTIME_HOURS, get_period_overtime_keys(user_id, user_periods))
+        logger.info(f"[handle_schedule_update] Schedule {instance.id}: {marked} OvertimeHours marked for User {user_id}")
@@ -1,9 +1,16 @@
 from django.test import TestCase
 from datetime import date, time
+from unittest import mock
+
+from django.core.cache import cache
 
 from users.models import CustomUser
 from attendance.models import Attendance
 from attendance_summary.models import AttendanceSummary
+from attendance_summary import signals as summary_signals
+from overtimehours.models import OvertimeHours
+from schedule.models import Schedule
+from shared.tasks import drain_recompute_queue
 
 
 class AttendanceSummaryModelTestCase(TestCase):
@@ -53,3 +60,103 @@ class AttendanceSummaryModelTestCase(TestCase):
     def test_delete_attendance_summary(self):
         self.summary.delete()
         self.assertEqual(AttendanceSummary.objects.count(), 0)
+
+
+def drain_inline(test_case):
+    """Run the debounced recompute drain inline, when the marks commit, instead of going through the broker."""
+    patcher = mock.patch.object(drain_recompute_queue, "apply_async", side_effect=lambda countdown: drain_recompute_queue())
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+class ScheduleOvertimeUpdateTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        drain_inline(self)
+        self.user = CustomUser.objects.create_user(email="scoped@example.com", password="password", role="employee")
+        self.schedule = Schedule.objects.create(
+            user_id=self.user,
+            days=["Monday"],
+            payroll_period_start=date(2025, 4, 1),
+            payroll_period_end=date(2025, 4, 14),
+            hours=8,
+            bi_weekly_start=date(2025, 4, 1),
+            nightdiff=[date(2025, 4, 2)],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inside = self.create_summary(date(2025, 4, 2))
+            self.outside = self.create_summary(date(2025, 3, 20))
+        OvertimeHours.objects.filter(attendancesummary=self.outside).update(nightdiff=99)
+
+    def create_summary(self, day):
+        attendance = Attendance.objects.create(user=self.user, date=day, status="Present",
+                                               check_in_time=time(9, 0), check_out_time=time(18, 0))
+        return AttendanceSummary.objects.create(user_id=self.user, attendance_id=attendance, date=day,
+                                                actual_hours=8, overtime_hours=1, late_minutes=0, undertime=0)
+
+    def test_only_summaries_in_the_period_are_recomputed(self):
+        self.schedule.nightdiff = [date(2025, 4, 2), date(2025, 4, 3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.save()
+
+        self.assertEqual(OvertimeHours.objects.get(attendancesummary=self.inside).nightdiff, 16)
+        self.assertEqual(OvertimeHours.objects.get(attendancesummary=self.outside).nightdiff, 99)
+
+    def test_moved_period_recomputes_old_and_new_summaries(self):
+        self.schedule.payroll_period_start = date(2025, 3, 18)
+        self.schedule.payroll_period_end = date(2025, 3, 31)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.save()
+
+        self.assertEqual(OvertimeHours.objects.get(attendancesummary=self.inside).nightdiff, 0)
+        self.assertEqual(OvertimeHours.objects.get(attendancesummary=self.outside).nightdiff, 8)
+
+    def test_saves_without_overtime_changes_are_skipped(self):
+        with mock.patch("attendance_summary.signals.mark_dirty") as update:
+            self.schedule.regularholiday = [date(2025, 4, 9)]
+            self.schedule.save(update_fields=["regularholiday", "specialholiday"])
+            self.schedule.save()
+
+        update.assert_not_called()
+
+
+class OvertimeHoursBatchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        drain_inline(self)
+        self.summaries = []
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_summaries()
+
+    def create_summaries(self):
+        for number in range(3):
+            user = CustomUser.objects.create_user(email=f"batch{number}@example.com", password="password", role="employee")
+            Schedule.objects.create(
+                user_id=user,
+                days=["Monday"],
+                payroll_period_start=date(2025, 4, 1),
+                payroll_period_end=date(2025, 4, 14),
+                hours=8,
+                bi_weekly_start=date(2025, 4, 1),
+                restday=number,
+            )
+            attendance = Attendance.objects.create(user=user, date=date(2025, 4, 1), status="Present",
+                                                   check_in_time=time(9, 0), check_out_time=time(18, 0))
+            self.summaries.append(AttendanceSummary.objects.create(
+                user_id=user, attendance_id=attendance, date=date(2025, 4, 1),
+                actual_hours=8, overtime_hours=1, late_minutes=0, undertime=0,
+            ))
+
+    def test_many_summaries_upsert_in_constant_queries(self):
+        AttendanceSummary.objects.update(overtime_hours=4)
+        OvertimeHours.objects.filter(attendancesummary=self.summaries[0]).delete()
+
+        with self.assertNumQueries(3):
+            written = summary_signals.update_overtime_hours_many([summary.id for summary in self.summaries])
+
+        self.assertEqual(written, 3)
+        self.assertEqual(OvertimeHours.objects.count(), 3)
+        self.assertEqual(
+            sorted(OvertimeHours.objects.values_list('regularot', 'restday')),
+            [(4, 0), (4, 1), (4, 2)],
+        )
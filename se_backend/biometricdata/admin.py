@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import BiometricData
+from .models import BiometricData, DeviceSyncState, Terminal
 
 # Register your models here.
-admin.site.register(BiometricData)
\ No newline at end of file
+admin.site.register(BiometricData)
+admin.site.register(DeviceSyncState)
+admin.site.register(Terminal)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+from django.utils.timezone import make_aware
+
+from .models import BiometricData
+from .services import replay_attendance
+from shared.models import JobCheckpoint
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 200
+BACKFILL_WINDOW_DAYS = 31
+
+
+def get_window_punches(start, end):
+    """Punches that can pair into the work days between start and end, as replay_attendance reads them."""
+    return BiometricData.objects.filter(
+        time__gte=make_aware(datetime.combine(start - timedelta(days=1), datetime.min.time())),
+        time__lt=make_aware(datetime.combine(end + timedelta(days=2), datetime.min.time())),
+    )
+
+
+def get_emp_ids(start, end, after_emp_id=None, through_emp_id=None, emp_from=None, emp_to=None, limit=None):
+    """
+    Distinct employee numbers with punches in the window, in order. Paginated by keyset on emp_id,
+    which leads the unique punch index, so each page is an index range scan however far the job has got.
+    """
+    punches = get_window_punches(start, end)
+    if after_emp_id is not None:
+        punches = punches.filter(emp_id__gt=after_emp_id)
+    if through_emp_id is not None:
+        punches = punches.filter(emp_id__lte=through_emp_id)
+    if emp_from is not None:
+        punches = punches.filter(emp_id__gte=emp_from)
+    if emp_to is not None:
+        punches = punches.filter(emp_id__lte=emp_to)
+
+    emp_ids = punches.order_by('emp_id').values_list('emp_id', flat=True).distinct()
+    return list(emp_ids[:limit] if limit else emp_ids)
+
+
+def get_job_checkpoint(name, restart=False):
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=name)
+    if restart or checkpoint.completed:
+        checkpoint.position, checkpoint.processed, checkpoint.completed = {}, 0, False
+        checkpoint.save()
+    return checkpoint
+
+
+def get_shard_name(emp_from, emp_to):
+    return f"{'' if emp_from is None else emp_from}-{'' if emp_to is None else emp_to}"
+
+
+def get_shard_checkpoint(start, end, restart=False):
+    return get_job_checkpoint(f"backfill_attendance:{start}:{end}:shards", restart=restart)
+
+
+def get_shard_ranges(start, end, shards, restart=False):
+    """
+    Split the employee numbers into at most `shards` contiguous (emp_from, emp_to) ranges, balanced on the employees
+    with punches in the window. The first range is open below and the last open above, so together they cover every
+    employee number. The ranges are stored on the job's checkpoint when it starts, and a resumed job reuses them even
+    if new employees have punched since, so every shard finds its own checkpoint again.
+    """
+    checkpoint = get_shard_checkpoint(start, end, restart=restart)
+    if "ranges" in checkpoint.position:
+        return [tuple(shard) for shard in checkpoint.position["ranges"]]
+
+    emp_ids = get_emp_ids(start, end)
+    size = -(-len(emp_ids) // max(shards, 1)) or 1
+    firsts = emp_ids[size::size]
+    ranges = list(zip([None, *firsts], [emp_id - 1 for emp_id in firsts] + [None]))
+
+    checkpoint.position = {"ranges": ranges}
+    checkpoint.save(update_fields=["position", "updated_at"])
+    return ranges
+
+
+def complete_shard_ranges(start, end):
+    """Mark a sharded job done, so the next run splits the employees afresh."""
+    checkpoint = get_shard_checkpoint(start, end)
+    checkpoint.completed = True
+    checkpoint.save(update_fields=["completed", "updated_at"])
+
+
+def get_backfill_checkpoint(start, end, emp_from=None, emp_to=None, restart=False):
+    return get_job_checkpoint(f"backfill_attendance:{start}:{end}:{get_shard_name(emp_from, emp_to)}", restart=restart)
+
+
+def backfill_attendance(start, end, emp_from=None, emp_to=None, chunk_size=BACKFILL_CHUNK_SIZE,
+                        window_days=BACKFILL_WINDOW_DAYS, restart=False, progress=None):
+    """
+    Rebuild Attendance from the stored punches of every employee in [emp_from, emp_to] over the work days
+    between start and end. Employees are taken a chunk at a time and replayed window by window, so memory stays
+    bounded by chunk_size x window_days of punches; the checkpoint is saved after each window, and a rerun
+    resumes after the last one saved. Disjoint employee ranges have their own checkpoints and can run in parallel.
+
+    `progress`, when given, is called with (checkpoint, metrics) after each chunk. Returns the checkpoint.
+    """
+    checkpoint = get_backfill_checkpoint(start, end, emp_from, emp_to, restart=restart)
+    position = checkpoint.position
+    days = position.get("days", 0)
+    started = time.monotonic()
+    employees_done = 0
+
+    while True:
+        after_emp_id = position.get("after_emp_id")
+        if "through_emp_id" in position:
+            # Resuming inside a chunk: take the same employees again and carry on from the next window
+            emp_ids = get_emp_ids(start, end, after_emp_id=after_emp_id, through_emp_id=position["through_emp_id"],
+                                  emp_from=emp_from, emp_to=emp_to)
+            next_date = date.fromisoformat(position["next_date"])
+        else:
+            emp_ids = get_emp_ids(start, end, after_emp_id=after_emp_id, emp_from=emp_from, emp_to=emp_to,
+                                  limit=chunk_size)
+            next_date = start
+        if not emp_ids:
+            break
+
+        while next_date <= end:
+            window_end = min(next_date + timedelta(days=window_days - 1), end)
+            days += len(replay_attendance(next_date, window_end, emp_ids=emp_ids))
+            next_date = window_end + timedelta(days=1)
+
+            position = {"after_emp_id": after_emp_id, "through_emp_id": emp_ids[-1],
+                        "next_date": next_date.isoformat(), "days": days}
+            checkpoint.position = position
+            checkpoint.save(update_fields=["position", "updated_at"])
+
+        position = {"after_emp_id": emp_ids[-1], "days": days}
+        checkpoint.position = position
+        checkpoint.processed += len(emp_ids)
+        checkpoint.save(update_fields=["position", "processed", "updated_at"])
+        employees_done += len(emp_ids)
+
+        elapsed = time.monotonic() - started
+        metrics = {
+            "employees": checkpoint.processed,
+            "days": days,
+            "last_emp_id": emp_ids[-1],
+            "seconds": round(elapsed, 3),
+            "employees_per_second": round(employees_done / elapsed, 1) if elapsed else employees_done,
+        }
+        logger.info(f"[backfill_attendance] {checkpoint.name}: {metrics['employees']} employees, {days} days rebuilt, "
+                    f"through emp_id {emp_ids[-1]}, {metrics['employees_per_second']} employees/s")
+        if progress:
+            progress(checkpoint, metrics)
+
+    checkpoint.completed = True
+    checkpoint.save(update_fields=["completed", "updated_at"])
+    return checkpoint
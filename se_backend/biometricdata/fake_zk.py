@@ -0,0 +1,55 @@
+import time
+
+from zk.attendance import Attendance
+from zk.exception import ZKNetworkError
+
+
+class FakeZK:
+    """
+    In-process stand-in for a pyzk ZK terminal, used to test and benchmark device syncs without hardware.
+    Implements the subset of the ZK connection API the sync uses and counts full log transfers.
+    A delay simulates a slow link and offline=True a terminal that cannot be reached.
+    """
+
+    def __init__(self, records=None, delay=0, offline=False):
+        self.attendance = list(records or [])
+        self.delay = delay
+        self.offline = offline
+        self.records = 0
+        self.transfers = 0
+        self.connected = False
+        self.enabled = True
+
+    def add_punch(self, emp_id, timestamp, status=1, punch=0):
+        self.attendance.append(Attendance(str(emp_id), timestamp, status, punch=punch, uid=len(self.attendance) + 1))
+
+    def connect(self):
+        time.sleep(self.delay)
+        if self.offline:
+            raise ZKNetworkError("can't reach device (ping)")
+        self.connected = True
+        return self
+
+    def disconnect(self):
+        self.connected = False
+        return True
+
+    def disable_device(self):
+        self.enabled = False
+        return True
+
+    def enable_device(self):
+        self.enabled = True
+        return True
+
+    def read_sizes(self):
+        self.records = len(self.attendance)
+        return True
+
+    def get_attendance(self):
+        self.transfers += 1
+        return list(self.attendance)
+
+    def clear_attendance(self):
+        self.attendance = []
+        return True
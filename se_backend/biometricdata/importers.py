@@ -0,0 +1,123 @@
+import csv
+import logging
+import time
+from datetime import datetime
+
+from django.utils import timezone
+
+from .pairing import get_punch_state
+from .services import INGEST_BATCH_SIZE, ingest_punches
+
+logger = logging.getLogger(__name__)
+
+ATTLOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_REPORTED_ERRORS = 100
+MAX_CODE_LENGTH = 50
+
+
+def make_punch(emp_id, timestamp, work_code, work_state, terminal_name, name=None):
+    """Validate the fields of one exported punch and return it as a BiometricData row. Raises ValueError."""
+    emp_id = int(str(emp_id).strip())
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+
+    work_code, work_state = str(work_code).strip() or "N/A", str(work_state).strip()
+    if len(work_code) > MAX_CODE_LENGTH or len(work_state) > MAX_CODE_LENGTH:
+        raise ValueError(f"work_code and work_state are limited to {MAX_CODE_LENGTH} characters")
+
+    return {
+        "emp_id": emp_id,
+        "name": (name or "").strip()[:255] or f"Employee {emp_id}",
+        "time": timestamp,
+        "work_code": work_code,
+        "work_state": work_state,
+        "terminal_name": terminal_name,
+    }
+
+
+def parse_attlog(lines, terminal_name):
+    """
+    Parse a ZKTeco attlog.dat export line by line. Each line is tab separated:
+    user id, timestamp, verify mode, punch state, work code and a reserved column.
+    Yields (line_number, punch, error) with exactly one of punch and error set.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            columns = line.strip().split("\t")
+            if len(columns) < 2:
+                raise ValueError("expected at least a user id and a timestamp")
+            punch_state = get_punch_state(columns[3].strip()) if len(columns) > 3 else ""
+            work_code = columns[4] if len(columns) > 4 else ""
+            timestamp = datetime.strptime(columns[1].strip(), ATTLOG_TIME_FORMAT)
+            yield line_number, make_punch(columns[0], timestamp, work_code, punch_state, terminal_name), None
+        except ValueError as e:
+            yield line_number, None, str(e)
+
+
+def parse_punch_csv(lines, terminal_name):
+    """
+    Parse a CSV export with an emp_id,time[,name,work_code,work_state] header.
+    Yields (line_number, punch, error) with exactly one of punch and error set.
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        try:
+            if not row.get("emp_id") or not row.get("time"):
+                raise ValueError("emp_id and time are required")
+            timestamp = datetime.fromisoformat(row["time"].strip())
+            punch = make_punch(row["emp_id"], timestamp, row.get("work_code") or "", row.get("work_state") or "",
+                               terminal_name, name=row.get("name"))
+            yield reader.line_num, punch, None
+        except ValueError as e:
+            yield reader.line_num, None, str(e)
+
+
+PARSERS = {
+    "attlog": parse_attlog,
+    "csv": parse_punch_csv,
+}
+
+
+def guess_format(filename):
+    return "csv" if filename and filename.lower().endswith(".csv") else "attlog"
+
+
+def import_punch_file(lines, terminal_name, file_format="attlog", chunk_size=INGEST_BATCH_SIZE):
+    """
+    Stream the punches of an exported file into BiometricData in chunks, so memory stays bounded by the
+    chunk size however long the file is. Duplicates of stored punches, in the file or across files,
+    are skipped by the ingestion insert. Returns a report of the counts, the first rejects and the throughput.
+    """
+    started = time.monotonic()
+    report = {"read": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+
+    def flush(chunk):
+        inserted = len(ingest_punches(chunk))
+        report["inserted"] += inserted
+        report["duplicates"] += len(chunk) - inserted
+
+    chunk = []
+    for line_number, punch, error in PARSERS[file_format](lines, terminal_name):
+        report["read"] += 1
+        if error:
+            report["rejected"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "error": error})
+            continue
+
+        chunk.append(punch)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+
+    if chunk:
+        flush(chunk)
+
+    report["seconds"] = round(time.monotonic() - started, 3)
+    report["punches_per_second"] = round(report["read"] / report["seconds"]) if report["seconds"] else report["read"]
+
+    logger.info(f"[import_punch_file] {terminal_name}: {report['read']} punches read, {report['inserted']} inserted, "
+                f"{report['duplicates']} duplicates, {report['rejected']} rejected in {report['seconds']}s")
+    return report
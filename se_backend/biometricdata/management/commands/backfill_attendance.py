@@ -0,0 +1,86 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from biometricdata.backfill import (
+    BACKFILL_CHUNK_SIZE,
+    BACKFILL_WINDOW_DAYS,
+    backfill_attendance,
+    complete_shard_ranges,
+    get_shard_name,
+    get_shard_ranges,
+)
+
+
+def backfill_shard(args):
+    start, end, emp_from, emp_to, options = args
+    checkpoint = backfill_attendance(start, end, emp_from=emp_from, emp_to=emp_to, **options)
+    return emp_from, emp_to, checkpoint.processed, checkpoint.position.get("days", 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild Attendance from the stored punches of the work days between --start and --end, a chunk of "
+        "employees at a time. Resumes from the last checkpoint unless --restart is given; --shards splits the "
+        "employees into ranges that run in parallel, each with its own checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, type=date.fromisoformat, help="First work day (YYYY-MM-DD)")
+        parser.add_argument("--end", required=True, type=date.fromisoformat, help="Last work day (YYYY-MM-DD)")
+        parser.add_argument("--emp-from", type=int, help="Lowest employee number of this shard")
+        parser.add_argument("--emp-to", type=int, help="Highest employee number of this shard")
+        parser.add_argument("--shards", type=int, default=1, help="Employee ranges to run in parallel processes")
+        parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE, help="Employees per chunk")
+        parser.add_argument("--window-days", type=int, default=BACKFILL_WINDOW_DAYS, help="Days replayed at once")
+        parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        job_options = {
+            "chunk_size": options["chunk_size"],
+            "window_days": options["window_days"],
+            "restart": options["restart"],
+        }
+        started = time.monotonic()
+
+        if options["shards"] <= 1:
+            checkpoint = backfill_attendance(start, end, emp_from=options["emp_from"], emp_to=options["emp_to"],
+                                             progress=self.report, **job_options)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {checkpoint.position.get('days', 0)} attendance days for {checkpoint.processed} employees "
+                f"in {time.monotonic() - started:.1f}s"
+            ))
+            return
+
+        shards = get_shard_ranges(start, end, options["shards"], restart=options["restart"])
+        # Forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=len(shards) or 1,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=connections.close_all,
+        ) as executor:
+            results = executor.map(backfill_shard, [(start, end, emp_from, emp_to, job_options)
+                                                    for emp_from, emp_to in shards])
+            for emp_from, emp_to, employees, days in results:
+                self.stdout.write(f"Shard {get_shard_name(emp_from, emp_to)}: {days} days for {employees} employees, "
+                                  f"{time.monotonic() - started:.1f}s elapsed")
+        complete_shard_ranges(start, end)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {len(shards)} shards in {time.monotonic() - started:.1f}s"
+        ))
+
+    def report(self, checkpoint, metrics):
+        self.stdout.write(
+            f"[{metrics['employees']} employees] {metrics['days']} days rebuilt, through emp_id {metrics['last_emp_id']}, "
+            f"{metrics['employees_per_second']} employees/s, {metrics['seconds']:.1f}s elapsed"
+        )
@@ -0,0 +1,49 @@
+import time as timer
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from biometricdata.fake_zk import FakeZK
+from biometricdata.sync import sync_device
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync a fake ZKTeco terminal holding --records punches, then again after --new more arrive. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=100_000, help="Punches already on the terminal")
+        parser.add_argument("--new", type=int, default=500, help="Punches added before the incremental sync")
+        parser.add_argument("--employees", type=int, default=500, help="Distinct employee numbers punching")
+
+    def handle(self, *args, **options):
+        device = FakeZK()
+        start = datetime(2025, 1, 1, 8, 0)
+        for index in range(options["records"] + options["new"]):
+            device.add_punch(index % options["employees"] + 1, start + timedelta(seconds=index * 7))
+        new_records = device.attendance[options["records"]:]
+        device.attendance = device.attendance[:options["records"]]
+
+        with transaction.atomic():
+            started = timer.perf_counter()
+            full = sync_device(device, "Benchmark Terminal")
+            full_seconds = timer.perf_counter() - started
+
+            device.attendance.extend(new_records)
+            started = timer.perf_counter()
+            incremental = sync_device(device, "Benchmark Terminal")
+            incremental_seconds = timer.perf_counter() - started
+
+            started = timer.perf_counter()
+            unchanged = sync_device(device, "Benchmark Terminal")
+            unchanged_seconds = timer.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"initial sync:     {full} punches in {full_seconds:.2f}s ({full / full_seconds:.0f}/s)")
+        self.stdout.write(f"incremental sync: {incremental} punches in {incremental_seconds * 1000:.1f} ms")
+        self.stdout.write(f"unchanged device: {unchanged} punches in {unchanged_seconds * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"log transfers:    {device.transfers}"))
@@ -0,0 +1,41 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from biometricdata.streams import STREAM_READ_COUNT, consume_punches
+
+
+class Command(BaseCommand):
+    help = (
+        "Drain buffered punch uploads from the biometric stream into BiometricData and Attendance. "
+        "Run several with different --consumer names to scale out; they share one consumer group."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}", help="Unique consumer name")
+        parser.add_argument("--count", type=int, default=STREAM_READ_COUNT, help="Messages per batch")
+        parser.add_argument("--block-ms", type=int, default=5000, help="How long to wait for new messages")
+        parser.add_argument("--once", action="store_true", help="Stop once the stream is drained")
+
+    def handle(self, *args, **options):
+        if settings.BIOMETRIC_STREAM_URL.startswith("local://"):
+            raise CommandError("local:// streams only live inside the web process; point BIOMETRIC_STREAM_URL at Redis")
+
+        processed = 0
+        started = time.monotonic()
+        while True:
+            # Drop connections the database closed while we were blocked on the stream, like a request would
+            close_old_connections()
+            acknowledged = consume_punches(options["consumer"], count=options["count"], block_ms=options["block_ms"])
+            processed += acknowledged
+            if acknowledged:
+                self.stdout.write(f"[{options['consumer']}] {processed} messages ingested, "
+                                  f"{time.monotonic() - started:.1f}s elapsed")
+            elif options["once"]:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Stream drained: {processed} messages ingested"))
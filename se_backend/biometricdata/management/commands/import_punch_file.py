@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from biometricdata.importers import PARSERS, guess_format, import_punch_file
+from biometricdata.services import INGEST_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Stream a ZKTeco attlog.dat or CSV export into BiometricData in chunks and report the throughput and rejects."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the exported file")
+        parser.add_argument("--terminal", required=True, help="Name of the terminal the file was exported from")
+        parser.add_argument("--format", choices=sorted(PARSERS), help="File format; guessed from the extension if omitted")
+        parser.add_argument("--chunk-size", type=int, default=INGEST_BATCH_SIZE, help="Punches per insert")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        file_format = options["format"] or guess_format(options["path"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", errors="replace", newline="") as lines:
+                report = import_punch_file(lines, options["terminal"], file_format, options["chunk_size"])
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        for error in report["errors"]:
+            self.stdout.write(self.style.WARNING(f"line {error['line']}: {error['error']}"))
+        if report["rejected"] > len(report["errors"]):
+            self.stdout.write(self.style.WARNING(f"... and {report['rejected'] - len(report['errors'])} more rejects"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['read']} punches read, {report['inserted']} inserted, {report['duplicates']} duplicates, "
+            f"{report['rejected']} rejected in {report['seconds']}s ({report['punches_per_second']}/s)"
+        ))
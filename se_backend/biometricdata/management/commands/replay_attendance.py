@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biometricdata.services import replay_attendance
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild Attendance for the work days between --start and --end by re-pairing the stored punches. "
+        "Days without punches are left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, type=date.fromisoformat, help="First work day (YYYY-MM-DD)")
+        parser.add_argument("--end", required=True, type=date.fromisoformat, help="Last work day (YYYY-MM-DD)")
+        parser.add_argument("--emp-id", type=int, action="append", dest="emp_ids",
+                            help="Only replay this employee number; may be repeated")
+
+    def handle(self, *args, **options):
+        if options["start"] > options["end"]:
+            raise CommandError("--start must not be after --end")
+
+        records = replay_attendance(options["start"], options["end"], emp_ids=options["emp_ids"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(records)} attendance days between {options['start']} and {options['end']}"
+        ))
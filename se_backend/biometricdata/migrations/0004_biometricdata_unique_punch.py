@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometricdata', '0003_remove_biometricdata_user_id'),
+    ]
+
+    operations = [
+        # Re-uploads stored the same punch more than once; keep the first copy so the constraint can be created
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM biometricdata_biometricdata duplicate
+                USING biometricdata_biometricdata original
+                WHERE duplicate.emp_id = original.emp_id
+                  AND duplicate.time = original.time
+                  AND duplicate.terminal_name = original.terminal_name
+                  AND duplicate.id > original.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='biometricdata',
+            constraint=models.UniqueConstraint(fields=('emp_id', 'time', 'terminal_name'), name='unique_biometric_punch'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometricdata', '0004_biometricdata_unique_punch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceSyncState',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('terminal_name', models.CharField(max_length=100, unique=True)),
+                ('last_record_index', models.IntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometricdata', '0005_devicesyncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Terminal',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('ip_address', models.GenericIPAddressField()),
+                ('port', models.IntegerField(default=4370)),
+                ('password', models.IntegerField(default=0)),
+                ('timeout', models.FloatField(default=60)),
+                ('active', models.BooleanField(default=True)),
+                ('consecutive_failures', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometricdata', '0006_terminal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicesyncstate',
+            name='last_record_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='devicesyncstate',
+            name='last_record_uid',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -9,5 +9,43 @@ class BiometricData(models.Model):
     work_state = models.CharField(max_length=50)
     terminal_name = models.CharField(max_length=100)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["emp_id", "time", "terminal_name"], name="unique_biometric_punch"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.time}"
+
+
+class DeviceSyncState(models.Model):
+    """High-water mark of the records already pulled from a biometric terminal."""
+    id = models.AutoField(primary_key=True)
+    terminal_name = models.CharField(max_length=100, unique=True)
+    last_record_index = models.IntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    # The record at last_record_index - 1, to tell a log that was cleared and refilled past the index
+    last_record_uid = models.IntegerField(null=True, blank=True)
+    last_record_time = models.DateTimeField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.terminal_name} - {self.last_record_index} ({self.last_timestamp})"
+
+
+class Terminal(models.Model):
+    """A ZKTeco terminal polled by the concurrent poller, with its backoff and circuit breaker state."""
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=100, unique=True)
+    ip_address = models.GenericIPAddressField()
+    port = models.IntegerField(default=4370)
+    password = models.IntegerField(default=0)
+    timeout = models.FloatField(default=60)
+    active = models.BooleanField(default=True)
+    consecutive_failures = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+
     def __str__(self):
-        return f"{self.name} - {self.time}"
\ No newline at end of file
+        return f"{self.name} ({self.ip_address}:{self.port})"
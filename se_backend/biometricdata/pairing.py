@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.utils.timezone import localtime
+
+# ZKTeco punch state codes, as stored in BiometricData.work_state
+PUNCH_STATES = {
+    0: "Check-In",
+    1: "Check-Out",
+    2: "Break-Out",
+    3: "Break-In",
+    4: "OT-In",
+    5: "OT-Out",
+}
+
+IN = "in"
+OUT = "out"
+BREAK = "break"
+
+IN_STATES = {"check-in", "ot-in", "in"}
+OUT_STATES = {"check-out", "ot-out", "out"}
+BREAK_STATES = {"break-out", "break-in"}
+
+# The longest time an open IN can wait for its OUT, which is what lets a session run past midnight
+MAX_SESSION = timedelta(hours=16)
+
+
+def get_punch_state(code):
+    """Name a device punch state code, keeping unknown codes as they are."""
+    try:
+        return PUNCH_STATES.get(int(code), str(code))
+    except (TypeError, ValueError):
+        return str(code)
+
+
+def get_direction(work_state):
+    """IN, OUT, BREAK, or None when the state does not say (numeric legacy values, blanks)."""
+    state = (work_state or "").strip().lower()
+    if state in IN_STATES:
+        return IN
+    if state in OUT_STATES:
+        return OUT
+    if state in BREAK_STATES:
+        return BREAK
+    return None
+
+
+class WorkDay:
+    """
+    The punches of one employee's work day. The first punch that is not an OUT is the check-in
+    and the last punch the check-out, which may fall after midnight.
+    """
+
+    def __init__(self, key, date):
+        self.key = key
+        self.date = date
+        self.first = None
+        self.first_in = None
+        self.last = None
+
+    def add(self, stamp, direction):
+        if self.first is None:
+            self.first = stamp
+        if self.first_in is None and direction != OUT:
+            self.first_in = stamp
+        self.last = stamp
+
+    @property
+    def check_in(self):
+        return self.first_in or self.first
+
+    @property
+    def check_out(self):
+        return self.last if self.last >= self.check_in else self.check_in
+
+
+def pair_punches(punches):
+    """
+    Group a stream of (key, time, work_state) punches sorted by key then time into WorkDays, in one pass.
+
+    A punch on the day's date always joins it. After midnight, an OUT or a break punch still joins it while
+    a session opened by an IN the day before is within MAX_SESSION; breaks keep the session open and an OUT
+    closes it. Anything else, including punches without a state, starts a new work day.
+    """
+    day = None
+    open_since = None
+
+    for key, stamp, work_state in punches:
+        stamp = localtime(stamp)
+        direction = get_direction(work_state)
+
+        if day is not None:
+            continues = key == day.key and (stamp.date() == day.date or (
+                open_since is not None and stamp - open_since <= MAX_SESSION and direction in (OUT, BREAK)
+            ))
+            if not continues:
+                yield day
+                day = None
+
+        if day is None:
+            day = WorkDay(key, stamp.date())
+            open_since = None
+
+        day.add(stamp, direction)
+        if direction == IN and open_since is None:
+            open_since = stamp
+        elif direction == OUT:
+            open_since = None
+
+    if day is not None:
+        yield day
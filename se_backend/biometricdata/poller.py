@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.utils import timezone
+from zk import ZK
+
+from .models import DeviceSyncState, Terminal
+from .sync import SYNC_CHUNK_SIZE, read_new_records, store_records
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 15 * 60
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN_SECONDS = 60 * 60
+
+POLL_LOCK_KEY = "biometricdata:poll_terminals:lock"
+POLL_LOCK_MARGIN_SECONDS = 60
+READ_BUSY_KEY = "biometricdata:poll_terminals:reading:{terminal_id}"
+# Only a safety net for a worker killed mid-read; the read thread clears its key when it returns
+READ_BUSY_TTL_SECONDS = 30 * 60
+
+
+def make_device(terminal):
+    return ZK(terminal.ip_address, port=terminal.port, timeout=5, password=terminal.password,
+              force_udp=False, ommit_ping=False)
+
+
+def get_retry_delay(failures):
+    """
+    Exponential backoff after each consecutive failure. Once the threshold is reached the circuit opens:
+    the terminal is left alone for the cooldown and then gets a single probe, which reopens it on failure.
+    """
+    if failures >= CIRCUIT_FAILURE_THRESHOLD:
+        return timedelta(seconds=CIRCUIT_COOLDOWN_SECONDS)
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (failures - 1), BACKOFF_MAX_SECONDS))
+
+
+def get_poll_lock_timeout():
+    """How long a poll cycle may hold the lock: longer than the slowest terminal is allowed to take."""
+    slowest = Terminal.objects.filter(active=True).aggregate(timeout=Max('timeout'))['timeout'] or 0
+    return int(slowest) + POLL_LOCK_MARGIN_SECONDS
+
+
+def get_busy_key(terminal_id):
+    return READ_BUSY_KEY.format(terminal_id=terminal_id)
+
+
+def claim_terminals(terminals):
+    """
+    Claim the terminals for a read. A terminal whose read from an earlier cycle timed out but is still running
+    holds its device session, so it is left out rather than opening a second one.
+    """
+    claimed = {}
+    for terminal_id, terminal in terminals.items():
+        if cache.add(get_busy_key(terminal_id), True, timeout=READ_BUSY_TTL_SECONDS):
+            claimed[terminal_id] = terminal
+        else:
+            logger.warning(f"[poll_terminals] {terminal.name} is still busy with an earlier read, skipping it")
+    return claimed
+
+
+def read_terminal(terminal_id, device, state):
+    """Read one terminal and release its claim once the read returns, however long after the cycle that is."""
+    try:
+        return read_new_records(device, state)
+    finally:
+        cache.delete(get_busy_key(terminal_id))
+
+
+def get_due_terminals(now):
+    return list(Terminal.objects.filter(active=True).filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)))
+
+
+async def read_terminals(devices, states, timeout_of):
+    """
+    Read every terminal at once, each in its own thread and under its own timeout.
+    Returns {terminal_id: (logs, total)} for the reads that finished and {terminal_id: error} for the rest.
+    """
+    loop = asyncio.get_running_loop()
+    # A device that ignores its socket timeout keeps its thread busy; the cycle does not wait for it
+    executor = ThreadPoolExecutor(max_workers=max(len(devices), 1))
+
+    async def read(terminal_id):
+        return await asyncio.wait_for(
+            loop.run_in_executor(executor, read_terminal, terminal_id, devices[terminal_id], states[terminal_id]),
+            timeout=timeout_of[terminal_id],
+        )
+
+    try:
+        results = await asyncio.gather(*(read(terminal_id) for terminal_id in devices), return_exceptions=True)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    reads, errors = {}, {}
+    for terminal_id, result in zip(devices, results):
+        if isinstance(result, BaseException):
+            errors[terminal_id] = result
+        else:
+            reads[terminal_id] = result
+    return reads, errors
+
+
+def poll_terminals(device_factory=make_device, chunk_size=SYNC_CHUNK_SIZE):
+    """
+    Poll every due terminal concurrently, so a cycle takes as long as the slowest terminal rather than the sum,
+    then ingest everything read with batched inserts. Failing terminals back off and eventually trip their
+    circuit without holding up the others. Returns the number of new punches stored.
+    """
+    now = timezone.now()
+    terminals = claim_terminals({terminal.id: terminal for terminal in get_due_terminals(now)})
+    if not terminals:
+        return 0
+
+    states = {
+        terminal.id: DeviceSyncState.objects.get_or_create(terminal_name=terminal.name)[0]
+        for terminal in terminals.values()
+    }
+    devices = {terminal_id: device_factory(terminal) for terminal_id, terminal in terminals.items()}
+    timeouts = {terminal_id: terminal.timeout for terminal_id, terminal in terminals.items()}
+
+    reads, errors = asyncio.run(read_terminals(devices, states, timeouts))
+
+    inserted = store_records(
+        [(states[terminal_id], logs, total) for terminal_id, (logs, total) in reads.items()],
+        chunk_size=chunk_size,
+    )
+
+    finished = timezone.now()
+    for terminal_id, terminal in terminals.items():
+        if terminal_id in reads:
+            terminal.consecutive_failures = 0
+            terminal.next_attempt_at = None
+            terminal.last_success_at = finished
+            terminal.last_error = ""
+        else:
+            error = errors[terminal_id]
+            terminal.consecutive_failures += 1
+            terminal.next_attempt_at = finished + get_retry_delay(terminal.consecutive_failures)
+            terminal.last_error = str(error) or type(error).__name__
+            logger.warning(f"[poll_terminals] {terminal.name} failed {terminal.consecutive_failures} times in a row, "
+                           f"next attempt at {terminal.next_attempt_at}: {terminal.last_error}")
+        terminal.save(update_fields=["consecutive_failures", "next_attempt_at", "last_success_at", "last_error"])
+
+    logger.info(f"[poll_terminals] {len(reads)}/{len(terminals)} terminals read, {inserted} punches stored "
+                f"in {(finished - now).total_seconds():.1f}s")
+    return inserted
@@ -10,3 +10,14 @@ class BiometricDataSerializer(serializers.ModelSerializer):
         if isinstance(data, list):  # Handle list of objects
             return [super().to_internal_value(item) for item in data]
         return super().to_internal_value(data)
+
+
+class BiometricPunchSerializer(serializers.ModelSerializer):
+    """
+    Validates the punches of a bulk upload. Duplicates are resolved by the ON CONFLICT insert,
+    so the per-row uniqueness query is left out.
+    """
+    class Meta:
+        model = BiometricData
+        exclude = ['id']
+        validators = []
@@ -0,0 +1,194 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+from django.utils.timezone import localtime, make_aware
+
+from .models import BiometricData
+from .pairing import BREAK, IN, MAX_SESSION, OUT, get_direction, pair_punches
+from attendance.models import Attendance
+from attendance_summary.models import AttendanceSummary
+from attendance.tasks import schedule_recomputes_for_days
+from employment_info.services import resolve_many
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_SIZE = 5000
+
+PUNCH_COLUMNS = ('emp_id', 'name', 'time', 'work_code', 'work_state', 'terminal_name')
+
+
+def remove_absorbed_days(absorbed):
+    """
+    Delete the Attendance of (user_id, date) days whose punches were all paired into the previous work day.
+    Summaries pointing at them are moved to that previous day first, so the cascade cannot take them along.
+    """
+    if not absorbed:
+        return 0
+
+    dates = {day for _, day in absorbed} | {day - timedelta(days=1) for _, day in absorbed}
+    rows = Attendance.objects.filter(user_id__in={user_id for user_id, _ in absorbed}, date__in=dates)
+    ids = {(user_id, day): attendance_id for attendance_id, user_id, day in rows.values_list('id', 'user_id', 'date')}
+
+    # {stale attendance id: id of the previous day that absorbed it}
+    stale = {
+        ids[(user_id, day)]: ids[(user_id, day - timedelta(days=1))]
+        for user_id, day in absorbed
+        if (user_id, day) in ids and (user_id, day - timedelta(days=1)) in ids
+    }
+    if not stale:
+        return 0
+
+    AttendanceSummary.objects.filter(attendance_id__in=stale).update(attendance_id=Case(
+        *[When(attendance_id=stale_id, then=Value(previous_id)) for stale_id, previous_id in stale.items()]
+    ))
+    Attendance.objects.filter(id__in=stale).delete()
+    return len(stale)
+
+
+def replay_attendance(start, end, emp_ids=None):
+    """
+    Rebuild the Attendance of the work days in [start, end] from the stored punches, pairing them in a single pass
+    over one sorted read. Punches a day either side are read too, so sessions crossing the range edges pair correctly.
+    Days without punches are left alone, and so are days flagged as manual overrides. Returns the upserted rows.
+    """
+    window_start = make_aware(datetime.combine(start - timedelta(days=1), time.min))
+    window_end = make_aware(datetime.combine(end + timedelta(days=2), time.min))
+    punches = BiometricData.objects.filter(time__gte=window_start, time__lt=window_end)
+    if emp_ids is not None:
+        punches = punches.filter(emp_id__in=emp_ids)
+    punches = punches.order_by('emp_id', 'time').values_list('emp_id', 'time', 'work_state')
+
+    punch_dates = set()
+
+    def track(rows):
+        for key, stamp, work_state in rows:
+            punch_dates.add((key, localtime(stamp).date()))
+            yield key, stamp, work_state
+
+    days = [day for day in pair_punches(track(punches.iterator(chunk_size=INGEST_BATCH_SIZE))) if start <= day.date <= end]
+    users = resolve_many({key for key, _ in punch_dates})
+
+    spans = {}
+    unknown = set()
+    for day in days:
+        user_id = users.get(day.key)
+        if user_id is None:
+            unknown.add(day.key)
+            continue
+
+        # Two employee numbers of the same user share the day
+        check_in, check_out = day.check_in, day.check_out
+        if (user_id, day.date) in spans:
+            other_in, other_out = spans[(user_id, day.date)]
+            check_in, check_out = min(check_in, other_in), max(check_out, other_out)
+        spans[(user_id, day.date)] = (check_in, check_out)
+
+    # Dates whose punches now all belong to the previous work day, e.g. once a late-uploaded IN claims an early OUT
+    absorbed = {
+        (users[key], day) for key, day in punch_dates
+        if key in users and start <= day <= end and (users[key], day) not in spans
+    }
+
+    if unknown:
+        logger.warning(f"[replay_attendance] No associated user found for emp_ids {sorted(unknown)}. Skipping their punches.")
+
+    overridden = set(Attendance.objects.filter(
+        manual_override=True,
+        user_id__in={user_id for user_id, _ in spans.keys() | absorbed},
+        date__in={day for _, day in spans.keys() | absorbed},
+    ).values_list('user_id', 'date')) & (spans.keys() | absorbed)
+    if overridden:
+        logger.info(f"[replay_attendance] Keeping {len(overridden)} manually overridden attendance days")
+        spans = {key: span for key, span in spans.items() if key not in overridden}
+        absorbed -= overridden
+    if not spans and not absorbed:
+        return []
+
+    with transaction.atomic():
+        records = Attendance.objects.bulk_create(
+            [
+                Attendance(user_id=user_id, date=day, check_in_time=check_in.time(), check_out_time=check_out.time(),
+                           status="Present")
+                for (user_id, day), (check_in, check_out) in spans.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=['check_in_time', 'check_out_time'],
+            batch_size=INGEST_BATCH_SIZE,
+        )
+        remove_absorbed_days(absorbed)
+        schedule_recomputes_for_days(spans.keys() | absorbed)
+
+    return records
+
+
+def get_punch_days(punch):
+    """
+    The work days a new punch can change: its own date, the day before when it may close a session opened then,
+    and the day after when it opens a session that may run past midnight and claim that day's early punches.
+    """
+    stamp = localtime(punch.time)
+    direction = get_direction(punch.work_state)
+    since_midnight = stamp - stamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    days = {stamp.date()}
+    if direction in (OUT, BREAK) and since_midnight <= MAX_SESSION:
+        days.add(stamp.date() - timedelta(days=1))
+    if direction == IN and since_midnight + MAX_SESSION >= timedelta(days=1):
+        days.add(stamp.date() + timedelta(days=1))
+    return days
+
+
+def derive_attendance(punches):
+    """
+    Re-pair the work days the given punches can change, together with the punches already stored,
+    so uploads that arrive out of order still give the right check-in and check-out.
+    Returns the upserted Attendance rows.
+    """
+    if not punches:
+        return []
+
+    dates = set().union(*(get_punch_days(punch) for punch in punches))
+    return replay_attendance(min(dates), max(dates), emp_ids={punch.emp_id for punch in punches})
+
+
+def insert_new_punches(rows):
+    """
+    Insert many validated punches with INSERT ... ON CONFLICT DO NOTHING RETURNING.
+    Punches already stored under (emp_id, time, terminal_name) are skipped; only the new rows are returned.
+    """
+    table = connection.ops.quote_name(BiometricData._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(column) for column in PUNCH_COLUMNS)
+    row_placeholder = f"({', '.join(['%s'] * len(PUNCH_COLUMNS))})"
+
+    inserted = []
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), INGEST_BATCH_SIZE):
+            batch = rows[offset:offset + INGEST_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_placeholder] * len(batch))} "
+                f"ON CONFLICT ON CONSTRAINT unique_biometric_punch DO NOTHING "
+                f"RETURNING id, {columns}",
+                [row[column] for row in batch for column in PUNCH_COLUMNS],
+            )
+            inserted.extend(
+                BiometricData(**dict(zip(('id', *PUNCH_COLUMNS), values))) for values in cursor.fetchall()
+            )
+    return inserted
+
+
+def ingest_punches(rows):
+    """
+    Insert many validated punches and derive attendance from the ones that were new,
+    without the per-punch update_attendance signal. Returns the newly inserted BiometricData rows.
+    """
+    rows = list(rows)
+    with transaction.atomic():
+        punches = insert_new_punches(rows)
+        records = derive_attendance(punches)
+
+    logger.info(f"[ingest_punches] Ingested {len(punches)} new punches ({len(rows) - len(punches)} duplicates skipped) "
+                f"into {len(records)} attendance rows")
+    return punches
@@ -0,0 +1,221 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import InterfaceError, OperationalError
+
+from .services import ingest_punches
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_GROUP = "ingest"
+STREAM_READ_COUNT = 100
+STALE_AFTER_MS = 60 * 1000
+MAX_DELIVERIES = 5
+
+# Failures of the database itself rather than of the punches; they do not count towards MAX_DELIVERIES
+INFRASTRUCTURE_ERRORS = (OperationalError, InterfaceError)
+
+Message = namedtuple("Message", ["id", "fields", "deliveries"])
+
+
+def encode_punches(rows):
+    return json.dumps(rows, cls=DjangoJSONEncoder)
+
+
+def decode_punches(payload):
+    rows = json.loads(payload)
+    for row in rows:
+        row["time"] = datetime.fromisoformat(row["time"])
+    return rows
+
+
+class RedisPunchStream:
+    """
+    Punch buffer on a Redis stream. Consumers share one consumer group, so each message goes to a single consumer
+    and stays pending until acknowledged; messages of a consumer that died are claimed by the others once idle.
+    Acknowledged messages are deleted so the stream only holds unprocessed punches.
+    """
+
+    def __init__(self, url, name):
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.name = name
+        self.dead_letter_name = f"{name}:dead"
+        self._group_ready = False
+
+    def ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.name, CONSUMER_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def append(self, fields):
+        return self.client.xadd(self.name, fields)
+
+    def read(self, consumer, count, block_ms=None):
+        self.ensure_group()
+        response = self.client.xreadgroup(CONSUMER_GROUP, consumer, {self.name: ">"}, count=count, block=block_ms)
+        return [Message(message_id, fields, 1) for _, messages in response or [] for message_id, fields in messages]
+
+    def claim_stale(self, consumer, min_idle_ms, count):
+        self.ensure_group()
+        _, claimed, _ = self.client.xautoclaim(self.name, CONSUMER_GROUP, consumer, min_idle_ms, count=count)
+        if not claimed:
+            return []
+        pending = self.client.xpending_range(self.name, CONSUMER_GROUP, claimed[0][0], claimed[-1][0], len(claimed))
+        deliveries = {entry["message_id"]: entry["times_delivered"] for entry in pending}
+        return [Message(message_id, fields, deliveries.get(message_id, 1)) for message_id, fields in claimed]
+
+    def ack(self, message_ids):
+        if message_ids:
+            pipeline = self.client.pipeline()
+            pipeline.xack(self.name, CONSUMER_GROUP, *message_ids)
+            pipeline.xdel(self.name, *message_ids)
+            pipeline.execute()
+
+    def release(self, messages):
+        """Take back the current delivery of pending messages, so the retry does not count towards MAX_DELIVERIES."""
+        for message in messages:
+            self.client.xclaim(self.name, CONSUMER_GROUP, "released", 0, [message.id],
+                               retrycount=message.deliveries - 1, justid=True)
+
+    def dead_letter(self, message, error):
+        self.client.xadd(self.dead_letter_name, {**message.fields, "source_id": message.id, "error": error})
+        self.ack([message.id])
+
+
+class LocalPunchStream:
+    """
+    In-process stand-in for RedisPunchStream with the same consumer group semantics, for tests.
+    Messages only live in the process that appended them, so a separate consume_punches worker never sees them.
+    """
+
+    def __init__(self):
+        self.messages = OrderedDict()
+        self.pending = {}
+        self.dead_letters = []
+        self._sequence = 0
+        self._delivered_up_to = 0
+        self._lock = threading.Lock()
+
+    def append(self, fields):
+        with self._lock:
+            self._sequence += 1
+            message_id = f"{self._sequence}-0"
+            self.messages[message_id] = dict(fields)
+            return message_id
+
+    def read(self, consumer, count, block_ms=None):
+        with self._lock:
+            messages = []
+            for message_id, fields in self.messages.items():
+                if len(messages) >= count:
+                    break
+                if int(message_id.split("-")[0]) <= self._delivered_up_to:
+                    continue
+                self._delivered_up_to = int(message_id.split("-")[0])
+                self.pending[message_id] = [consumer, time.monotonic(), 1]
+                messages.append(Message(message_id, fields, 1))
+            return messages
+
+    def claim_stale(self, consumer, min_idle_ms, count):
+        with self._lock:
+            now = time.monotonic()
+            messages = []
+            for message_id, entry in self.pending.items():
+                if len(messages) >= count:
+                    break
+                if (now - entry[1]) * 1000 >= min_idle_ms:
+                    entry[:] = [consumer, now, entry[2] + 1]
+                    messages.append(Message(message_id, self.messages[message_id], entry[2]))
+            return messages
+
+    def ack(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                self.pending.pop(message_id, None)
+                self.messages.pop(message_id, None)
+
+    def release(self, messages):
+        with self._lock:
+            for message in messages:
+                if message.id in self.pending:
+                    self.pending[message.id][2] = message.deliveries - 1
+
+    def dead_letter(self, message, error):
+        self.dead_letters.append({**message.fields, "source_id": message.id, "error": error})
+        self.ack([message.id])
+
+
+@lru_cache(maxsize=None)
+def get_punch_stream():
+    """The configured punch stream: Redis, or the in-process stand-in when BIOMETRIC_STREAM_URL is local://."""
+    if settings.BIOMETRIC_STREAM_URL.startswith("local://"):
+        return LocalPunchStream()
+    return RedisPunchStream(settings.BIOMETRIC_STREAM_URL, settings.BIOMETRIC_STREAM_NAME)
+
+
+def enqueue_punches(rows, stream=None):
+    """Buffer validated punches as one stream message and return its id without touching the database."""
+    return (stream or get_punch_stream()).append({"punches": encode_punches(rows)})
+
+
+def consume_punches(consumer, stream=None, count=STREAM_READ_COUNT, block_ms=None, stale_after_ms=STALE_AFTER_MS):
+    """
+    Drain one batch from the stream: reclaim messages left pending by dead consumers, read new ones,
+    and run them through the bulk ingestion path together. If the batch fails, messages are retried one by one;
+    a message that keeps failing is moved to the dead-letter stream after MAX_DELIVERIES attempts.
+    Database outages leave the messages pending without spending one of their deliveries.
+    Returns the number of messages acknowledged.
+    """
+    stream = stream or get_punch_stream()
+    messages = stream.claim_stale(consumer, stale_after_ms, count)
+    messages += stream.read(consumer, count - len(messages), block_ms=block_ms) if len(messages) < count else []
+    if not messages:
+        return 0
+
+    decoded = []
+    for message in messages:
+        try:
+            decoded.append((message, decode_punches(message.fields["punches"])))
+        except (KeyError, TypeError, ValueError) as e:
+            stream.dead_letter(message, f"Undecodable message: {e}")
+
+    try:
+        ingest_punches([row for _, rows in decoded for row in rows])
+        stream.ack([message.id for message, _ in decoded])
+        return len(decoded)
+    except INFRASTRUCTURE_ERRORS as e:
+        logger.warning(f"[consume_punches] Database unavailable, leaving {len(decoded)} messages pending: {e}")
+        stream.release([message for message, _ in decoded])
+        return 0
+    except Exception as e:
+        logger.warning(f"[consume_punches] Batch of {len(decoded)} messages failed, retrying them one by one: {e}")
+
+    acknowledged = 0
+    for index, (message, rows) in enumerate(decoded):
+        try:
+            ingest_punches(rows)
+        except INFRASTRUCTURE_ERRORS as e:
+            logger.warning(f"[consume_punches] Database unavailable, leaving {len(decoded) - index} messages pending: {e}")
+            stream.release([message for message, _ in decoded[index:]])
+            break
+        except Exception as e:
+            if message.deliveries >= MAX_DELIVERIES:
+                logger.error(f"[consume_punches] Message {message.id} failed {message.deliveries} times, dead-lettered: {e}")
+                stream.dead_letter(message, str(e))
+            continue
+        stream.ack([message.id])
+        acknowledged += 1
+    return acknowledged
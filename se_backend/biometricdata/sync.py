@@ -0,0 +1,126 @@
+import logging
+
+from django.utils import timezone
+
+from .models import DeviceSyncState
+from .pairing import get_punch_state
+from .services import ingest_punches
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHUNK_SIZE = 2000
+
+
+def punch_time(log):
+    """Return the timestamp of a pyzk attendance record as an aware datetime."""
+    if timezone.is_naive(log.timestamp):
+        return timezone.make_aware(log.timestamp)
+    return log.timestamp
+
+
+def to_punch(log, terminal_name):
+    """Convert a pyzk attendance record into a BiometricData row, or None if its user id is not numeric."""
+    try:
+        emp_id = int(log.user_id)
+    except (TypeError, ValueError):
+        return None
+
+    return {
+        "emp_id": emp_id,
+        "name": f"Employee {emp_id}",  # Modify to fetch real names if available
+        "time": punch_time(log),
+        "work_code": "N/A",
+        "work_state": get_punch_state(log.punch),
+        "terminal_name": terminal_name,
+    }
+
+
+def is_synced_record(log, state):
+    """Whether log is the record the last sync ended on, by its uid and timestamp."""
+    if state.last_record_uid is None:
+        # Synced before the record itself was kept; trust the index
+        return True
+    return log.uid == state.last_record_uid and punch_time(log) == state.last_record_time
+
+
+def read_new_records(zk, state):
+    """
+    Return the records the terminal gained since the last sync and its total record count.
+    pyzk cannot fetch a range of the log, so the record count is read first and the
+    transfer is skipped entirely when nothing was added. The last record read is kept on
+    the state, for store_records to save as the new watermark.
+    """
+    conn = zk.connect()
+    try:
+        conn.disable_device()  # Prevent interference during data retrieval
+        conn.read_sizes()
+        if conn.records == state.last_record_index:
+            return [], conn.records
+
+        logs = conn.get_attendance()
+    finally:
+        # A device left disabled stops taking punches, so it is re-enabled even if the read failed
+        try:
+            conn.enable_device()
+        finally:
+            conn.disconnect()
+
+    index = state.last_record_index
+    synced = index == 0 or (len(logs) >= index and is_synced_record(logs[index - 1], state))
+    if logs:
+        state.last_record_uid, state.last_record_time = logs[-1].uid, punch_time(logs[-1])
+
+    if synced:
+        return logs[index:], len(logs)
+
+    # The device log was cleared since the last sync and its indexes restarted, so fall back to the timestamp.
+    # Punches on the watermark itself are kept; the ingestion insert drops the ones already stored.
+    logger.warning(f"[read_new_records] {state.terminal_name} no longer holds record {index} as synced "
+                   f"({len(logs)} records). Falling back to the timestamp watermark.")
+    if state.last_timestamp:
+        return [log for log in logs if punch_time(log) >= state.last_timestamp], len(logs)
+    return logs, len(logs)
+
+
+def store_records(reads, chunk_size=SYNC_CHUNK_SIZE):
+    """
+    Ingest the records read from one or more terminals, given as (state, logs, total) tuples,
+    in chunks that may mix terminals, then move each terminal's watermark. Returns the number of new punches stored.
+    """
+    punches = [
+        punch
+        for state, logs, _ in reads
+        for punch in (to_punch(log, state.terminal_name) for log in logs)
+        if punch
+    ]
+
+    inserted = 0
+    for offset in range(0, len(punches), chunk_size):
+        chunk = punches[offset:offset + chunk_size]
+        inserted += len(ingest_punches(chunk))
+
+    # The index only moves once every record was handed over; a failed run re-reads them and the insert dedupes
+    synced_at = timezone.now()
+    for state, logs, total in reads:
+        latest = max((punch_time(log) for log in logs), default=None)
+        if latest and (not state.last_timestamp or latest > state.last_timestamp):
+            state.last_timestamp = latest
+        state.last_record_index = total
+        state.last_synced_at = synced_at
+        state.save(update_fields=["last_timestamp", "last_record_index", "last_record_uid", "last_record_time",
+                                  "last_synced_at"])
+
+    return inserted
+
+
+def sync_device(zk, terminal_name, chunk_size=SYNC_CHUNK_SIZE):
+    """
+    Pull the records a terminal gained since its high-water mark and stream them, chunk by chunk,
+    through the bulk ingestion path. Returns the number of new punches stored.
+    """
+    state, _ = DeviceSyncState.objects.get_or_create(terminal_name=terminal_name)
+    logs, total = read_new_records(zk, state)
+    inserted = store_records([(state, logs, total)], chunk_size=chunk_size)
+
+    logger.info(f"[sync_device] {terminal_name}: {len(logs)} new records read, {inserted} punches stored")
+    return inserted
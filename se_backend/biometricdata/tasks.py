@@ -1,59 +1,40 @@
-"""
+import uuid
+
 from celery import shared_task
-from django.db.models.signals import post_save
-from zk import ZK, const
-from biometricdata.models import BiometricData
-from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from zk import ZK
 
-# Replace with your ZKTeco device details
-ZKTECO_IP = "192.168.1.201"
-ZKTECO_PORT = 4370
+from .poller import POLL_LOCK_KEY, get_poll_lock_timeout, poll_terminals
+from .sync import sync_device
 
 
 @shared_task
-def fetch_new_biometric_data():
-    # Fetch biometric attendance logs from the ZKTeco device and store only new records in the database
-    zk = ZK(ZKTECO_IP, port=ZKTECO_PORT, timeout=5, password=0, force_udp=False, ommit_ping=False)
-    conn = None
+def sync_biometric_device():
+    """Fetch the attendance logs the ZKTeco device gained since the last sync and ingest them."""
+    zk = ZK(settings.ZKTECO_IP, port=settings.ZKTECO_PORT, timeout=5, password=0, force_udp=False, ommit_ping=False)
 
     try:
-        # Connect to the device
-        conn = zk.connect()
-        conn.disable_device()  # Prevent interference during data retrieval
-
-        logs = conn.get_attendance()  # Fetch attendance logs
-        new_entries = []
-
-        for log in logs:
-            emp_id = log.user_id
-            time = log.timestamp
-
-            # Check if the record already exists
-            if not BiometricData.objects.filter(emp_id=emp_id, time=time).exists():
-                biometric_entry = BiometricData(
-                    emp_id=emp_id,
-                    name=f"Employee {emp_id}",  # Modify to fetch real names if available
-                    time=time,
-                    work_code="N/A",
-                    work_state=str(log.status),  # Can be mapped to 'Check-in', 'Check-out', etc.
-                    terminal_name="ZKTeco Terminal"
-                )
-                new_entries.append(biometric_entry)
-
-        if new_entries:
-            BiometricData.objects.bulk_create(new_entries)
-
-            # Manually trigger post_save signals for each entry
-            for entry in new_entries:
-                post_save.send(sender=BiometricData, instance=entry, created=True)
-
-        conn.enable_device()  # Re-enable the device
-        return f"Successfully added {len(new_entries)} new biometric entries."
-
+        inserted = sync_device(zk, settings.ZKTECO_TERMINAL_NAME)
     except Exception as e:
         return f"Error fetching biometric data: {str(e)}"
 
+    return f"Successfully added {inserted} new biometric entries."
+
+
+@shared_task
+def poll_biometric_terminals():
+    """
+    Poll every registered terminal concurrently and ingest what they gained since the last poll.
+    Beat fires every minute; a cycle still running holds the lock and the next one is skipped.
+    """
+    token = uuid.uuid4().hex
+    if not cache.add(POLL_LOCK_KEY, token, timeout=get_poll_lock_timeout()):
+        return "Skipped: the previous poll is still running."
+
+    try:
+        inserted = poll_terminals()
     finally:
-        if conn:
-            conn.disconnect()
-"""
\ No newline at end of file
+        if cache.get(POLL_LOCK_KEY) == token:
+            cache.delete(POLL_LOCK_KEY)
+    return f"Successfully added {inserted} new biometric entries."
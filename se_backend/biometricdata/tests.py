@@ -1,7 +1,32 @@
-from django.test import TestCase
-from biometricdata.models import BiometricData
+from io import StringIO
+import time as timer
+from unittest import mock
+
+from zk.exception import ZKNetworkError
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from attendance.models import Attendance
+from attendance_summary.models import AttendanceSummary
+from biometricdata.fake_zk import FakeZK
+from biometricdata.importers import import_punch_file
+from biometricdata.models import BiometricData, DeviceSyncState, Terminal
+from biometricdata.poller import CIRCUIT_FAILURE_THRESHOLD, POLL_LOCK_KEY, poll_terminals
+from biometricdata.tasks import poll_biometric_terminals
+from biometricdata.serializers import BiometricPunchSerializer
+from biometricdata.pairing import pair_punches
+from biometricdata.backfill import backfill_attendance, complete_shard_ranges, get_shard_ranges
+from biometricdata.services import ingest_punches
+from biometricdata.streams import MAX_DELIVERIES, LocalPunchStream, consume_punches, enqueue_punches
+from biometricdata.sync import sync_device
+from employees.models import Employee
+from employment_info.models import EmploymentInfo
+from users.models import CustomUser
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 
 class BiometricDataModelTestCase(TestCase):
 
@@ -34,3 +59,537 @@ class BiometricDataModelTestCase(TestCase):
     def test_delete_biometric_data(self):
         self.biometric.delete()
         self.assertEqual(BiometricData.objects.count(), 0)
+
+
+class BiometricIngestionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email="punch@example.com", password="password", role="employee")
+        employment_info = EmploymentInfo.objects.create(
+            employee_number=1001,
+            first_name="Juan",
+            last_name="Dela Cruz",
+            position="Staff",
+            address="Manila",
+            hire_date=date(2024, 1, 1),
+            active=True
+        )
+        Employee.objects.create(user=self.user, employment_info=employment_info)
+
+    def punch(self, day, hour, minute=0, emp_id=1001):
+        return {
+            "emp_id": emp_id,
+            "name": "Juan Dela Cruz",
+            "time": timezone.make_aware(datetime(2025, 4, day, hour, minute)),
+            "work_code": "0",
+            "work_state": "0",
+            "terminal_name": "Main Gate",
+        }
+
+    def test_punches_fold_into_attendance(self):
+        punches = ingest_punches([
+            self.punch(1, 17, 30),
+            self.punch(1, 8, 55),
+            self.punch(1, 12, 0),
+            self.punch(2, 9, 5),
+            self.punch(1, 9, 0, emp_id=9999),
+        ])
+
+        self.assertEqual(len(punches), 5)
+        self.assertEqual(BiometricData.objects.count(), 5)
+        first = Attendance.objects.get(user=self.user, date=date(2025, 4, 1))
+        self.assertEqual((first.check_in_time, first.check_out_time), (time(8, 55), time(17, 30)))
+        second = Attendance.objects.get(user=self.user, date=date(2025, 4, 2))
+        self.assertEqual((second.check_in_time, second.check_out_time), (time(9, 5), time(9, 5)))
+
+    def test_later_punches_merge_with_existing_attendance(self):
+        ingest_punches([self.punch(1, 9, 0)])
+        ingest_punches([self.punch(1, 18, 0), self.punch(1, 8, 30)])
+
+        attendance = Attendance.objects.get(user=self.user, date=date(2025, 4, 1))
+        self.assertEqual((attendance.check_in_time, attendance.check_out_time), (time(8, 30), time(18, 0)))
+
+    def test_reuploaded_punches_are_skipped(self):
+        ingest_punches([self.punch(1, 9, 0), self.punch(1, 17, 0)])
+
+        punches = ingest_punches([self.punch(1, 9, 0), self.punch(1, 17, 0), self.punch(1, 18, 0), self.punch(1, 18, 0)])
+
+        self.assertEqual([punch.time.hour for punch in punches], [18])
+        self.assertEqual(BiometricData.objects.count(), 3)
+        attendance = Attendance.objects.get(user=self.user, date=date(2025, 4, 1))
+        self.assertEqual(attendance.check_out_time, time(18, 0))
+
+    def test_bulk_serializer_accepts_known_punches(self):
+        ingest_punches([self.punch(1, 9, 0)])
+        serializer = BiometricPunchSerializer(data=[self.punch(1, 9, 0)], many=True)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(ingest_punches(serializer.validated_data), [])
+
+    def test_scan_replays_only_the_days_it_can_change(self):
+        cases = [
+            ((2, 17, "Check-Out"), (date(2025, 4, 2), date(2025, 4, 2))),
+            ((2, 2, "Check-Out"), (date(2025, 4, 1), date(2025, 4, 2))),
+            ((2, 7, "Check-In"), (date(2025, 4, 2), date(2025, 4, 2))),
+            ((2, 22, "Check-In"), (date(2025, 4, 2), date(2025, 4, 3))),
+        ]
+        for (day, hour, state), expected in cases:
+            with mock.patch("biometricdata.services.replay_attendance", return_value=[]) as replay:
+                BiometricData.objects.create(**{**self.punch(day, hour), "work_state": state})
+            self.assertEqual(replay.call_args.args, expected, state)
+
+    def test_manual_corrections_survive_a_scan(self):
+        ingest_punches([self.punch(1, 8, 55), self.punch(1, 17, 30)])
+        Attendance.objects.filter(user=self.user, date=date(2025, 4, 1)).update(
+            check_in_time=time(8, 0), manual_override=True,
+        )
+
+        ingest_punches([self.punch(1, 18, 0)])
+        BiometricData.objects.create(**{**self.punch(2, 1), "work_state": "Check-Out"})
+
+        attendance = Attendance.objects.get(user=self.user, date=date(2025, 4, 1))
+        self.assertEqual((attendance.check_in_time, attendance.check_out_time), (time(8, 0), time(17, 30)))
+
+    def test_query_count_does_not_grow_with_punches(self):
+        ingest_punches([self.punch(2, 9, 0)])  # warm the schedule index cache
+
+        with CaptureQueriesContext(connection) as few:
+            ingest_punches([self.punch(3, 9, 0)])
+        with CaptureQueriesContext(connection) as many:
+            ingest_punches([self.punch(day, hour) for day in range(4, 14) for hour in (8, 12, 17)])
+
+        self.assertEqual(len(few), len(many))
+
+
+class DeviceSyncTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.device = FakeZK()
+        for minute in range(5):
+            self.device.add_punch(1001, datetime(2025, 4, 1, 9, minute))
+
+    def test_only_new_records_are_ingested(self):
+        self.assertEqual(sync_device(self.device, "Main Gate"), 5)
+
+        self.device.add_punch(1001, datetime(2025, 4, 1, 17, 0))
+        self.device.add_punch(1002, datetime(2025, 4, 1, 17, 1))
+        self.assertEqual(sync_device(self.device, "Main Gate"), 2)
+
+        state = DeviceSyncState.objects.get(terminal_name="Main Gate")
+        self.assertEqual(state.last_record_index, 7)
+        self.assertEqual(state.last_timestamp, timezone.make_aware(datetime(2025, 4, 1, 17, 1)))
+        self.assertEqual(BiometricData.objects.count(), 7)
+        self.assertFalse(self.device.connected)
+        self.assertTrue(self.device.enabled)
+
+    def test_unchanged_device_skips_the_transfer(self):
+        sync_device(self.device, "Main Gate")
+        self.assertEqual(sync_device(self.device, "Main Gate"), 0)
+        self.assertEqual(self.device.transfers, 1)
+
+    def test_cleared_device_falls_back_to_timestamp(self):
+        sync_device(self.device, "Main Gate")
+        self.device.clear_attendance()
+        self.device.add_punch(1001, datetime(2025, 4, 1, 9, 4))
+        self.device.add_punch(1001, datetime(2025, 4, 1, 18, 0))
+
+        self.assertEqual(sync_device(self.device, "Main Gate"), 1)
+        self.assertEqual(DeviceSyncState.objects.get(terminal_name="Main Gate").last_record_index, 2)
+
+    def test_cleared_device_refilled_past_the_index_is_detected(self):
+        sync_device(self.device, "Main Gate")
+        self.device.clear_attendance()
+        for minute in range(7):
+            self.device.add_punch(1001, datetime(2025, 4, 2, 9, minute))
+
+        # Slicing at the old index would skip the first five punches of the refilled log
+        self.assertEqual(sync_device(self.device, "Main Gate"), 7)
+        state = DeviceSyncState.objects.get(terminal_name="Main Gate")
+        self.assertEqual((state.last_record_index, state.last_record_uid), (7, 7))
+
+
+class TerminalPollerTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.devices = {}
+        for index in range(3):
+            terminal = Terminal.objects.create(name=f"Site {index}", ip_address=f"10.0.0.{index + 1}", timeout=2)
+            device = FakeZK(delay=0.3)
+            device.add_punch(1000 + index, datetime(2025, 4, 1, 9, index))
+            self.devices[terminal.name] = device
+
+    def poll(self):
+        return poll_terminals(device_factory=lambda terminal: self.devices[terminal.name])
+
+    def test_terminals_are_read_concurrently(self):
+        started = timezone.now()
+        self.assertEqual(self.poll(), 3)
+        self.assertLess((timezone.now() - started).total_seconds(), 0.8)
+        self.assertEqual(set(BiometricData.objects.values_list("terminal_name", flat=True)), set(self.devices))
+
+    def test_failing_terminal_backs_off_without_blocking_others(self):
+        self.devices["Site 0"].offline = True
+        self.devices["Site 1"].delay = 5
+        Terminal.objects.filter(name="Site 1").update(timeout=0.5)
+
+        self.assertEqual(self.poll(), 1)
+
+        for name in ("Site 0", "Site 1"):
+            terminal = Terminal.objects.get(name=name)
+            self.assertEqual(terminal.consecutive_failures, 1)
+            self.assertGreater(terminal.next_attempt_at, timezone.now())
+        self.assertEqual(Terminal.objects.get(name="Site 1").last_error, "TimeoutError")
+
+        # Backed-off terminals are not contacted again until their next attempt is due
+        self.devices["Site 2"].add_punch(1002, datetime(2025, 4, 1, 17, 0))
+        self.assertEqual(self.poll(), 1)
+        self.assertEqual(Terminal.objects.get(name="Site 0").consecutive_failures, 1)
+
+    def test_circuit_opens_and_recovers(self):
+        self.devices["Site 0"].offline = True
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+            Terminal.objects.filter(name="Site 0").update(next_attempt_at=None)
+            self.poll()
+
+        terminal = Terminal.objects.get(name="Site 0")
+        self.assertEqual(terminal.consecutive_failures, CIRCUIT_FAILURE_THRESHOLD)
+        self.assertGreater(terminal.next_attempt_at, timezone.now() + timedelta(minutes=30))
+
+        self.devices["Site 0"].offline = False
+        Terminal.objects.filter(name="Site 0").update(next_attempt_at=timezone.now())
+        self.poll()
+
+        terminal.refresh_from_db()
+        self.assertEqual(terminal.consecutive_failures, 0)
+        self.assertIsNone(terminal.next_attempt_at)
+        self.assertTrue(BiometricData.objects.filter(terminal_name="Site 0").exists())
+
+    def test_terminal_still_being_read_is_not_polled_again(self):
+        self.devices["Site 1"].delay = 1
+        Terminal.objects.filter(name="Site 1").update(timeout=0.2)
+        self.assertEqual(self.poll(), 2)
+
+        # Due again while the timed-out read still holds the device
+        Terminal.objects.filter(name="Site 1").update(next_attempt_at=None)
+        with mock.patch.object(self.devices["Site 1"], "connect") as connect:
+            self.poll()
+        connect.assert_not_called()
+        self.assertEqual(Terminal.objects.get(name="Site 1").consecutive_failures, 1)
+
+        timer.sleep(1.5)
+        self.devices["Site 1"].delay = 0
+        self.assertEqual(self.poll(), 1)
+        self.assertEqual(Terminal.objects.get(name="Site 1").consecutive_failures, 0)
+
+    def test_failed_read_re_enables_the_device(self):
+        device = self.devices["Site 0"]
+        with mock.patch.object(device, "get_attendance", side_effect=ZKNetworkError("connection reset")):
+            self.poll()
+
+        self.assertTrue(device.enabled)
+        self.assertFalse(device.connected)
+
+    def test_overlapping_poll_is_skipped(self):
+        cache.add(POLL_LOCK_KEY, "running", timeout=60)
+        with mock.patch("biometricdata.tasks.poll_terminals") as poll:
+            self.assertIn("Skipped", poll_biometric_terminals())
+        poll.assert_not_called()
+
+        cache.delete(POLL_LOCK_KEY)
+        with mock.patch("biometricdata.tasks.poll_terminals", return_value=0):
+            poll_biometric_terminals()
+        self.assertIsNone(cache.get(POLL_LOCK_KEY))
+
+
+class PunchFileImportTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_attlog_import_reports_rejects_and_duplicates(self):
+        lines = [
+            "  1001\t2025-04-01 08:55:12\t1\t0\t0\t0\n",
+            "  1001\t2025-04-01 17:30:00\t1\t1\t0\t0\n",
+            "  1001\t2025-04-01 17:30:00\t1\t1\t0\t0\n",
+            "\n",
+            "abc\t2025-04-01 09:00:00\t1\t0\t0\t0\n",
+            "  1002\t01/04/2025 09:00\t1\t0\t0\t0\n",
+            "  1002\t2025-04-01 09:01:00\t1\t0\t0\t0\n",
+        ]
+
+        report = import_punch_file(iter(lines), "USB Export", "attlog", chunk_size=2)
+
+        self.assertEqual(report["read"], 6)
+        self.assertEqual(report["inserted"], 3)
+        self.assertEqual(report["duplicates"], 1)
+        self.assertEqual(report["rejected"], 2)
+        self.assertEqual([error["line"] for error in report["errors"]], [5, 6])
+        self.assertEqual(BiometricData.objects.filter(terminal_name="USB Export").count(), 3)
+
+        # Importing the same file again only finds duplicates
+        self.assertEqual(import_punch_file(iter(lines), "USB Export", "attlog")["inserted"], 0)
+
+    def test_csv_import(self):
+        lines = [
+            "emp_id,time,name,work_code,work_state\n",
+            "1001,2025-04-01T08:55:00,Juan Dela Cruz,0,0\n",
+            "1001,,Juan Dela Cruz,0,0\n",
+        ]
+
+        report = import_punch_file(iter(lines), "USB Export", "csv")
+
+        self.assertEqual((report["inserted"], report["rejected"]), (1, 1))
+        self.assertEqual(report["errors"][0]["line"], 3)
+        self.assertEqual(BiometricData.objects.get().name, "Juan Dela Cruz")
+
+
+class PunchPairingTestCase(TestCase):
+
+    def stamp(self, day, hour, minute=0):
+        return timezone.make_aware(datetime(2025, 4, day, hour, minute))
+
+    def pair(self, punches):
+        return [
+            (day.key, day.date, day.check_in.time(), day.check_out.time())
+            for day in pair_punches((1001, self.stamp(*when), state) for when, state in punches)
+        ]
+
+    def test_sessions_pair_across_midnight(self):
+        days = self.pair([
+            ((1, 22), "Check-In"),
+            ((2, 6), "Check-Out"),
+            ((2, 22), "Check-In"),
+            ((3, 2), "Break-Out"),
+            ((3, 3), "Break-In"),
+            ((3, 6, 30), "Check-Out"),
+        ])
+
+        self.assertEqual(days, [
+            (1001, date(2025, 4, 1), time(22, 0), time(6, 0)),
+            (1001, date(2025, 4, 2), time(22, 0), time(6, 30)),
+        ])
+
+    def test_day_shift_with_default_in_state(self):
+        # Terminals left on Check-In record every scan as an IN; the next morning still starts a new day
+        days = self.pair([
+            ((1, 8), "Check-In"),
+            ((1, 17), "Check-In"),
+            ((2, 7, 55), "Check-In"),
+        ])
+
+        self.assertEqual(days, [
+            (1001, date(2025, 4, 1), time(8, 0), time(17, 0)),
+            (1001, date(2025, 4, 2), time(7, 55), time(7, 55)),
+        ])
+
+    def test_punches_without_state_keep_calendar_days(self):
+        # Legacy rows hold the verify mode instead of a punch state, so they cannot open a session past midnight
+        days = self.pair([((1, 21), "1"), ((2, 5), "1"), ((2, 21), "15")])
+
+        self.assertEqual(days, [
+            (1001, date(2025, 4, 1), time(21, 0), time(21, 0)),
+            (1001, date(2025, 4, 2), time(5, 0), time(21, 0)),
+        ])
+
+
+class AttendanceReplayTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email="night@example.com", password="password", role="employee")
+        employment_info = EmploymentInfo.objects.create(
+            employee_number=3001,
+            first_name="Ana",
+            last_name="Reyes",
+            position="Guard",
+            address="Davao",
+            hire_date=date(2024, 1, 1),
+            active=True
+        )
+        Employee.objects.create(user=self.user, employment_info=employment_info)
+
+    def punch(self, day, hour, state):
+        return {
+            "emp_id": 3001,
+            "name": "Ana Reyes",
+            "time": timezone.make_aware(datetime(2025, 4, day, hour)),
+            "work_code": "0",
+            "work_state": state,
+            "terminal_name": "Gate",
+        }
+
+    def test_out_of_order_uploads_pair_correctly(self):
+        ingest_punches([self.punch(2, 6, "Check-Out")])
+        ingest_punches([self.punch(1, 22, "Check-In")])
+
+        attendance = Attendance.objects.get(user=self.user)
+        self.assertEqual(attendance.date, date(2025, 4, 1))
+        self.assertEqual((attendance.check_in_time, attendance.check_out_time), (time(22, 0), time(6, 0)))
+
+    def test_absorbed_days_move_their_summaries_in_one_update(self):
+        ingest_punches([self.punch(2, 6, "Check-Out")])
+        absorbed = Attendance.objects.get(user=self.user, date=date(2025, 4, 2))
+        summary = AttendanceSummary.objects.create(user_id=self.user, attendance_id=absorbed, date=date(2025, 4, 1),
+                                                   actual_hours=0, overtime_hours=0, late_minutes=0, undertime=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            ingest_punches([self.punch(1, 22, "Check-In")])
+
+        summary.refresh_from_db()
+        self.assertEqual(summary.attendance_id, Attendance.objects.get(user=self.user, date=date(2025, 4, 1)))
+        self.assertFalse(Attendance.objects.filter(id=absorbed.id).exists())
+        updates = [query for query in queries if query["sql"].startswith('UPDATE "attendance_summary_attendancesummary"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_replay_command_rebuilds_range(self):
+        BiometricData.objects.bulk_create([
+            BiometricData(**self.punch(3, 22, "Check-In")),
+            BiometricData(**self.punch(4, 6, "Check-Out")),
+        ])
+        Attendance.objects.create(
+            user=self.user,
+            date=date(2025, 4, 3),
+            status="Present",
+            check_in_time=time(22, 0),
+            check_out_time=time(22, 0)
+        )
+
+        call_command("replay_attendance", "--start", "2025-04-03", "--end", "2025-04-03", stdout=StringIO())
+
+        attendance = Attendance.objects.get(user=self.user, date=date(2025, 4, 3))
+        self.assertEqual(attendance.check_out_time, time(6, 0))
+        self.assertFalse(Attendance.objects.filter(user=self.user, date=date(2025, 4, 4)).exists())
+
+
+class PunchStreamTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.stream = LocalPunchStream()
+
+    def punch(self, minute, emp_id=1001):
+        return {
+            "emp_id": emp_id,
+            "name": "Juan Dela Cruz",
+            "time": timezone.make_aware(datetime(2025, 4, 1, 9, minute)),
+            "work_code": "0",
+            "work_state": "Check-In",
+            "terminal_name": "Main Gate",
+        }
+
+    def test_consumer_drains_messages_in_one_batch(self):
+        enqueue_punches([self.punch(0), self.punch(1)], stream=self.stream)
+        enqueue_punches([self.punch(2)], stream=self.stream)
+        self.assertEqual(BiometricData.objects.count(), 0)
+
+        self.assertEqual(consume_punches("worker-1", stream=self.stream), 2)
+
+        self.assertEqual(BiometricData.objects.count(), 3)
+        self.assertEqual(self.stream.pending, {})
+        self.assertEqual(self.stream.messages, {})
+        self.assertEqual(consume_punches("worker-1", stream=self.stream), 0)
+
+    def test_failing_message_is_retried_then_dead_lettered(self):
+        enqueue_punches([self.punch(0)], stream=self.stream)
+        enqueue_punches([self.punch(1, emp_id=6666)], stream=self.stream)
+
+        def ingest(rows):
+            if any(row["emp_id"] == 6666 for row in rows):
+                raise ValueError("bad punch")
+            return ingest_punches(rows)
+
+        with mock.patch("biometricdata.streams.ingest_punches", side_effect=ingest):
+            self.assertEqual(consume_punches("worker-1", stream=self.stream), 1)
+            self.assertEqual(len(self.stream.pending), 1)
+
+            # Another consumer reclaims the pending message until it runs out of deliveries
+            for _ in range(MAX_DELIVERIES - 1):
+                consume_punches("worker-2", stream=self.stream, stale_after_ms=0)
+
+        self.assertEqual(self.stream.pending, {})
+        self.assertEqual(len(self.stream.dead_letters), 1)
+        self.assertEqual(self.stream.dead_letters[0]["error"], "bad punch")
+        self.assertEqual(BiometricData.objects.count(), 1)
+
+    def test_database_outage_does_not_spend_deliveries(self):
+        enqueue_punches([self.punch(0)], stream=self.stream)
+
+        with mock.patch("biometricdata.streams.ingest_punches", side_effect=OperationalError("connection refused")):
+            for _ in range(MAX_DELIVERIES + 1):
+                self.assertEqual(consume_punches("worker-1", stream=self.stream, stale_after_ms=0), 0)
+
+        self.assertEqual(self.stream.dead_letters, [])
+        self.assertEqual(consume_punches("worker-1", stream=self.stream, stale_after_ms=0), 1)
+        self.assertEqual(BiometricData.objects.count(), 1)
+
+    @override_settings(BIOMETRIC_STREAM_URL="local://")
+    def test_consumer_command_refuses_the_in_process_stream(self):
+        with self.assertRaises(CommandError):
+            call_command("consume_punches", "--once", stdout=StringIO())
+
+
+class AttendanceBackfillTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = {}
+        for emp_id in (4001, 4002, 4003):
+            user = CustomUser.objects.create_user(email=f"{emp_id}@example.com", password="password", role="employee")
+            employment_info = EmploymentInfo.objects.create(
+                employee_number=emp_id,
+                first_name="Backfill",
+                last_name=str(emp_id),
+                position="Clerk",
+                address="Cebu",
+                hire_date=date(2024, 1, 1),
+                active=True
+            )
+            Employee.objects.create(user=user, employment_info=employment_info)
+            self.users[emp_id] = user
+
+        BiometricData.objects.bulk_create([
+            BiometricData(emp_id=emp_id, name="Backfill", time=timezone.make_aware(datetime(2025, 4, day, hour)),
+                          work_code="0", work_state=state, terminal_name="Gate")
+            for emp_id in self.users
+            for day in range(1, 6)
+            for hour, state in ((8, "Check-In"), (17, "Check-Out"))
+        ])
+
+    def test_backfill_rebuilds_in_chunks_and_checkpoints(self):
+        progress = []
+        checkpoint = backfill_attendance(date(2025, 4, 1), date(2025, 4, 5), chunk_size=2, window_days=2,
+                                         progress=lambda checkpoint, metrics: progress.append(metrics))
+
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual(checkpoint.processed, 3)
+        self.assertEqual([metrics["last_emp_id"] for metrics in progress], [4002, 4003])
+        self.assertEqual(progress[-1]["days"], 15)
+        self.assertEqual(Attendance.objects.count(), 15)
+
+    def test_backfill_resumes_inside_a_chunk(self):
+        checkpoint = backfill_attendance(date(2025, 4, 1), date(2025, 4, 5), emp_from=4001, emp_to=4002)
+        checkpoint.position = {"after_emp_id": None, "through_emp_id": 4002, "next_date": "2025-04-04", "days": 6}
+        checkpoint.processed, checkpoint.completed = 0, False
+        checkpoint.save()
+        Attendance.objects.all().delete()
+
+        checkpoint = backfill_attendance(date(2025, 4, 1), date(2025, 4, 5), emp_from=4001, emp_to=4002)
+
+        self.assertEqual(checkpoint.processed, 2)
+        self.assertEqual(set(Attendance.objects.values_list('date', flat=True)), {date(2025, 4, 4), date(2025, 4, 5)})
+        self.assertFalse(Attendance.objects.filter(user=self.users[4003]).exists())
+
+    def test_shard_ranges_cover_every_employee(self):
+        self.assertEqual(get_shard_ranges(date(2025, 4, 1), date(2025, 4, 5), 2), [(None, 4002), (4003, None)])
+
+    def test_resumed_shards_keep_their_ranges(self):
+        ranges = get_shard_ranges(date(2025, 4, 1), date(2025, 4, 5), 3)
+        BiometricData.objects.create(emp_id=4000, name="Late hire", time=timezone.make_aware(datetime(2025, 4, 2, 8)),
+                                     work_code="0", work_state="Check-In", terminal_name="Gate")
+
+        self.assertEqual(get_shard_ranges(date(2025, 4, 1), date(2025, 4, 5), 3), ranges)
+
+        complete_shard_ranges(date(2025, 4, 1), date(2025, 4, 5))
+        self.assertEqual(get_shard_ranges(date(2025, 4, 1), date(2025, 4, 5), 3), [(None, 4001), (4002, None)])
@@ -1,10 +1,18 @@
+import io
+
+from django.conf import settings
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from shared.generic_viewset import GenericViewset
 from shared.utils import role_required
 from .models import BiometricData
-from .serializers import BiometricDataSerializer
+from .importers import PARSERS, guess_format, import_punch_file
+from .serializers import BiometricDataSerializer, BiometricPunchSerializer
+from .services import ingest_punches
+from .streams import enqueue_punches
 
 class BiometricDataViewSet(GenericViewset):
     protected_views = ["create", "update", "partial_update", "retrieve", "destroy", "list"]
@@ -23,7 +31,21 @@ class BiometricDataViewSet(GenericViewset):
         data = request.data
         is_bulk = isinstance(data, list)  # Check if request contains a list
 
-        serializer = self.get_serializer(data=data, many=is_bulk)
+        if is_bulk:
+            # Lists go through the bulk path: one insert that skips known punches and one grouped attendance derivation
+            serializer = BiometricPunchSerializer(data=data, many=True)
+            serializer.is_valid(raise_exception=True)
+
+            if settings.BIOMETRIC_INGEST_BUFFERED:
+                # Terminals only wait for the append; consume_punches workers do the database work
+                message_id = enqueue_punches(serializer.validated_data)
+                return Response({"queued": len(serializer.validated_data), "message_id": message_id},
+                                status=status.HTTP_202_ACCEPTED)
+
+            punches = ingest_punches(serializer.validated_data)
+            return Response(self.get_serializer(punches, many=True).data, status=status.HTTP_201_CREATED)
+
+        serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
 
         self.perform_create(serializer)
@@ -59,3 +81,25 @@ class BiometricDataViewSet(GenericViewset):
         instance = self.get_object()
         instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'], url_path='import-file', parser_classes=[MultiPartParser])
+    @role_required(["owner", "admin"])
+    def import_file(self, request, *args, **kwargs):
+        """
+        Import a terminal's USB export (attlog.dat or CSV) uploaded in the "file" field.
+        - terminal_name: the terminal the file was exported from (required)
+        - format: attlog or csv, guessed from the file name if omitted
+        The file is streamed in chunks; the response reports the counts, the first rejects and the throughput.
+        """
+        upload = request.FILES.get('file')
+        terminal_name = request.data.get('terminal_name')
+        file_format = request.data.get('format') or guess_format(upload.name if upload else None)
+
+        if not upload or not terminal_name:
+            return Response({"error": "file and terminal_name are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if file_format not in PARSERS:
+            return Response({"error": f"format must be one of {sorted(PARSERS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = io.TextIOWrapper(upload, encoding='utf-8-sig', errors='replace', newline='')
+        report = import_punch_file(lines, terminal_name, file_format)
+        return Response(report, status=status.HTTP_200_OK)
@@ -0,0 +1,91 @@
+import logging
+
+from .models import Earnings
+from benefits.models import SSS, Philhealth, Pagibig
+from shared.computations.sss_computations import compute_sss_contribution
+from shared.computations.philhealth_computations import compute_philhealth_contribution
+from shared.computations.pagibig_computations import compute_pagibig_contribution
+
+logger = logging.getLogger(__name__)
+
+
+def update_sss_contribution(user_id, basic_rate):
+    sss_data = compute_sss_contribution(basic_rate)
+    logger.info(f"Computed SSS Data: {sss_data}")
+
+    # Save or update the SSS contribution for the user
+    sss_record, created = SSS.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            "basic_salary": sss_data["Basic Salary"],
+            "msc": sss_data["MSC"],
+            "employee_share": sss_data["Employee Share"],
+            "employer_share": sss_data["Employer Share"],
+            "ec_contribution": sss_data["EC Contribution"],
+            "employer_mpf_contribution": sss_data["Employer MPF Contribution"],
+            "employee_mpf_contribution": sss_data["Employee MPF Contribution"],
+            "total_employer": sss_data["Total Employer Contribution"],
+            "total_employee": sss_data["Total Employee Contribution"],
+            "total_contribution": sss_data["Total Contribution"],
+        }
+    )
+    logger.info(f"{'Created new' if created else 'Updated existing'} SSS record for user: {user_id}, "
+                f"Contribution ID: {sss_record.id}")
+    return sss_record
+
+
+def update_philhealth_contribution(user_id, basic_rate):
+    philhealth_data = compute_philhealth_contribution(basic_rate)
+    logger.info(f"Computed Philhealth Data: {philhealth_data}")
+
+    # Save or update the Philhealth contribution for the user
+    philhealth_record, created = Philhealth.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            "basic_salary": philhealth_data["Basic Salary"],
+            "total_contribution": philhealth_data["Total Contribution"],
+        }
+    )
+    logger.info(f"{'Created new' if created else 'Updated existing'} Philhealth record for user: {user_id}, "
+                f"Contribution ID: {philhealth_record.id}")
+    return philhealth_record
+
+
+def update_pagibig_contribution(user_id, basic_rate):
+    pagibig_data = compute_pagibig_contribution()
+    logger.info(f"Computed Pagibig Data: {pagibig_data}")
+
+    # Ensure only one Pagibig record per user
+    pagibig_record, created = Pagibig.objects.get_or_create(user_id=user_id)
+
+    # Update existing record
+    pagibig_record.basic_salary = basic_rate
+    pagibig_record.employee_share = pagibig_data["Employee Share"]
+    pagibig_record.employer_share = pagibig_data["Employer Share"]
+    pagibig_record.total_contribution = pagibig_data["Total Contribution"]
+    pagibig_record.save()
+
+    logger.info(f"{'Created new' if created else 'Updated existing'} Pagibig record for user: {user_id}, "
+                f"Contribution ID: {pagibig_record.id}")
+    return pagibig_record
+
+
+def update_contributions(user_id, basic_rate):
+    """Compute the SSS, Philhealth and Pag-IBIG contributions of a user from their basic rate."""
+    if basic_rate is None:
+        logger.warning(f"Basic rate is None for user: {user_id}, skipping computation.")
+        return
+    update_sss_contribution(user_id, basic_rate)
+    update_philhealth_contribution(user_id, basic_rate)
+    update_pagibig_contribution(user_id, basic_rate)
+
+
+def recompute_contributions(user_ids):
+    """Recompute the contributions of many users from their latest Earnings, read in one DISTINCT ON query."""
+    basic_rates = dict(
+        Earnings.objects.filter(user_id__in=user_ids).order_by('user_id', '-id').distinct('user_id')
+        .values_list('user_id', 'basic_rate')
+    )
+    for user_id, basic_rate in basic_rates.items():
+        update_contributions(user_id, basic_rate)
+    return len(basic_rates)
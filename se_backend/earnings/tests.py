@@ -1,5 +1,8 @@
+from decimal import Decimal
+
 from django.test import TestCase
 from users.models import CustomUser
+from benefits.models import Pagibig
 from earnings.models import Earnings
 
 
@@ -40,3 +43,11 @@ class EarningsModelTestCase(TestCase):
     def test_delete_earnings(self):
         self.earnings.delete()
         self.assertEqual(Earnings.objects.count(), 0)
+
+    def test_editing_an_older_row_keeps_contributions_on_the_latest_rate(self):
+        Earnings.objects.create(user=self.user, basic_rate=Decimal("20000"))
+
+        self.earnings.ntax = 1000.00
+        self.earnings.save()
+
+        self.assertEqual(Pagibig.objects.get(user_id=self.user).basic_salary, Decimal("20000"))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EmploymentInfoConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "employment_info"
+
+    def ready(self):
+        import employment_info.signals
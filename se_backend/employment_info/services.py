@@ -0,0 +1,40 @@
+from .models import EmploymentInfo
+from shared.cache import TwoLevelCache
+
+identity_cache = TwoLevelCache("employment_info:identity", maxsize=1)
+
+IDENTITY_KEY = "employee_numbers"
+
+
+def build_identity_map(keys=None):
+    """
+    Map every employee number to the user id of its Employee or Admin account, in one query.
+    An Employee account wins over an Admin one, and the first EmploymentInfo wins for a repeated number.
+    """
+    identities = {}
+    rows = EmploymentInfo.objects.order_by('id').values_list('employee_number', 'employee__user_id', 'admin__user_id')
+    for employee_number, employee_user_id, admin_user_id in rows:
+        user_id = employee_user_id or admin_user_id
+        if user_id:
+            identities.setdefault(employee_number, user_id)
+    return {IDENTITY_KEY: identities}
+
+
+def get_identity_map():
+    """Return the cached {employee_number: user_id} map."""
+    return identity_cache.get_many([IDENTITY_KEY], build_identity_map)[IDENTITY_KEY]
+
+
+def resolve(employee_number):
+    """Return the user id behind an employee number, or None."""
+    return get_identity_map().get(employee_number)
+
+
+def resolve_many(employee_numbers):
+    """Return {employee_number: user_id} for the given numbers that belong to a user."""
+    identities = get_identity_map()
+    return {number: identities[number] for number in employee_numbers if number in identities}
+
+
+def invalidate_identity_map():
+    identity_cache.invalidate(IDENTITY_KEY)
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import EmploymentInfo
+from .services import invalidate_identity_map
+from admins.models import Admin
+from employees.models import Employee
+
+
+@receiver([post_save, post_delete], sender=EmploymentInfo)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=Admin)
+def invalidate_identity_map_on_change(sender, instance, **kwargs):
+    """
+    Signal handler to drop the cached employee number to user map whenever
+    an employee number or the account linked to it changes.
+    """
+    invalidate_identity_map()
@@ -1,5 +1,10 @@
+from django.core.cache import cache
 from django.test import TestCase
+from admins.models import Admin
+from employees.models import Employee
 from employment_info.models import EmploymentInfo
+from employment_info.services import resolve, resolve_many
+from users.models import CustomUser
 from datetime import date
 
 
@@ -37,3 +42,40 @@ class EmploymentInfoModelTestCase(TestCase):
     def test_delete_employment_info(self):
         self.employment_info.delete()
         self.assertEqual(EmploymentInfo.objects.count(), 0)
+
+
+class IdentityMapTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employment_info = EmploymentInfo.objects.create(
+                employee_number=2001,
+                first_name="Maria",
+                last_name="Santos",
+                position="Staff",
+                address="Cebu",
+                hire_date=date(2023, 1, 1),
+                active=True
+            )
+            self.user = CustomUser.objects.create_user(email="maria@example.com", password="password", role="employee")
+            self.employee = Employee.objects.create(user=self.user, employment_info=self.employment_info)
+
+    def test_resolve_many_is_cached(self):
+        self.assertEqual(resolve_many([2001, 9999]), {2001: self.user.id})
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve(2001), self.user.id)
+
+    def test_changes_invalidate(self):
+        resolve(2001)
+        self.employment_info.employee_number = 2002
+        self.employment_info.save()
+        self.assertIsNone(resolve(2001))
+        self.assertEqual(resolve(2002), self.user.id)
+
+        self.employee.delete()
+        self.assertIsNone(resolve(2002))
+
+        admin_user = CustomUser.objects.create_user(email="admin2002@example.com", password="password", role="admin")
+        Admin.objects.create(user=admin_user, employment_info=self.employment_info)
+        self.assertEqual(resolve(2002), admin_user.id)
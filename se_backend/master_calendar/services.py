@@ -0,0 +1,74 @@
+from .models import MasterCalendar
+from shared.cache import TwoLevelCache
+
+holiday_cache = TwoLevelCache("master_calendar:holidays")
+
+
+class PeriodHolidays:
+    """
+    Holidays of one payroll period as bitmaps of day offsets from the period start.
+    Bit n is set when start + n days is a holiday, so a membership check is a shift and a mask.
+    """
+
+    def __init__(self, start, end, regular=0, special=0):
+        self.start = start
+        self.end = end
+        self.regular = regular
+        self.special = special
+
+    @classmethod
+    def from_dates(cls, start, end, regular=(), special=()):
+        holidays = cls(start, end)
+        return holidays.union(regular=regular, special=special)
+
+    def _bitmap(self, dates):
+        bitmap = 0
+        for day in dates:
+            if self.start <= day <= self.end:
+                bitmap |= 1 << (day - self.start).days
+        return bitmap
+
+    def _has(self, bitmap, date):
+        return self.start <= date <= self.end and bool(bitmap >> (date - self.start).days & 1)
+
+    def is_regular(self, date):
+        return self._has(self.regular, date)
+
+    def is_special(self, date):
+        return self._has(self.special, date)
+
+    def union(self, regular=(), special=()):
+        """Return a copy that also marks the given dates as holidays."""
+        return PeriodHolidays(
+            self.start,
+            self.end,
+            self.regular | self._bitmap(regular),
+            self.special | self._bitmap(special),
+        )
+
+
+def build_year_holidays(years):
+    """Read the MasterCalendar holidays of many years with one query, as frozensets per type."""
+    dates = {year: {'regular': set(), 'special': set()} for year in years}
+    holidays = MasterCalendar.objects.filter(date__year__in=years).values_list('date', 'holiday_type')
+    for day, holiday_type in holidays:
+        dates[day.year].setdefault(holiday_type, set()).add(day)
+    return {
+        year: {holiday_type: frozenset(days) for holiday_type, days in by_type.items()}
+        for year, by_type in dates.items()
+    }
+
+
+def get_period_holidays(start, end):
+    """Return the PeriodHolidays of start..end built from the cached MasterCalendar holidays of its years."""
+    years = holiday_cache.get_many(range(start.year, end.year + 1), build_year_holidays)
+    return PeriodHolidays.from_dates(
+        start,
+        end,
+        regular=[day for by_type in years.values() for day in by_type['regular']],
+        special=[day for by_type in years.values() for day in by_type['special']],
+    )
+
+
+def invalidate_year_holidays(year):
+    holiday_cache.invalidate(year)
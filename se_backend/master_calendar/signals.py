@@ -1,7 +1,47 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models import Q
 from django.dispatch import receiver
 from django.utils import timezone
 from .models import MasterCalendar, MasterCalendarPayroll
+from .services import invalidate_year_holidays
+from schedule.models import Schedule
+from shared.recompute import ATTENDANCE_METRICS, mark_dirty
+
+
+@receiver([pre_save], sender=MasterCalendar)
+def invalidate_previous_holiday_year(sender, instance, **kwargs):
+    """
+    A holiday moved to another year must also leave the cached holidays of its old year.
+    """
+    instance._previous_date = None
+    if instance.pk:
+        previous = MasterCalendar.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+        instance._previous_date = previous
+        if previous and previous.year != instance.date.year:
+            invalidate_year_holidays(previous.year)
+
+
+@receiver([post_save, post_delete], sender=MasterCalendar)
+def invalidate_holiday_year(sender, instance, **kwargs):
+    """
+    Signal handler to drop the cached holidays of the year a holiday belongs to.
+    Connected before the schedule updates below so that they read the new holidays.
+    """
+    invalidate_year_holidays(instance.date.year)
+
+
+@receiver([post_save, post_delete], sender=MasterCalendar)
+def rebuild_metrics_on_holiday_change(sender, instance, **kwargs):
+    """
+    Mark the attendance metrics of every period that covers the holiday, and its old date when it moved,
+    so days already stored are counted as holiday hours or as regular hours again.
+    """
+    dates = {instance.date, getattr(instance, '_previous_date', None)} - {None}
+    periods = Q()
+    for day in dates:
+        periods |= Q(payroll_period_start__lte=day, payroll_period_end__gte=day)
+    keys = Schedule.objects.filter(periods).values_list('user_id', 'payroll_period_start')
+    mark_dirty(ATTENDANCE_METRICS, set(keys))
 
 
 @receiver([post_save], sender=MasterCalendar)
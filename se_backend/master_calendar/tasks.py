@@ -3,13 +3,16 @@ from django.db.models import Q
 from django.utils import timezone
 from .models import MasterCalendar
 from schedule.models import Schedule
+from shared.recompute import ATTENDANCE_METRICS, deferred_recompute, mark_dirty
 from datetime import datetime, timedelta
 
 @shared_task
+@deferred_recompute()
 def update_schedule_holidays(schedule_id=None):
     """
     Updates a single schedule's holiday arrays based on the master calendar.
     If schedule_id is None, update all schedules.
+    The attendance metrics of every updated period are marked, and rebuilt once when the deferred block flushes.
     """
 
     if schedule_id:
@@ -21,6 +24,7 @@ def update_schedule_holidays(schedule_id=None):
         )
 
     updated_count = 0
+    periods = set()
     for schedule in schedules:
         # Get all holidays within the schedule's payroll period
         holidays = MasterCalendar.objects.filter(
@@ -47,8 +51,11 @@ def update_schedule_holidays(schedule_id=None):
 
         # Save the updated schedule
         schedule.save(update_fields=['regularholiday', 'specialholiday'])
+        periods.add((schedule.user_id_id, schedule.payroll_period_start))
         updated_count += 1
 
+    # Holiday-only saves skip the schedule receivers, so the days they affect are marked here
+    mark_dirty(ATTENDANCE_METRICS, periods)
     return f"Updated holidays for {updated_count} schedules"
 
 
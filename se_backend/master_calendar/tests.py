@@ -1,5 +1,13 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 from .models import MasterCalendar, MasterCalendarPayroll
+from .services import PeriodHolidays, get_period_holidays
+from .tasks import update_schedule_holidays
+from schedule.models import Schedule
+from shared.recompute_graph import graph
+from users.models import CustomUser
 from datetime import date
 
 
@@ -63,3 +71,75 @@ class MasterCalendarPayrollModelTest(TestCase):
         )
         self.assertEqual(MasterCalendarPayroll.objects.count(), 2)
         self.assertEqual(str(payroll2), "2025-04-16 - 2025-04-30")
+
+
+class PeriodHolidaysTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.holiday = MasterCalendar.objects.create(
+                name="Araw ng Kagitingan",
+                date=date(2025, 4, 9),
+                holiday_type="regular"
+            )
+
+    def test_bitmap_membership(self):
+        holidays = PeriodHolidays.from_dates(
+            date(2025, 4, 1), date(2025, 4, 15),
+            regular=[date(2025, 4, 1), date(2025, 5, 1)],
+            special=[date(2025, 4, 15)],
+        )
+        self.assertEqual(holidays.regular, 1)
+        self.assertEqual(holidays.special, 1 << 14)
+        self.assertTrue(holidays.is_regular(date(2025, 4, 1)))
+        self.assertFalse(holidays.is_regular(date(2025, 5, 1)))
+        self.assertTrue(holidays.is_special(date(2025, 4, 15)))
+        self.assertFalse(holidays.is_special(date(2025, 4, 14)))
+
+    def test_period_holidays_are_cached(self):
+        get_period_holidays(date(2025, 4, 1), date(2025, 4, 15))
+        with self.assertNumQueries(0):
+            holidays = get_period_holidays(date(2025, 4, 1), date(2025, 4, 15))
+        self.assertTrue(holidays.is_regular(date(2025, 4, 9)))
+
+    def test_calendar_changes_invalidate(self):
+        get_period_holidays(date(2025, 4, 1), date(2025, 4, 15))
+        MasterCalendar.objects.create(name="Good Friday", date=date(2025, 4, 18), holiday_type="special")
+        self.assertTrue(get_period_holidays(date(2025, 4, 16), date(2025, 4, 30)).is_special(date(2025, 4, 18)))
+
+        self.holiday.date = date(2026, 4, 9)
+        self.holiday.save()
+        self.assertFalse(get_period_holidays(date(2025, 4, 1), date(2025, 4, 15)).is_regular(date(2025, 4, 9)))
+        self.assertTrue(get_period_holidays(date(2026, 4, 1), date(2026, 4, 15)).is_regular(date(2026, 4, 9)))
+
+        self.holiday.delete()
+        self.assertFalse(get_period_holidays(date(2026, 4, 1), date(2026, 4, 15)).is_regular(date(2026, 4, 9)))
+
+
+class HolidaySyncTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            CustomUser.objects.create_user(email=f"sync{number}@example.com", password="password", role="employee")
+            for number in range(2)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                Schedule.objects.create(user_id=user, payroll_period_start=date(2025, 4, 1),
+                                        payroll_period_end=date(2025, 4, 15), bi_weekly_start=date(2025, 4, 1), hours=8)
+            MasterCalendar.objects.create(name="Araw ng Kagitingan", date=date(2025, 4, 9), holiday_type="regular")
+
+    def test_sync_rebuilds_every_updated_period_in_one_flush(self):
+        with mock.patch.object(graph, "run", return_value={}) as run:
+            with self.captureOnCommitCallbacks(execute=True):
+                update_schedule_holidays()
+
+        run.assert_called_once()
+        self.assertEqual(
+            run.call_args.args[0]["attendance_metrics"],
+            {(user.id, date(2025, 4, 1)) for user in self.users},
+        )
+        for holidays in Schedule.objects.values_list("regularholiday", flat=True):
+            self.assertEqual(holidays, [date(2025, 4, 9)])
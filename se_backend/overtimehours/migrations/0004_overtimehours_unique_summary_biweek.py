@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('overtimehours', '0003_overtimehours_actualhours'),
+    ]
+
+    operations = [
+        # get_or_create could race into duplicate rows per summary; keep the latest copy so the constraint can be created
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM overtimehours_overtimehours duplicate
+                USING overtimehours_overtimehours latest
+                WHERE duplicate.attendancesummary_id = latest.attendancesummary_id
+                  AND duplicate.biweek_start = latest.biweek_start
+                  AND duplicate.id < latest.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='overtimehours',
+            constraint=models.UniqueConstraint(fields=('attendancesummary', 'biweek_start'), name='unique_overtime_summary_biweek'),
+        ),
+    ]
@@ -17,5 +17,10 @@ class OvertimeHours(models.Model):
     undertime = models.IntegerField(default=0)
     biweek_start = models.DateField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attendancesummary', 'biweek_start'], name='unique_overtime_summary_biweek'),
+        ]
+
     def __str__(self):
         return f"{self.id} - {self.user} - {self.biweek_start}"
@@ -8,6 +8,19 @@ class OvertimeHoursSerializer(serializers.ModelSerializer):
     class Meta:
         model = OvertimeHours
         fields = '__all__'
+        # Both columns are nullable, so the (attendancesummary, biweek_start) constraint is only checked in validate()
+        validators = []
+
+    def validate(self, attrs):
+        attendancesummary = attrs.get('attendancesummary', getattr(self.instance, 'attendancesummary', None))
+        biweek_start = attrs.get('biweek_start', getattr(self.instance, 'biweek_start', None))
+        if attendancesummary is not None and biweek_start is not None:
+            duplicates = OvertimeHours.objects.filter(attendancesummary=attendancesummary, biweek_start=biweek_start)
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError("OvertimeHours already exist for this attendance summary and biweek start.")
+        return attrs
 
     def get_employment_info(self, obj):
         # Fetch the EmploymentInfo object associated with the user in OvertimeHours
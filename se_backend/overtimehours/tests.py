@@ -16,14 +16,12 @@ class OvertimeHoursModelTestCase(TestCase):
     def setUpClass(cls):
         # Disconnect signals at class level to ensure they're disabled before any objects are created
         post_save.disconnect(
-            receiver=summary_signals.update_overtime_hours,
-            sender=AttendanceSummary,
-            dispatch_uid="update_overtime_hours"
+            receiver=summary_signals.handle_attendance_summary_save,
+            sender=AttendanceSummary
         )
         post_save.disconnect(
             receiver=attendance_signals.generate_attendance_summary,
-            sender=Attendance,
-            dispatch_uid="generate_attendance_summary"
+            sender=Attendance
         )
         super().setUpClass()
 
@@ -31,14 +29,12 @@ class OvertimeHoursModelTestCase(TestCase):
     def tearDownClass(cls):
         # Reconnect signals after all tests have run
         post_save.connect(
-            receiver=summary_signals.update_overtime_hours,
-            sender=AttendanceSummary,
-            dispatch_uid="update_overtime_hours"
+            receiver=summary_signals.handle_attendance_summary_save,
+            sender=AttendanceSummary
         )
         post_save.connect(
             receiver=attendance_signals.generate_attendance_summary,
-            sender=Attendance,
-            dispatch_uid="generate_attendance_summary"
+            sender=Attendance
         )
         super().tearDownClass()
 
@@ -1,15 +1,18 @@
 import logging
 from celery import shared_task
+from django.db import transaction
 from django.utils.timezone import now
 from payroll.models import Payroll
 from salary.models import Salary
 from earnings.models import Earnings
 from totalovertime.models import TotalOvertime
-from schedule.models import Schedule
+from schedule.services import get_schedule_index
 from employment_info.models import EmploymentInfo
 
 logger = logging.getLogger(__name__)
 
+PAYROLL_FIELDS = ["user_id", "gross_pay", "total_deductions", "net_pay", "pay_date", "schedule_id", "employment_info_id"]
+
 def calculate_gross_pay(earnings, overtime):
     return (
         (overtime.total_overtime if overtime else 0) +
@@ -36,48 +39,61 @@ def calculate_total_deductions(deductions, overtime, sss, philhealth, pagibig):
     )
 
 
-@shared_task
-def generate_payroll_for_salary(salary_id):
-    try:
-        salary = Salary.objects.get(id=salary_id)
-    except Salary.DoesNotExist:
-        logger.error(f"Salary ID {salary_id} not found.")
-        return f"Salary ID {salary_id} not found."
+def generate_payrolls(salary_ids):
+    """
+    Create or update the Payroll of many salaries: the salaries with their earnings, overtime, deductions and
+    contributions in one query, employment info in one, existing payrolls in one, then one bulk write each.
+    Payrolls that already have a Payslip are issued and left as they are. Returns the Payroll rows written.
+    """
+    salaries = list(Salary.objects.filter(id__in=salary_ids).exclude(payroll__payslip__isnull=False).select_related(
+        'user_id', 'earnings_id', 'overtime_id', 'deductions_id', 'sss_id', 'philhealth_id', 'pagibig_id',
+    ))
+    if not salaries:
+        return []
 
-    # Now use salary directly (instead of looping)
-    earnings = salary.earnings_id
-    overtime = salary.overtime_id
-    deductions = salary.deductions_id
-    sss = salary.sss_id
-    philhealth = salary.philhealth_id
-    pagibig = salary.pagibig_id
-    user_id = salary.user_id
-    pay_date = salary.pay_date
+    employment_infos = {}
+    for employment_info in EmploymentInfo.objects.filter(
+        employee_number__in={salary.user_id_id for salary in salaries}
+    ).order_by('id'):
+        employment_infos.setdefault(employment_info.employee_number, employment_info)
+    existing = {payroll.salary_id_id: payroll for payroll in Payroll.objects.filter(salary_id__in=salaries)}
 
-    gross_pay = calculate_gross_pay(earnings, overtime)
-    total_deductions = calculate_total_deductions(deductions, overtime, sss, philhealth, pagibig)
-    net_pay = gross_pay - total_deductions
-
-    schedule = Schedule.objects.filter(
-        user_id=user_id,
-        payroll_period_end__lt=pay_date
-    ).order_by('-payroll_period_end').first()
-
-    employment_info = EmploymentInfo.objects.filter(
-        employee_number=user_id.id
-    ).first()
-
-    payroll, created = Payroll.objects.update_or_create(
-        salary_id=salary,
-        defaults={
-            "user_id": user_id,
+    to_update, to_create = [], []
+    for salary in salaries:
+        gross_pay = calculate_gross_pay(salary.earnings_id, salary.overtime_id)
+        total_deductions = calculate_total_deductions(salary.deductions_id, salary.overtime_id, salary.sss_id,
+                                                      salary.philhealth_id, salary.pagibig_id)
+        values = {
+            "user_id": salary.user_id,
             "gross_pay": gross_pay,
             "total_deductions": total_deductions,
-            "net_pay": net_pay,
-            "pay_date": pay_date,
-            "schedule_id": schedule,
-            "employment_info_id": employment_info
+            "net_pay": gross_pay - total_deductions,
+            "pay_date": salary.pay_date,
+            "schedule_id": get_schedule_index(salary.user_id_id).latest_ending_before(salary.pay_date),
+            "employment_info_id": employment_infos.get(salary.user_id_id),
         }
-    )
 
-    return f"Payroll {'created' if created else 'updated'} for Salary ID {salary.id}"
+        payroll = existing.get(salary.id)
+        if payroll is None:
+            to_create.append(Payroll(salary_id=salary, **values))
+            continue
+        for field, value in values.items():
+            setattr(payroll, field, value)
+        to_update.append(payroll)
+
+    with transaction.atomic():
+        Payroll.objects.bulk_update(to_update, fields=PAYROLL_FIELDS)
+        Payroll.objects.bulk_create(to_create)
+
+    logger.info(f"[generate_payrolls] {len(to_create)} payrolls created, {len(to_update)} updated")
+    return to_update + to_create
+
+
+@shared_task
+def generate_payroll_for_salary(salary_id):
+    payrolls = generate_payrolls([salary_id])
+    if not payrolls:
+        logger.error(f"Salary ID {salary_id} not found.")
+        return f"Salary ID {salary_id} not found."
+
+    return f"Payroll written for Salary ID {salary_id}"
@@ -3,23 +3,31 @@ from django.utils.timezone import now
 from payslip.models import Payslip
 from payroll.models import Payroll
 
+
+def generate_payslips(payroll_ids):
+    """Create the missing Payslips of many payrolls with one read and one bulk insert. Returns the created rows."""
+    payrolls = Payroll.objects.filter(id__in=payroll_ids).exclude(
+        id__in=Payslip.objects.filter(payroll_id__in=payroll_ids).values('payroll_id')
+    )
+    return Payslip.objects.bulk_create([
+        Payslip(
+            user_id_id=payroll.user_id_id,
+            payroll_id=payroll,
+            status=False,
+            approved_at=None,
+            generated_at=None,
+            is_protected=True
+        )
+        for payroll in payrolls
+    ])
+
+
 @shared_task
 def generate_payslip_for_payroll(payroll_id):
-    try:
-        payroll = Payroll.objects.get(id=payroll_id)
-    except Payroll.DoesNotExist:
+    if not Payroll.objects.filter(id=payroll_id).exists():
         return f"Payroll ID {payroll_id} not found."
 
-    if Payslip.objects.filter(payroll_id=payroll).exists():
+    if not generate_payslips([payroll_id]):
         return f"Payslip already exists for Payroll ID {payroll_id}."
 
-    Payslip.objects.create(
-        user_id=payroll.user_id,
-        payroll_id=payroll,
-        status=False,
-        approved_at=None,
-        generated_at=None,
-        is_protected=True
-    )
-
     return f"Payslip created for Payroll ID {payroll_id}."
@@ -0,0 +1,125 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Salary
+from benefits.models import SSS, Philhealth, Pagibig
+from deductions.models import Deductions
+from earnings.models import Earnings
+from schedule.models import Schedule
+from shared.recompute import PAYROLL, mark_dirty
+from totalovertime.models import TotalOvertime
+
+logger = logging.getLogger(__name__)
+
+SALARY_BATCH_SIZE = 1000
+
+# Salaries are generated for the latest TotalOvertime periods of each user
+OVERTIME_PERIODS_PER_USER = 2
+
+
+def get_latest_per_user(model, user_ids):
+    """The latest row (highest id) of model for each of the users, in one DISTINCT ON query, as {user_id: row}."""
+    rows = model.objects.filter(user_id__in=user_ids).order_by('user_id', '-id').distinct('user_id')
+    return {row.user_id: row for row in rows}
+
+
+def get_latest_overtimes(user_ids, per_user=OVERTIME_PERIODS_PER_USER):
+    """The per_user latest TotalOvertime periods of each of the users, ranked with a window in one query."""
+    return list(
+        TotalOvertime.objects.filter(user_id__in=user_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=[F('user_id')], order_by=F('biweek_start').desc()))
+        .filter(rank__lte=per_user)
+        .order_by('user_id', 'rank')
+    )
+
+
+def get_period_ends(keys):
+    """
+    payroll_period_end of the schedule of each (user_id, bi_weekly_start), taking the first created schedule
+    when a user has several for the same start, in one DISTINCT ON query.
+    """
+    if not keys:
+        return {}
+    schedules = (
+        Schedule.objects.filter(
+            user_id__in={user_id for user_id, _ in keys},
+            bi_weekly_start__in={bi_weekly_start for _, bi_weekly_start in keys},
+        )
+        .order_by('user_id', 'bi_weekly_start', 'id').distinct('user_id', 'bi_weekly_start')
+        .values_list('user_id', 'bi_weekly_start', 'payroll_period_end')
+    )
+    return {(user_id, start): end for user_id, start, end in schedules if (user_id, start) in keys}
+
+
+def compute_pay_date(payroll_period_end):
+    """The 15th of the month for periods ending before the 15th, otherwise the last day of the month."""
+    if payroll_period_end.day < 15:
+        return payroll_period_end.replace(day=15)
+    next_month = payroll_period_end.replace(day=1) + timedelta(days=32)
+    return next_month.replace(day=1) - timedelta(days=1)
+
+
+def generate_salaries(user_ids):
+    """
+    Create the missing Salary entries of the users for their latest TotalOvertime periods.
+    The latest earnings, deductions and contributions, the overtime periods and their schedules are read with
+    one query each, pay dates are computed in memory, existing salaries are diffed in one query, and the missing
+    ones are written with one bulk insert. The new salaries are marked for payroll generation.
+    Returns the created Salary rows.
+    """
+    user_ids = list(user_ids)
+    overtimes = get_latest_overtimes(user_ids)
+    if not overtimes:
+        return []
+
+    latest = {
+        model: get_latest_per_user(model, user_ids)
+        for model in (Earnings, Deductions, SSS, Philhealth, Pagibig)
+    }
+    period_ends = get_period_ends({(overtime.user_id, overtime.biweek_start) for overtime in overtimes})
+
+    candidates = {}
+    for overtime in overtimes:
+        payroll_period_end = period_ends.get((overtime.user_id, overtime.biweek_start))
+        if not payroll_period_end:
+            logger.warning(f"[generate_salaries] No schedule with a payroll period end found for user "
+                           f"{overtime.user_id} with bi_weekly_start {overtime.biweek_start}")
+            continue
+        # The latest period wins when two of them fall on the same pay date
+        candidates.setdefault((overtime.user_id, compute_pay_date(payroll_period_end)), overtime)
+
+    existing = set(
+        Salary.objects.filter(
+            user_id__in={user_id for user_id, _ in candidates},
+            pay_date__in={pay_date for _, pay_date in candidates},
+        ).values_list('user_id', 'pay_date')
+    )
+
+    salaries = [
+        Salary(
+            user_id_id=user_id,
+            earnings_id=latest[Earnings].get(user_id),
+            deductions_id=latest[Deductions].get(user_id),
+            overtime_id=overtime,
+            sss_id=latest[SSS].get(user_id),
+            philhealth_id=latest[Philhealth].get(user_id),
+            pagibig_id=latest[Pagibig].get(user_id),
+            pay_date=pay_date,
+        )
+        for (user_id, pay_date), overtime in candidates.items() if (user_id, pay_date) not in existing
+    ]
+    if not salaries:
+        return []
+
+    with transaction.atomic():
+        created = Salary.objects.bulk_create(salaries, batch_size=SALARY_BATCH_SIZE)
+        # bulk_create skips post_save, so mark the payrolls here
+        mark_dirty(PAYROLL, [salary.id for salary in created])
+
+    logger.info(f"[generate_salaries] Created {len(created)} salary entries for {len(user_ids)} users "
+                f"({len(candidates) - len(created)} already existed)")
+    return created
@@ -1,99 +1,82 @@
-from celery import shared_task
-from django.utils.timezone import now
-from datetime import datetime, timedelta
 import logging
+import time
+
+from celery import chord, group, shared_task
+from django.utils.timezone import now
 from users.models import CustomUser
-from salary.models import Salary
-from earnings.models import Earnings
-from deductions.models import Deductions
-from totalovertime.models import TotalOvertime
-from benefits.models import SSS, Philhealth, Pagibig
-from schedule.models import Schedule
+from salary.services import generate_salaries
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+SALARY_CHUNK_SIZE = 500
+
+
+def get_active_user_ranges(chunk_size=SALARY_CHUNK_SIZE):
+    """Split the ids of the active users into contiguous (first_id, last_id) ranges of at most chunk_size users."""
+    user_ids = list(CustomUser.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    return [
+        (user_ids[i], user_ids[min(i + chunk_size, len(user_ids)) - 1])
+        for i in range(0, len(user_ids), chunk_size)
+    ]
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def generate_salary_chunk(self, first_id, last_id):
+    """
+    Create the missing salaries of the active users with ids in [first_id, last_id].
+    Existing salaries are skipped, so a retried chunk only creates what the failed attempt did not commit.
+    Failures are retried; once retries run out the error is reported in the result instead of failing the chord.
+    """
+    started = time.monotonic()
+    result = {"first_id": first_id, "last_id": last_id, "created": 0, "error": None}
+    user_ids = list(
+        CustomUser.objects.filter(is_active=True, id__range=(first_id, last_id)).values_list('id', flat=True)
+    )
+    try:
+        result["created"] = len(generate_salaries(user_ids))
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        logger.error(f"[generate_salary_chunk] Users {first_id}-{last_id} failed after {self.request.retries} retries: {e}")
+        result["error"] = str(e)
+
+    result["users"] = len(user_ids)
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
 
-@shared_task
-def generate_salary_entries():
-    today = now().date()
-    logger.info(f"Starting salary entry generation process on {today}")
-    users = CustomUser.objects.filter(is_active=True)
-    logger.info(f"Found {users.count()} active users.")
-
-    for user in users:
-        logger.info(f"Processing salary for user: {user.id} - {user.email}")
-
-        latest_earnings = Earnings.objects.filter(user=user).order_by('-id').first()
-        latest_deductions = Deductions.objects.filter(user=user).order_by('-id').first()
-        latest_sss = SSS.objects.filter(user=user).order_by('-id').first()
-        latest_philhealth = Philhealth.objects.filter(user=user).order_by('-id').first()
-        latest_pagibig = Pagibig.objects.filter(user=user).order_by('-id').first()
-
-        if not latest_earnings:
-            logger.warning(f"No earnings found for user: {user.id}")
-        if not latest_deductions:
-            logger.warning(f"No deductions found for user: {user.id}")
-        if not latest_sss:
-            logger.warning(f"No sss found for user: {user.id}")
-        if not latest_philhealth:
-            logger.warning(f"No philhealth found for user: {user.id}")
-        if not latest_pagibig:
-            logger.warning(f"No pagibig found for user: {user.id}")
-
-        overtime_entries = TotalOvertime.objects.filter(user=user).order_by('-biweek_start')[:2]
-        logger.info(f"Found {overtime_entries.count()} overtime entries for user: {user.id}")
 
-        for overtime in overtime_entries:
-            biweek_start = overtime.biweek_start
-
-            # Find the schedule with the matching bi_weekly_start
-            try:
-                schedule = Schedule.objects.filter(
-                    user_id=user,
-                    bi_weekly_start=biweek_start
-                ).first()
-
-                if not schedule:
-                    logger.warning(f"No schedule found for user {user.id} with bi_weekly_start {biweek_start}")
-                    continue
-
-                payroll_period_end = schedule.payroll_period_end
-                if not payroll_period_end:
-                    logger.warning(f"Schedule for user {user.id} has no payroll_period_end")
-                    continue
-
-                # Determine pay date based on payroll_period_end
-                if payroll_period_end.day < 15:
-                    # If before the 15th, pay date is the 15th of the same month
-                    pay_date = datetime(payroll_period_end.year, payroll_period_end.month, 15).date()
-                else:
-                    # If on or after the 15th, pay date is the last day of the month
-                    next_month = datetime(payroll_period_end.year, payroll_period_end.month, 1) + timedelta(days=32)
-                    pay_date = next_month.replace(day=1) - timedelta(days=1)
-
-                logger.info(
-                    f"Determined pay date {pay_date} for user: {user.id} (payroll period end: {payroll_period_end})")
+@shared_task
+def summarize_salary_chunks(results):
+    """Chord callback: total the created salaries and errors of the chunks, keeping the timing of each chunk."""
+    summary = {
+        "users": sum(result["users"] for result in results),
+        "created": sum(result["created"] for result in results),
+        "errors": [
+            {"first_id": result["first_id"], "last_id": result["last_id"], "error": result["error"]}
+            for result in results if result["error"]
+        ],
+        "chunks": [
+            {key: result[key] for key in ("first_id", "last_id", "users", "created", "seconds")}
+            for result in results
+        ],
+    }
+    slowest = max(results, key=lambda result: result["seconds"], default=None)
+    logger.info(f"[summarize_salary_chunks] Created {summary['created']} salary entries for {summary['users']} users "
+                f"in {len(results)} chunks, {len(summary['errors'])} failed"
+                + (f", slowest {slowest['first_id']}-{slowest['last_id']} in {slowest['seconds']}s" if slowest else ""))
+    return summary
 
-            except Exception as e:
-                logger.error(f"Error determining pay date for user {user.id}: {str(e)}")
-                continue
 
-            if Salary.objects.filter(user_id=user.id, pay_date=pay_date).exists():
-                logger.info(f"Salary entry already exists for user: {user.id} on {pay_date}. Skipping.")
-                continue
+@shared_task
+def generate_salary_entries(chunk_size=SALARY_CHUNK_SIZE):
+    """Fan salary generation out to the workers, one task per id range of active users, totalled by a chord callback."""
+    logger.info(f"Starting salary entry generation process on {now().date()}")
+    ranges = get_active_user_ranges(chunk_size)
+    if not ranges:
+        return "No active users to generate salary entries for."
 
-            Salary.objects.create(
-                user_id=user,
-                earnings_id=latest_earnings,
-                deductions_id=latest_deductions,
-                overtime_id=overtime,
-                sss_id=latest_sss,
-                philhealth_id=latest_philhealth,
-                pagibig_id=latest_pagibig,
-                pay_date=pay_date
-            )
-            logger.info(f"Salary entry created for user: {user.id} on {pay_date}")
+    chord(group(generate_salary_chunk.s(first_id, last_id) for first_id, last_id in ranges))(summarize_salary_chunks.s())
 
-    logger.info("Salary entry generation process completed.")
-    return "Salary entries checked and generated."
\ No newline at end of file
+    logger.info(f"[generate_salary_entries] Dispatched {len(ranges)} salary chunks")
+    return f"Dispatched {len(ranges)} salary chunks."
@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.test import TestCase
 from users.models import CustomUser
 from earnings.models import Earnings
@@ -5,6 +7,10 @@ from deductions.models import Deductions
 from totalovertime.models import TotalOvertime
 from benefits.models import SSS, Philhealth, Pagibig
 from salary.models import Salary
+from salary.services import compute_pay_date
+from salary.tasks import generate_salary_chunk, generate_salary_entries, get_active_user_ranges, summarize_salary_chunks
+from schedule.models import Schedule
+from shared.models import DirtyKey
 from datetime import date
 
 class SalaryModelTestCase(TestCase):
@@ -68,3 +74,62 @@ class SalaryModelTestCase(TestCase):
     def test_delete_salary(self):
         self.salary.delete()
         self.assertEqual(Salary.objects.count(), 0)
+
+
+class SalaryGenerationTestCase(TestCase):
+
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(email=f"salary{number}@example.com", password="password", role="employee")
+            for number in range(3)
+        ]
+        for user in self.users:
+            Earnings.objects.create(user=user, basic_rate=1000.00)
+            for start, end in ((date(2025, 3, 15), date(2025, 3, 31)), (date(2025, 4, 1), date(2025, 4, 14)),
+                               (date(2025, 4, 15), date(2025, 4, 28))):
+                Schedule.objects.create(user_id=user, days=["Monday"], hours=8, bi_weekly_start=start,
+                                        payroll_period_start=start, payroll_period_end=end)
+                TotalOvertime.objects.create(user=user, biweek_start=start)
+        self.existing = Salary.objects.create(user_id=self.users[0], pay_date=date(2025, 4, 15),
+                                              overtime_id=TotalOvertime.objects.get(user=self.users[0], biweek_start=date(2025, 4, 1)))
+        DirtyKey.objects.all().delete()
+
+    def test_pay_date(self):
+        self.assertEqual(compute_pay_date(date(2025, 4, 14)), date(2025, 4, 15))
+        self.assertEqual(compute_pay_date(date(2025, 4, 28)), date(2025, 4, 30))
+        self.assertEqual(compute_pay_date(date(2025, 2, 15)), date(2025, 2, 28))
+
+    def test_missing_salaries_are_created_in_one_batch(self):
+        with self.assertNumQueries(13):
+            result = generate_salary_chunk(self.users[0].id, self.users[-1].id)
+
+        # The two latest periods of each user, less the salary that already existed
+        self.assertEqual(Salary.objects.count(), 6)
+        salary = Salary.objects.get(user_id=self.users[1], pay_date=date(2025, 4, 30))
+        self.assertEqual(salary.overtime_id.biweek_start, date(2025, 4, 15))
+        self.assertEqual(salary.earnings_id, Earnings.objects.get(user=self.users[1]))
+        self.assertEqual(Salary.objects.filter(user_id=self.users[0], pay_date=date(2025, 4, 15)).get(), self.existing)
+        self.assertEqual(DirtyKey.objects.filter(node="payroll").count(), 5)
+        self.assertEqual((result["users"], result["created"], result["error"]), (3, 5, None))
+
+        # Chunks are idempotent, so a retry creates nothing twice
+        self.assertEqual(generate_salary_chunk(self.users[0].id, self.users[-1].id)["created"], 0)
+        self.assertEqual(Salary.objects.count(), 6)
+
+    def test_chunks_are_dispatched_as_a_chord(self):
+        self.assertEqual(len(get_active_user_ranges(chunk_size=2)), 2)
+        with mock.patch("salary.tasks.chord") as chord:
+            generate_salary_entries(chunk_size=2)
+        header = list(chord.call_args.args[0].tasks)
+        self.assertEqual([task.args for task in header], [
+            (self.users[0].id, self.users[1].id), (self.users[2].id, self.users[2].id),
+        ])
+        chord.return_value.assert_called_once_with(summarize_salary_chunks.s())
+
+        results = [generate_salary_chunk(*task.args) for task in header]
+        summary = summarize_salary_chunks(results + [
+            {"first_id": 90, "last_id": 99, "users": 4, "created": 0, "error": "boom", "seconds": 1.5},
+        ])
+        self.assertEqual((summary["users"], summary["created"]), (7, 5))
+        self.assertEqual(summary["errors"], [{"first_id": 90, "last_id": 99, "error": "boom"}])
+        self.assertEqual([chunk["users"] for chunk in summary["chunks"]], [2, 1, 4])
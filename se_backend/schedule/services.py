@@ -0,0 +1,108 @@
+import logging
+from bisect import bisect_left, bisect_right
+
+from .models import Schedule
+from shared.cache import TwoLevelCache
+
+logger = logging.getLogger(__name__)
+
+schedule_index_cache = TwoLevelCache("schedule:index")
+shift_map_cache = TwoLevelCache("schedule:shifts")
+
+
+class ScheduleIndex:
+    """Sorted interval index over one user's schedules, answering period lookups without a query."""
+
+    def __init__(self, schedules):
+        dated = sorted(
+            (schedule for schedule in schedules if schedule.payroll_period_start and schedule.payroll_period_end),
+            key=lambda schedule: (schedule.payroll_period_start, schedule.id),
+        )
+        self._by_start = dated
+        self._starts = [schedule.payroll_period_start for schedule in dated]
+
+        # Running maximum of the period ends lets covering() stop walking back as soon as no earlier period can match
+        self._max_ends = []
+        for schedule in dated:
+            previous = self._max_ends[-1] if self._max_ends else schedule.payroll_period_end
+            self._max_ends.append(max(previous, schedule.payroll_period_end))
+
+        self._by_end = sorted(dated, key=lambda schedule: (schedule.payroll_period_end, schedule.id))
+        self._ends = [schedule.payroll_period_end for schedule in self._by_end]
+
+        self._by_bi_weekly_start = {}
+        for schedule in sorted(schedules, key=lambda schedule: schedule.id):
+            self._by_bi_weekly_start.setdefault(schedule.bi_weekly_start, schedule)
+
+    def covering(self, date):
+        """The latest-starting schedule whose payroll period includes date."""
+        index = bisect_right(self._starts, date) - 1
+        while index >= 0 and self._max_ends[index] >= date:
+            schedule = self._by_start[index]
+            if schedule.payroll_period_end >= date:
+                return schedule
+            index -= 1
+        return None
+
+    def latest_ending_before(self, date):
+        """The schedule with the latest payroll period end strictly before date."""
+        index = bisect_left(self._ends, date) - 1
+        return self._by_end[index] if index >= 0 else None
+
+    def by_bi_weekly_start(self, date):
+        return self._by_bi_weekly_start.get(date)
+
+
+def build_schedule_index(user_id):
+    return ScheduleIndex(list(Schedule.objects.filter(user_id=user_id)))
+
+
+def build_schedule_indexes(user_ids):
+    """Build the ScheduleIndex of many users with one query."""
+    schedules = {user_id: [] for user_id in user_ids}
+    for schedule in Schedule.objects.filter(user_id__in=user_ids):
+        schedules[schedule.user_id_id].append(schedule)
+    return {user_id: ScheduleIndex(user_schedules) for user_id, user_schedules in schedules.items()}
+
+
+def get_schedule_index(user):
+    """Return the cached ScheduleIndex of a user, given the user or its id."""
+    return schedule_index_cache.get(getattr(user, 'pk', user), build_schedule_index)
+
+
+def get_schedule_indexes(users):
+    """Return {user_id: ScheduleIndex} for many users, given users or their ids, with one cache round trip."""
+    return schedule_index_cache.get_many([getattr(user, 'pk', user) for user in users], build_schedule_indexes)
+
+
+def get_schedule_for_date(user, date):
+    """Return the schedule whose payroll period includes the given date."""
+    return get_schedule_index(user).covering(date)
+
+
+def build_shift_maps(schedule_ids):
+    """Build the {date: shift} mapping of many schedules with one query through the M2M table."""
+    shift_maps = {schedule_id: {} for schedule_id in schedule_ids}
+    links = Schedule.shift_ids.through.objects.filter(schedule_id__in=schedule_ids).select_related('shift').order_by('shift_id')
+    for link in links:
+        shift_maps[link.schedule_id].setdefault(link.shift.date, link.shift)
+    return shift_maps
+
+
+def get_shift_maps(schedule_ids):
+    """Return {schedule_id: {date: shift}} for many schedules from the cache."""
+    return shift_map_cache.get_many(schedule_ids, build_shift_maps)
+
+
+def get_shift_map(schedule):
+    """Return the cached {date: shift} mapping of a schedule, given the schedule or its id."""
+    schedule_id = getattr(schedule, 'pk', schedule)
+    return get_shift_maps([schedule_id])[schedule_id]
+
+
+def get_shift_for_date(user, date):
+    """Return the shift the user is scheduled on for the given date, or None."""
+    schedule = get_schedule_for_date(user, date)
+    if not schedule:
+        return None
+    return get_shift_map(schedule).get(date)
@@ -1,17 +1,94 @@
-from django.db.models.signals import post_save
+import logging
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from .models import Schedule
+from .services import schedule_index_cache, shift_map_cache
+from shared.recompute import ATTENDANCE_METRICS, mark_dirty
+from shift.models import Shift
+
+logger = logging.getLogger(__name__)
+
+# Fields that decide which attendance days a schedule's period covers; the holiday sync marks its own saves
+PERIOD_FIELDS = ('user_id', 'payroll_period_start', 'payroll_period_end')
+
+
+def get_period_keys(schedules):
+    """The (user_id, payroll_period_start) keys of the given schedules' periods."""
+    return {(user_id, start) for user_id, start in schedules.values_list('user_id', 'payroll_period_start') if start}
+
+
+def mark_schedule_periods(schedule_ids):
+    """Mark the attendance metrics of the schedules' periods, so stored days pick up their new shifts."""
+    mark_dirty(ATTENDANCE_METRICS, get_period_keys(Schedule.objects.filter(id__in=schedule_ids)))
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+def invalidate_schedule_index(sender, instance, **kwargs):
+    schedule_index_cache.invalidate(instance.user_id_id)
+    logger.debug(f"[invalidate_schedule_index] Schedule index invalidated for User {instance.user_id_id}")
+
+
+def changes_period(update_fields):
+    return update_fields is None or bool(set(update_fields) & set(PERIOD_FIELDS))
+
+
+@receiver(pre_save, sender=Schedule)
+def remember_schedule_period(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored period of a schedule, so the days it no longer covers are rebuilt too."""
+    instance._previous_period = None
+    if instance.pk and changes_period(update_fields):
+        instance._previous_period = Schedule.objects.filter(pk=instance.pk).values_list(
+            'user_id', 'payroll_period_start'
+        ).first()
 
 
 @receiver(post_save, sender=Schedule)
-def update_holidays_on_schedule_change(sender, instance, created, **kwargs):
-    """
-    When a schedule is created or its payroll period changes,
-    queue a Celery task to update its holidays.
-    """
-    from master_calendar.tasks import update_schedule_holidays
-
-    # Check if it's a new schedule or if payroll period fields were updated
-    if created or kwargs.get('update_fields') and any(field in kwargs.get('update_fields', [])
-                                                      for field in ['payroll_period_start', 'payroll_period_end']):
-        update_schedule_holidays.delay(instance.id)
\ No newline at end of file
+def rebuild_metrics_on_schedule_save(sender, instance, created, update_fields=None, **kwargs):
+    if not created and not changes_period(update_fields):
+        return
+    keys = {getattr(instance, '_previous_period', None), (instance.user_id_id, instance.payroll_period_start)}
+    mark_dirty(ATTENDANCE_METRICS, {key for key in keys if key and key[1]})
+
+
+@receiver(post_delete, sender=Schedule)
+def rebuild_metrics_on_schedule_delete(sender, instance, **kwargs):
+    if instance.payroll_period_start:
+        mark_dirty(ATTENDANCE_METRICS, [(instance.user_id_id, instance.payroll_period_start)])
+
+
+@receiver(m2m_changed, sender=Schedule.shift_ids.through)
+def invalidate_shift_map_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # instance is a Shift; on clear the affected schedules are only known before the links go away
+        if action == "pre_clear":
+            schedule_ids = list(instance.schedule_set.values_list('id', flat=True))
+        elif action in ("post_add", "post_remove"):
+            schedule_ids = pk_set or []
+        else:
+            return
+    elif action in ("post_add", "post_remove", "post_clear"):
+        schedule_ids = [instance.id]
+    else:
+        return
+
+    for schedule_id in schedule_ids:
+        shift_map_cache.invalidate(schedule_id)
+    mark_schedule_periods(schedule_ids)
+
+
+@receiver(post_save, sender=Shift)
+def invalidate_shift_map_on_shift_save(sender, instance, created, **kwargs):
+    if created:
+        return
+    schedule_ids = list(instance.schedule_set.values_list('id', flat=True))
+    for schedule_id in schedule_ids:
+        shift_map_cache.invalidate(schedule_id)
+    mark_schedule_periods(schedule_ids)
+
+
+@receiver(pre_delete, sender=Shift)
+def invalidate_shift_map_on_shift_delete(sender, instance, **kwargs):
+    schedule_ids = list(instance.schedule_set.values_list('id', flat=True))
+    for schedule_id in schedule_ids:
+        shift_map_cache.invalidate(schedule_id)
+    mark_schedule_periods(schedule_ids)
@@ -1,6 +1,9 @@
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
 from django.db.models.signals import post_save
 from schedule.models import Schedule
+from schedule.services import get_schedule_for_date, get_schedule_index, get_shift_for_date, get_shift_map
 from attendance_summary.signals import handle_schedule_update  # Assuming this is where the signal is defined
 from users.models import CustomUser
 from shift.models import Shift
@@ -103,3 +106,141 @@ class ScheduleModelTestCase(TestCase):
         self.assertEqual(updated_schedule.nightdiff, [date(2025, 4, 10)])
         self.assertEqual(updated_schedule.oncall, [date(2025, 4, 11)])
         self.assertEqual(updated_schedule.vacationleave, [date(2025, 4, 12)])
+
+
+class ScheduleIndexTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="index@example.com", password="password", role="employee"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = Schedule.objects.create(
+                user_id=self.user,
+                payroll_period_start=date(2025, 4, 1),
+                payroll_period_end=date(2025, 4, 15),
+                hours=8,
+                bi_weekly_start=date(2025, 4, 1),
+            )
+            self.second = Schedule.objects.create(
+                user_id=self.user,
+                payroll_period_start=date(2025, 4, 16),
+                payroll_period_end=date(2025, 4, 30),
+                hours=8,
+                bi_weekly_start=date(2025, 4, 16),
+            )
+
+    def test_lookups(self):
+        index = get_schedule_index(self.user)
+        self.assertEqual(index.covering(date(2025, 4, 1)).id, self.first.id)
+        self.assertEqual(index.covering(date(2025, 4, 20)).id, self.second.id)
+        self.assertIsNone(index.covering(date(2025, 5, 1)))
+        self.assertIsNone(index.latest_ending_before(date(2025, 4, 15)))
+        self.assertEqual(index.latest_ending_before(date(2025, 5, 15)).id, self.second.id)
+        self.assertEqual(index.by_bi_weekly_start(date(2025, 4, 16)).id, self.second.id)
+
+    def test_cached_lookup_issues_no_query(self):
+        get_schedule_for_date(self.user, date(2025, 4, 2))
+        with self.assertNumQueries(0):
+            schedule = get_schedule_for_date(self.user.id, date(2025, 4, 2))
+        self.assertEqual(schedule.id, self.first.id)
+
+    def test_invalidation_waits_for_commit(self):
+        get_schedule_for_date(self.user, date(2025, 4, 2))
+        version_key = f"schedule:index:{self.user.id}:version"
+        version = cache.get(version_key)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.first.hours = 6
+            self.first.save()
+            # Other processes keep the committed copy; this thread already reads its own write
+            self.assertEqual(cache.get(version_key), version)
+            self.assertEqual(get_schedule_for_date(self.user, date(2025, 4, 2)).hours, 6)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache.get(version_key), version)
+
+    def test_rolled_back_invalidation_keeps_the_token(self):
+        get_schedule_for_date(self.user, date(2025, 4, 2))
+        version_key = f"schedule:index:{self.user.id}:version"
+        version = cache.get(version_key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.first.hours = 6
+                    self.first.save()
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertEqual(cache.get(version_key), version)
+        self.assertEqual(get_schedule_for_date(self.user, date(2025, 4, 2)).hours, 8)
+
+    def test_save_and_delete_invalidate(self):
+        self.assertEqual(get_schedule_for_date(self.user, date(2025, 4, 2)).hours, 8)
+
+        self.first.hours = 6
+        self.first.save()
+        self.assertEqual(get_schedule_for_date(self.user, date(2025, 4, 2)).hours, 6)
+
+        self.first.delete()
+        self.assertIsNone(get_schedule_for_date(self.user, date(2025, 4, 2)))
+
+
+class ShiftMapTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="shiftmap@example.com", password="password", role="employee"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule = Schedule.objects.create(
+                user_id=self.user,
+                payroll_period_start=date(2025, 4, 1),
+                payroll_period_end=date(2025, 4, 15),
+                hours=8,
+                bi_weekly_start=date(2025, 4, 1),
+            )
+            self.shift = Shift.objects.create(
+                date=date(2025, 4, 2),
+                shift_start="09:00:00",
+                shift_end="17:00:00",
+                expected_hours=8
+            )
+            self.schedule.shift_ids.add(self.shift)
+
+    def test_cached_map_issues_no_query(self):
+        get_shift_map(self.schedule)
+        with self.assertNumQueries(0):
+            shift_map = get_shift_map(self.schedule.id)
+        self.assertEqual(shift_map[date(2025, 4, 2)].id, self.shift.id)
+
+    def test_m2m_changes_invalidate(self):
+        get_shift_map(self.schedule)
+        other = Shift.objects.create(
+            date=date(2025, 4, 3),
+            shift_start="10:00:00",
+            shift_end="18:00:00",
+            expected_hours=8
+        )
+        self.schedule.shift_ids.add(other)
+        self.assertIn(date(2025, 4, 3), get_shift_map(self.schedule))
+
+        self.schedule.shift_ids.remove(self.shift)
+        self.assertNotIn(date(2025, 4, 2), get_shift_map(self.schedule))
+
+        other.schedule_set.clear()
+        self.assertEqual(get_shift_map(self.schedule), {})
+
+    def test_shift_save_and_delete_invalidate(self):
+        get_shift_map(self.schedule)
+        self.shift.expected_hours = 4
+        self.shift.save()
+        self.assertEqual(get_shift_for_date(self.user, date(2025, 4, 2)).expected_hours, 4)
+
+        self.shift.delete()
+        self.assertIsNone(get_shift_for_date(self.user, date(2025, 4, 2)))
@@ -45,6 +45,10 @@ app.conf.beat_schedule = {
         #'schedule': crontab(day_of_week=1, hour=0, minute=0),
         "schedule": crontab(minute="*"),
     },
+    "poll-biometric-terminals": {
+        "task": "biometricdata.tasks.poll_biometric_terminals",
+        "schedule": crontab(minute="*"),  # every minute
+    },
 
 }
 
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from datetime import timedelta
+from decimal import Decimal
 from pathlib import Path
 
 from decouple import config
@@ -230,6 +231,37 @@ CELERY_RESULT_BACKEND = "redis://redis:6379/0"
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://redis:6379/1",
+    }
+}
+
+# Multiples of the hourly rate paid for each OvertimeHours bucket when pricing TotalOvertime
+OVERTIME_MULTIPLIERS = {
+    "regularot": config("OVERTIME_MULTIPLIER_REGULAR_OT", default="1.25", cast=Decimal),
+    "restday": config("OVERTIME_MULTIPLIER_REST_DAY", default="1.30", cast=Decimal),
+    "regularholiday": config("OVERTIME_MULTIPLIER_REGULAR_HOLIDAY", default="2.00", cast=Decimal),
+    "specialholiday": config("OVERTIME_MULTIPLIER_SPECIAL_HOLIDAY", default="1.30", cast=Decimal),
+    "nightdiff": config("OVERTIME_MULTIPLIER_NIGHT_DIFF", default="0.10", cast=Decimal),
+    "backwage": config("OVERTIME_MULTIPLIER_BACKWAGE", default="1.00", cast=Decimal),
+}
+
+# Recompute marks made within this window are coalesced into a single drain of the recompute graph
+ATTENDANCE_RECOMPUTE_DEBOUNCE_SECONDS = config("ATTENDANCE_RECOMPUTE_DEBOUNCE_SECONDS", default=15, cast=int)
+
+# ZKTeco biometric terminal polled by biometricdata.tasks.sync_biometric_device
+ZKTECO_IP = config("ZKTECO_IP", default="192.168.1.201")
+ZKTECO_PORT = config("ZKTECO_PORT", default=4370, cast=int)
+ZKTECO_TERMINAL_NAME = config("ZKTECO_TERMINAL_NAME", default="ZKTeco Terminal")
+
+# When buffered, bulk punch uploads go on this stream and are drained by `manage.py consume_punches` workers
+# (the punch_consumer compose service); local:// is an in-process stand-in for tests only
+BIOMETRIC_INGEST_BUFFERED = config("BIOMETRIC_INGEST_BUFFERED", default=False, cast=bool)
+BIOMETRIC_STREAM_URL = config("BIOMETRIC_STREAM_URL", default="redis://redis:6379/2")
+BIOMETRIC_STREAM_NAME = config("BIOMETRIC_STREAM_NAME", default="biometric:punches")
+
 RESEND_API_KEY = config("RESEND_API_KEY")
 RESEND_HOST = config("RESEND_HOST")
 
@@ -0,0 +1,124 @@
+import threading
+import uuid
+from collections import OrderedDict
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+class TwoLevelCache:
+    """
+    Process-local LRU backed by the shared Django cache (Redis).
+
+    Every key carries a version token kept in the shared cache. A local entry is only served while its
+    token matches, so invalidating a key in one process is seen by every other process on its next lookup.
+
+    Invalidations made inside a transaction rotate the token when it commits, so no process can cache data
+    it read before the commit under the new token. Until then the invalidating thread, which sees its own
+    uncommitted writes, builds those keys fresh without storing them at either level.
+    """
+
+    def __init__(self, namespace, maxsize=2048, timeout=60 * 60 * 24):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = threading.local()
+
+    def _version_key(self, key):
+        return f"{self.namespace}:{key}:version"
+
+    def _value_key(self, key):
+        return f"{self.namespace}:{key}:value"
+
+    def get(self, key, build):
+        """Return the cached value of key, calling build(key) only when neither level holds a current copy."""
+        return self.get_many([key], lambda keys: {key: build(key) for key in keys})[key]
+
+    def _pending(self):
+        """Keys this thread invalidated in its open transaction; left over from a rolled back one once it ends."""
+        pending = getattr(self._thread, "pending", None)
+        if pending is None or not connection.in_atomic_block:
+            pending = self._thread.pending = set()
+        return pending
+
+    def get_many(self, keys, build_many):
+        """
+        Batched get(): returns {key: value}, reading both levels with one round trip each and
+        calling build_many(missing_keys) -> {key: value} once for every key neither level holds.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        # Keys this thread invalidated in its open transaction are built fresh and kept at neither level
+        pending = self._pending()
+        uncommitted = [key for key in keys if key in pending]
+        keys = [key for key in keys if key not in pending]
+
+        versions = cache.get_many([self._version_key(key) for key in keys])
+        for key in keys:
+            if self._version_key(key) not in versions:
+                cache.add(self._version_key(key), uuid.uuid4().hex, timeout=None)
+                versions[self._version_key(key)] = cache.get(self._version_key(key))
+        versions = {key: versions[self._version_key(key)] for key in keys}
+
+        values = {}
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key)
+                if entry and entry[0] == versions[key]:
+                    self._local.move_to_end(key)
+                    values[key] = entry[1]
+
+        misses = [key for key in keys if key not in values]
+        if misses:
+            stored = cache.get_many([self._value_key(key) for key in misses])
+            for key in misses:
+                entry = stored.get(self._value_key(key))
+                if entry and entry[0] == versions[key]:
+                    values[key] = entry[1]
+
+        unbuilt = [key for key in misses if key not in values]
+        if unbuilt or uncommitted:
+            built = build_many(unbuilt + uncommitted)
+            # Versions were read before building, so a concurrent invalidation makes these copies stale, never wrong
+            cache.set_many(
+                {self._value_key(key): (versions[key], built[key]) for key in unbuilt},
+                timeout=self.timeout,
+            )
+            values.update((key, built[key]) for key in unbuilt + uncommitted)
+
+        if misses:
+            with self._lock:
+                for key in misses:
+                    self._local[key] = (versions[key], values[key])
+                    self._local.move_to_end(key)
+                while len(self._local) > self.maxsize:
+                    self._local.popitem(last=False)
+
+        return values
+
+    def invalidate(self, key):
+        """Drop key from every process by rotating its version token, once the current transaction commits."""
+        with self._lock:
+            self._local.pop(key, None)
+        if not connection.in_atomic_block:
+            self._rotate(key)
+            return
+
+        self._pending().add(key)
+        transaction.on_commit(partial(self._rotate, key))
+
+    def _rotate(self, key):
+        cache.set(self._version_key(key), uuid.uuid4().hex, timeout=None)
+        cache.delete(self._value_key(key))
+        with self._lock:
+            self._local.pop(key, None)
+        getattr(self._thread, "pending", set()).discard(key)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
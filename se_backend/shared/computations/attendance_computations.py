@@ -0,0 +1,94 @@
+import numpy as np
+
+BREAK_MINUTES = 60
+MINUTES_PER_DAY = 24 * 60
+
+
+def time_to_minutes(value):
+    """Convert a time object into minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def is_overnight(shift_start, shift_end):
+    """Whether a shift ends earlier in the day than it starts, i.e. runs past midnight."""
+    return shift_end is not None and time_to_minutes(shift_end) < time_to_minutes(shift_start)
+
+
+def calculate_minutes(check_in, check_out, overnight=False):
+    """
+    Calculate total worked minutes, deducting a one-hour break if applicable.
+    On an overnight shift a check-out earlier in the day than the check-in is on the next day,
+    on any other shift it counts as no work.
+    """
+    if not check_in or not check_out:
+        return 0
+
+    total_minutes = time_to_minutes(check_out) - time_to_minutes(check_in)
+    if overnight:
+        total_minutes %= MINUTES_PER_DAY
+    return max(0, total_minutes - BREAK_MINUTES)
+
+
+def compute_day_metrics(check_in, check_out, shift_start, expected_hours, is_special=False, is_regular=False,
+                        shift_end=None):
+    """
+    Compute the attendance metrics of a single day, in minutes.
+    Hours worked on a holiday only count towards the holiday totals.
+    """
+    worked_minutes = calculate_minutes(check_in, check_out, is_overnight(shift_start, shift_end))
+
+    metrics = {
+        "actual_minutes": 0,
+        "overtime_minutes": 0,
+        "late_minutes": 0,
+        "undertime_minutes": 0,
+        "special_minutes": 0,
+        "regular_minutes": 0,
+    }
+
+    if is_special:
+        metrics["special_minutes"] = worked_minutes
+        return metrics
+
+    if is_regular:
+        metrics["regular_minutes"] = worked_minutes
+        return metrics
+
+    expected_minutes = expected_hours * 60
+    metrics["actual_minutes"] = worked_minutes
+    metrics["overtime_minutes"] = max(0, worked_minutes - expected_minutes)
+    metrics["late_minutes"] = max(0, time_to_minutes(check_in) - time_to_minutes(shift_start))
+    metrics["undertime_minutes"] = max(0, expected_minutes - worked_minutes)
+    return metrics
+
+
+def compute_day_metrics_batch(check_in, check_out, shift_start, expected_minutes, is_special, is_regular,
+                              shift_end=None):
+    """
+    Vectorized compute_day_metrics over many attendance days at once.
+    Times are given as minutes since midnight; every argument is an array of the same length.
+    Without shift_end no shift is treated as overnight.
+    """
+    check_in = np.asarray(check_in, dtype=np.int32)
+    check_out = np.asarray(check_out, dtype=np.int32)
+    shift_start = np.asarray(shift_start, dtype=np.int32)
+    expected_minutes = np.asarray(expected_minutes, dtype=np.int32)
+    is_special = np.asarray(is_special, dtype=bool)
+    is_regular = np.asarray(is_regular, dtype=bool) & ~is_special
+
+    total_minutes = check_out - check_in
+    if shift_end is not None:
+        overnight = np.asarray(shift_end, dtype=np.int32) < shift_start
+        total_minutes = np.where(overnight, total_minutes % MINUTES_PER_DAY, total_minutes)
+    worked_minutes = np.maximum(0, total_minutes - BREAK_MINUTES)
+    workday = ~(is_special | is_regular)
+    zero = np.zeros_like(worked_minutes)
+
+    return {
+        "actual_minutes": np.where(workday, worked_minutes, zero),
+        "overtime_minutes": np.where(workday, np.maximum(0, worked_minutes - expected_minutes), zero),
+        "late_minutes": np.where(workday, np.maximum(0, check_in - shift_start), zero),
+        "undertime_minutes": np.where(workday, np.maximum(0, expected_minutes - worked_minutes), zero),
+        "special_minutes": np.where(is_special, worked_minutes, zero),
+        "regular_minutes": np.where(is_regular, worked_minutes, zero),
+    }
@@ -0,0 +1,47 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+HOURS_PER_DAY = Decimal(8)
+PAY_PERIODS_PER_YEAR = Decimal(24)
+WORKING_DAYS_PER_YEAR = Decimal(261)
+
+CENTS = Decimal("0.01")
+
+# OvertimeHours bucket -> TotalOvertime amount field; all buckets are hours
+OVERTIME_AMOUNT_FIELDS = {
+    "regularot": "total_regularot",
+    "regularholiday": "total_regularholiday",
+    "specialholiday": "total_specialholiday",
+    "restday": "total_restday",
+    "nightdiff": "total_nightdiff",
+    "backwage": "total_backwage",
+}
+
+
+def compute_hourly_rate(backwage_base=None, basic_rate=None):
+    """
+    Hourly rate of an employee. OvertimeBase.backwage_base is a daily rate; without one, the semi-monthly
+    Earnings.basic_rate is annualized and spread over the working days of the year.
+    """
+    if backwage_base:
+        return Decimal(backwage_base) / HOURS_PER_DAY
+    if basic_rate:
+        return Decimal(basic_rate) * PAY_PERIODS_PER_YEAR / WORKING_DAYS_PER_YEAR / HOURS_PER_DAY
+    return Decimal(0)
+
+
+def compute_overtime_amounts(hours, hourly_rate, multipliers):
+    """
+    Peso amounts of one period's OvertimeHours buckets. Each bucket pays its hours at hourly_rate times the
+    bucket's multiplier; late (minutes) and undertime (hours) are valued at the plain hourly rate.
+    """
+    def amount(value):
+        return Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+    amounts = {
+        field: amount(Decimal(hours.get(bucket) or 0) * hourly_rate * multipliers[bucket])
+        for bucket, field in OVERTIME_AMOUNT_FIELDS.items()
+    }
+    amounts["total_overtime"] = sum(amounts.values(), Decimal(0))
+    amounts["total_late"] = amount(Decimal(hours.get("late") or 0) / 60 * hourly_rate)
+    amounts["total_undertime"] = amount(Decimal(hours.get("undertime") or 0) * hourly_rate)
+    return amounts
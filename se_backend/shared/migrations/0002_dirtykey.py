@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-18 18:25
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyKey',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('node', models.CharField(max_length=64)),
+                ('key', models.JSONField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dirtykey',
+            constraint=models.UniqueConstraint(fields=('node', 'key'), name='unique_dirty_key'),
+        ),
+    ]
@@ -16,3 +16,28 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class JobCheckpoint(BaseModel):
+    """Progress marker of a resumable batch job, keyed by job name."""
+    name = models.CharField(max_length=255, unique=True)
+    position = models.JSONField(default=dict)
+    processed = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.name} - {self.processed} processed"
+
+
+class DirtyKey(BaseModel):
+    """A key of a derived node in the recompute graph waiting to be recomputed."""
+    node = models.CharField(max_length=64)
+    key = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['node', 'key'], name='unique_dirty_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.node} - {self.key}"
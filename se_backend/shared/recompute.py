@@ -0,0 +1,244 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from graphlib import TopologicalSorter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .models import DirtyKey
+
+logger = logging.getLogger(__name__)
+
+# Nodes of the recompute graph. Keys are (user_id, period_start) pairs unless noted.
+ATTENDANCE_METRICS = "attendance_metrics"
+ATTENDANCE_SUMMARY = "attendance_summary"
+OVERTIME_HOURS = "overtime_hours"
+TOTAL_OVERTIME = "total_overtime"
+PAYROLL = "payroll"    # keyed by salary id
+PAYSLIP = "payslip"    # keyed by payroll id
+CONTRIBUTIONS = "contributions"    # keyed by user id
+
+DRAIN_BATCH_SIZE = 5000
+DRAIN_PENDING_KEY = "recompute:drain:pending"
+
+_state = threading.local()
+
+
+def encode_key(key):
+    return json.loads(json.dumps(key, cls=DjangoJSONEncoder))
+
+
+def user_period_key(key):
+    user_id, period_start = key
+    return user_id, date.fromisoformat(period_start)
+
+
+def id_key(key):
+    return key
+
+
+class RecomputeGraph:
+    """
+    Derived models as nodes of a DAG. A node recomputes a batch of its keys at once; an edge maps the keys
+    a parent recomputed to the keys of the child that depend on them. Running the graph visits the nodes in
+    topological order, so each dirty key is recomputed once, after everything it depends on.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = defaultdict(list)
+
+    def node(self, name, decode=user_period_key):
+        """Register the batch recompute function of a node."""
+        def register(recompute):
+            self.nodes[name] = (recompute, decode)
+            return recompute
+        return register
+
+    def edge(self, parent, child):
+        """Register the function mapping recomputed keys of parent to the dependent keys of child."""
+        def register(map_keys):
+            self.edges[parent].append((child, map_keys))
+            return map_keys
+        return register
+
+    @property
+    def order(self):
+        sorter = TopologicalSorter({name: set() for name in self.nodes})
+        for parent, children in self.edges.items():
+            for child, _ in children:
+                sorter.add(child, parent)
+        return list(sorter.static_order())
+
+    def run(self, dirty):
+        """
+        Recompute the dirty {node: keys} and everything downstream of them. Marks made by receivers while the
+        graph runs are dropped, since the edges already carry them. If a node fails, its keys and every key still
+        pending are marked dirty again before the error propagates. Returns {node: (keys, seconds)}.
+        """
+        pending = defaultdict(set)
+        for name, keys in dirty.items():
+            pending[name] |= set(keys)
+
+        stats = {}
+        with recomputing():
+            for name in self.order:
+                keys = pending.pop(name, None)
+                if not keys:
+                    continue
+
+                started = time.monotonic()
+                try:
+                    self.nodes[name][0](sorted(keys))
+                    for child, map_keys in self.edges[name]:
+                        pending[child] |= set(map_keys(keys))
+                except Exception:
+                    pending[name] |= keys
+                    store_dirty_keys(pending)
+                    raise
+                stats[name] = (len(keys), round(time.monotonic() - started, 3))
+
+        logger.info("[RecomputeGraph.run] " + ", ".join(
+            f"{name}: {count} keys in {seconds}s" for name, (count, seconds) in stats.items()
+        ))
+        return stats
+
+
+@contextmanager
+def recomputing():
+    previous = getattr(_state, "recomputing", False)
+    _state.recomputing = True
+    try:
+        yield
+    finally:
+        _state.recomputing = previous
+
+
+def is_recomputing():
+    return getattr(_state, "recomputing", False)
+
+
+def store_dirty_keys(dirty):
+    rows = [DirtyKey(node=name, key=encode_key(key)) for name, keys in dirty.items() for key in keys]
+    DirtyKey.objects.bulk_create(rows, ignore_conflicts=True, batch_size=DRAIN_BATCH_SIZE)
+    return len(rows)
+
+
+@contextmanager
+def deferred_recompute():
+    """
+    Hold the marks of everything written inside the block in memory and recompute them in one graph run
+    when the block exits, instead of storing each mark and draining in the background. Also a decorator:
+
+        with deferred_recompute():
+            import_attendance_rows(rows)
+
+    Marks join the buffer only when their transaction commits, so marks of rolled-back writes are discarded.
+    Nested blocks share the outermost buffer, which is flushed once the transaction around it commits.
+    If the flush fails, the keys it had not finished are stored for the drain task.
+    """
+    outermost = getattr(_state, "deferred", None) is None
+    if outermost:
+        _state.deferred = defaultdict(set)
+    buffer = _state.deferred
+    try:
+        yield
+    finally:
+        if outermost:
+            _state.deferred = None
+            transaction.on_commit(lambda: flush_deferred(buffer))
+
+
+def is_deferred():
+    return getattr(_state, "deferred", None) is not None
+
+
+def flush_deferred(buffer):
+    from .recompute_graph import graph
+
+    if not buffer:
+        return None
+    try:
+        return graph.run(buffer)
+    except Exception:
+        schedule_drain()
+        raise
+
+
+def mark_dirty(node, keys):
+    """
+    Mark keys of a node as needing a recompute and queue a drain once the transaction commits.
+    Marks are stored with the change, so they survive a lost task. Inside deferred_recompute() they are
+    buffered for the block's flush instead. Returns the number of keys marked.
+    """
+    keys = set(keys)
+    if not keys or is_recomputing():
+        return 0
+
+    if is_deferred():
+        buffer = _state.deferred
+        transaction.on_commit(lambda: buffer[node].update(keys))
+        return len(keys)
+
+    marked = store_dirty_keys({node: keys})
+    transaction.on_commit(schedule_drain)
+    return marked
+
+
+def schedule_drain():
+    """Queue one drain of the dirty keys unless one is already pending; bursts of marks share it."""
+    from .tasks import drain_recompute_queue
+
+    debounce = settings.ATTENDANCE_RECOMPUTE_DEBOUNCE_SECONDS
+    # The flag outlives the countdown so a lost task cannot block drains forever
+    if not cache.add(DRAIN_PENDING_KEY, True, timeout=debounce * 4 + 60):
+        return False
+
+    drain_recompute_queue.apply_async(countdown=debounce)
+    return True
+
+
+def claim_dirty_keys(limit=DRAIN_BATCH_SIZE):
+    """Delete and return up to limit dirty keys as {node: keys}; concurrent drains skip each other's rows."""
+    table = connection.ops.quote_name(DirtyKey._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN ("
+            f"SELECT id FROM {table} ORDER BY created_at LIMIT %s FOR UPDATE SKIP LOCKED"
+            f") RETURNING node, key",
+            [limit],
+        )
+        rows = cursor.fetchall()
+
+    dirty = defaultdict(set)
+    for node, key in rows:
+        key = json.loads(key) if isinstance(key, str) else key
+        dirty[node].add(tuple(key) if isinstance(key, list) else key)
+    return dirty
+
+
+def drain(graph, limit=DRAIN_BATCH_SIZE):
+    """Run the graph over the stored dirty keys, a batch at a time, until none are left. Returns the batches run."""
+    batches = 0
+    while True:
+        claimed = claim_dirty_keys(limit)
+        if not claimed:
+            return batches
+
+        dirty = {}
+        for name, keys in claimed.items():
+            if name not in graph.nodes:
+                logger.warning(f"[drain] Dropping {len(keys)} keys of unknown node {name}")
+                continue
+            decode = graph.nodes[name][1]
+            dirty[name] = {decode(key) for key in keys}
+
+        graph.run(dirty)
+        batches += 1
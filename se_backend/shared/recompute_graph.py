@@ -0,0 +1,64 @@
+"""
+The derived models and how they depend on each other:
+
+    attendance_metrics (user, period) -> attendance_summary (user, period) -> overtime_hours (user, period)
+        -> total_overtime (user, period) -> payroll (salary) -> payslip (payroll)
+    contributions (user), only marked inside deferred_recompute()
+
+A saved Attendance refreshes its own day's metrics inline and only marks the summary for aggregation;
+bulk writes mark attendance_metrics to rebuild whole periods. Receivers only mark the keys a change touches;
+the drain task recomputes them here, once per key, parents before children, each node in one batch across users.
+Periods taken into a Salary are not repriced, and payrolls that already have a payslip are not rewritten.
+"""
+from attendance.services import aggregate_period_summaries, recompute_period_metrics
+from attendance_summary.signals import recompute_overtime_hours
+from earnings.services import recompute_contributions
+from payroll.models import Payroll
+from payroll.tasks import generate_payrolls
+from payslip.tasks import generate_payslips
+from salary.models import Salary
+from totalovertime.services import recompute_total_overtime
+
+from .recompute import (
+    ATTENDANCE_METRICS,
+    ATTENDANCE_SUMMARY,
+    CONTRIBUTIONS,
+    OVERTIME_HOURS,
+    PAYROLL,
+    PAYSLIP,
+    TOTAL_OVERTIME,
+    RecomputeGraph,
+    id_key,
+)
+
+graph = RecomputeGraph()
+
+graph.node(ATTENDANCE_METRICS)(recompute_period_metrics)
+graph.node(ATTENDANCE_SUMMARY)(aggregate_period_summaries)
+graph.node(OVERTIME_HOURS)(recompute_overtime_hours)
+graph.node(TOTAL_OVERTIME)(recompute_total_overtime)
+graph.node(PAYROLL, decode=id_key)(generate_payrolls)
+graph.node(PAYSLIP, decode=id_key)(generate_payslips)
+graph.node(CONTRIBUTIONS, decode=id_key)(recompute_contributions)
+
+
+@graph.edge(ATTENDANCE_METRICS, ATTENDANCE_SUMMARY)
+@graph.edge(ATTENDANCE_SUMMARY, OVERTIME_HOURS)
+@graph.edge(OVERTIME_HOURS, TOTAL_OVERTIME)
+def same_period(keys):
+    return keys
+
+
+@graph.edge(TOTAL_OVERTIME, PAYROLL)
+def salaries_of_periods(keys):
+    # Salaries whose payroll already has a payslip are issued, generate_payrolls would skip them anyway
+    salaries = Salary.objects.filter(
+        overtime_id__user_id__in={user_id for user_id, _ in keys},
+        overtime_id__biweek_start__in={biweek_start for _, biweek_start in keys},
+    ).exclude(payroll__payslip__isnull=False).values_list('id', 'overtime_id__user_id', 'overtime_id__biweek_start')
+    return {salary_id for salary_id, user_id, biweek_start in salaries if (user_id, biweek_start) in keys}
+
+
+@graph.edge(PAYROLL, PAYSLIP)
+def payrolls_of_salaries(salary_ids):
+    return set(Payroll.objects.filter(salary_id__in=salary_ids).values_list('id', flat=True))
@@ -13,3 +13,17 @@ def send_resend_email(subject, recipient, html):
         "html": html,
     }
     resend.Emails.send(params)
+
+
+@shared_task
+def drain_recompute_queue():
+    """Recompute every dirty key of the derived models, node by node in dependency order."""
+    from django.core.cache import cache
+
+    from .recompute import DRAIN_PENDING_KEY, drain
+    from .recompute_graph import graph
+
+    # Clear the pending flag first so marks made while we drain queue a follow-up run
+    cache.delete(DRAIN_PENDING_KEY)
+    batches = drain(graph)
+    return f"Drained {batches} batches of dirty keys"
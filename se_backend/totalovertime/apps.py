@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TotalovertimeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'totalovertime'
+
+    def ready(self):
+        import totalovertime.signals
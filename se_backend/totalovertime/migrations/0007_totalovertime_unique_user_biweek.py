@@ -0,0 +1,43 @@
+# Generated by Django 4.2.5 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salary', '0001_initial'),
+        ('totalovertime', '0006_alter_totalovertime_total_overtime'),
+    ]
+
+    operations = [
+        # Rows entered by hand per period could repeat; point salaries at the first copy and drop the others
+        migrations.RunSQL(
+            sql="""
+                -- Check the foreign keys as rows go, so no deferred checks are pending when the table is altered
+                SET CONSTRAINTS ALL IMMEDIATE;
+
+                UPDATE salary_salary salary
+                SET overtime_id_id = copies.first_id
+                FROM (
+                    SELECT id, MIN(id) OVER (PARTITION BY user_id, biweek_start) AS first_id
+                    FROM totalovertime_totalovertime
+                    WHERE user_id IS NOT NULL AND biweek_start IS NOT NULL
+                ) copies
+                WHERE salary.overtime_id_id = copies.id AND copies.id <> copies.first_id;
+
+                DELETE FROM totalovertime_totalovertime duplicate
+                USING totalovertime_totalovertime original
+                WHERE duplicate.user_id = original.user_id
+                  AND duplicate.biweek_start = original.biweek_start
+                  AND duplicate.id > original.id;
+
+                SET CONSTRAINTS ALL DEFERRED;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='totalovertime',
+            constraint=models.UniqueConstraint(fields=('user', 'biweek_start'), name='unique_total_overtime_user_biweek'),
+        ),
+    ]
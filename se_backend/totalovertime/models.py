@@ -17,6 +17,11 @@ class TotalOvertime(models.Model):
     total_undertime = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     biweek_start = models.DateField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'biweek_start'], name='unique_total_overtime_user_biweek'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.total_overtime is None:
             self.total_overtime = (
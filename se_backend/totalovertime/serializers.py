@@ -4,4 +4,17 @@ from .models import TotalOvertime
 class TotalOvertimeSerializer(serializers.ModelSerializer):
     class Meta:
         model = TotalOvertime
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        # Both columns are nullable, so the (user, biweek_start) constraint is only checked in validate()
+        validators = []
+
+    def validate(self, attrs):
+        user = attrs.get('user', getattr(self.instance, 'user', None))
+        biweek_start = attrs.get('biweek_start', getattr(self.instance, 'biweek_start', None))
+        if user is not None and biweek_start is not None:
+            duplicates = TotalOvertime.objects.filter(user=user, biweek_start=biweek_start)
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError("TotalOvertime already exists for this user and biweek start.")
+        return attrs
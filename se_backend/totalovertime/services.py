@@ -0,0 +1,108 @@
+import logging
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import TotalOvertime
+from earnings.models import Earnings
+from overtimebase.models import OvertimeBase
+from overtimehours.models import OvertimeHours
+from shared.computations.overtime_computations import compute_hourly_rate, compute_overtime_amounts
+
+logger = logging.getLogger(__name__)
+
+TOTAL_OVERTIME_BATCH_SIZE = 1000
+
+HOUR_FIELDS = ('regularot', 'regularholiday', 'specialholiday', 'restday', 'nightdiff', 'backwage', 'late', 'undertime')
+
+
+def get_hourly_rates(user_ids):
+    """Hourly rate of each user from their latest OvertimeBase and Earnings, in one DISTINCT ON query each."""
+    bases = dict(
+        OvertimeBase.objects.filter(user_id__in=user_ids).order_by('user_id', '-id').distinct('user_id')
+        .values_list('user_id', 'backwage_base')
+    )
+    basic_rates = dict(
+        Earnings.objects.filter(user_id__in=user_ids).order_by('user_id', '-id').distinct('user_id')
+        .values_list('user_id', 'basic_rate')
+    )
+    return {user_id: compute_hourly_rate(bases.get(user_id), basic_rates.get(user_id)) for user_id in user_ids}
+
+
+def update_total_overtime(biweek_starts, user_ids=None, keys=None):
+    """
+    Price the OvertimeHours of the given periods into TotalOvertime, for every user or only the given ones,
+    or only for the given (user_id, biweek_start) keys.
+    Hours are summed per (user, biweek_start) in one query, rates are read in two, and the amounts are written
+    with a bulk upsert on (user, biweek_start), so existing rows keep their ids and the salaries pointing at them.
+    Returns the number of TotalOvertime rows written.
+    """
+    hours = OvertimeHours.objects.filter(biweek_start__in=biweek_starts, user__isnull=False)
+    if user_ids is not None:
+        hours = hours.filter(user_id__in=user_ids)
+    totals = list(hours.values('user_id', 'biweek_start').annotate(**{field: Sum(field) for field in HOUR_FIELDS}).order_by())
+    if keys is not None:
+        totals = [row for row in totals if (row['user_id'], row['biweek_start']) in keys]
+    if not totals:
+        return 0
+
+    rates = get_hourly_rates({row['user_id'] for row in totals})
+    rows = [
+        TotalOvertime(
+            user_id=row['user_id'],
+            biweek_start=row['biweek_start'],
+            **compute_overtime_amounts(row, rates[row['user_id']], settings.OVERTIME_MULTIPLIERS),
+        )
+        for row in totals
+    ]
+    TotalOvertime.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'biweek_start'],
+        update_fields=[
+            'total_regularot', 'total_regularholiday', 'total_specialholiday', 'total_restday', 'total_nightdiff',
+            'total_backwage', 'total_overtime', 'total_late', 'total_undertime',
+        ],
+        batch_size=TOTAL_OVERTIME_BATCH_SIZE,
+    )
+
+    logger.info(f"[update_total_overtime] {len(rows)} TotalOvertime rows priced for periods {sorted(set(biweek_starts))}")
+    return len(rows)
+
+
+def get_unpaid_biweek_starts(user_id):
+    """Periods of a user with OvertimeHours whose TotalOvertime has not been taken into a Salary yet."""
+    paid = TotalOvertime.objects.filter(user_id=user_id, salary__isnull=False).values('biweek_start')
+    return list(
+        OvertimeHours.objects.filter(user_id=user_id, biweek_start__isnull=False).exclude(biweek_start__in=paid)
+        .order_by('biweek_start').values_list('biweek_start', flat=True).distinct()
+    )
+
+
+def get_paid_keys(keys):
+    """The (user_id, biweek_start) keys whose TotalOvertime has already been taken into a Salary."""
+    paid = TotalOvertime.objects.filter(
+        user_id__in={user_id for user_id, _ in keys},
+        biweek_start__in={biweek_start for _, biweek_start in keys},
+        salary__isnull=False,
+    ).values_list('user_id', 'biweek_start')
+    return set(paid) & set(keys)
+
+
+def recompute_total_overtime(keys):
+    """
+    Recompute node of the TotalOvertime of the (user_id, biweek_start) keys, batched across users.
+    Like a rate change, it only reprices periods that have not been paid yet.
+    """
+    keys = set(keys)
+    paid = get_paid_keys(keys)
+    if paid:
+        logger.info(f"[recompute_total_overtime] Skipping {len(paid)} periods already taken into a Salary")
+    keys -= paid
+    if not keys:
+        return 0
+    return update_total_overtime(
+        {biweek_start for _, biweek_start in keys},
+        user_ids={user_id for user_id, _ in keys},
+        keys=keys,
+    )
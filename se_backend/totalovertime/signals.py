@@ -0,0 +1,25 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .services import get_unpaid_biweek_starts
+from earnings.models import Earnings
+from overtimebase.models import OvertimeBase
+from shared.recompute import TOTAL_OVERTIME, mark_dirty
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=Earnings)
+@receiver([post_save, post_delete], sender=OvertimeBase)
+def reprice_total_overtime_on_rate_change(sender, instance, **kwargs):
+    """
+    Signal triggered when the basic rate or backwage base of a user changes.
+    Marks the user's TotalOvertime of the periods not yet paid out for re-pricing.
+    """
+    if instance.user_id is None:
+        return
+    marked = mark_dirty(TOTAL_OVERTIME, {(instance.user_id, start) for start in get_unpaid_biweek_starts(instance.user_id)})
+    logger.info(f"[reprice_total_overtime_on_rate_change] {sender.__name__} changed for User {instance.user_id}: "
+                f"{marked} TotalOvertime periods marked for re-pricing")
@@ -0,0 +1,15 @@
+import logging
+from datetime import date
+
+from celery import shared_task
+
+from .services import update_total_overtime
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def price_period_total_overtime(biweek_start):
+    """Price the TotalOvertime of every employee for one period, e.g. at period close."""
+    written = update_total_overtime([date.fromisoformat(biweek_start)])
+    return f"{written} TotalOvertime rows priced for period starting {biweek_start}"
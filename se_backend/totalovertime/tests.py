@@ -1,9 +1,27 @@
+from unittest import mock
+
 from django.test import TestCase
 from totalovertime.models import TotalOvertime
 from users.models import CustomUser
-from datetime import date
+from datetime import date, time
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.test import override_settings
+
+from attendance.models import Attendance
+from attendance_summary.models import AttendanceSummary
+from earnings.models import Earnings
+from overtimebase.models import OvertimeBase
+from overtimehours.models import OvertimeHours
+from payroll.models import Payroll
+from payslip.models import Payslip
+from salary.models import Salary
+from shared.computations.overtime_computations import compute_hourly_rate
+from attendance_summary.tests import drain_inline
+from shared.recompute_graph import graph
+from totalovertime.services import update_total_overtime
+
 class TotalOvertimeModelTestCase(TestCase):
 
     def setUp(self):
@@ -65,4 +83,118 @@ class TotalOvertimeModelTestCase(TestCase):
     def test_delete_total_overtime(self):
         """Test deleting a TotalOvertime instance"""
         self.total_overtime.delete()
-        self.assertEqual(TotalOvertime.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(TotalOvertime.objects.count(), 0)
+
+
+MULTIPLIERS = {
+    "regularot": Decimal("1.25"),
+    "restday": Decimal("1.30"),
+    "regularholiday": Decimal("2.00"),
+    "specialholiday": Decimal("1.30"),
+    "nightdiff": Decimal("0.10"),
+    "backwage": Decimal("1.00"),
+}
+
+
+@override_settings(OVERTIME_MULTIPLIERS=MULTIPLIERS)
+class TotalOvertimeEngineTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        drain_inline(self)
+        self.users = [
+            CustomUser.objects.create_user(email=f"rates{number}@example.com", password="password", role="employee")
+            for number in range(2)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                for day in (date(2025, 4, 1), date(2025, 4, 16)):
+                    attendance = Attendance.objects.create(user=user, date=day, status="Present",
+                                                           check_in_time=time(9, 0), check_out_time=time(18, 0))
+                    AttendanceSummary.objects.create(user_id=user, attendance_id=attendance, date=day, actual_hours=80,
+                                                     overtime_hours=4, late_minutes=30, undertime=1, regularholiday=8)
+
+    def test_hourly_rate_prefers_overtime_base(self):
+        self.assertEqual(compute_hourly_rate(Decimal("800"), Decimal("20000")), Decimal("100"))
+        self.assertEqual(compute_hourly_rate(None, Decimal("8700")), Decimal("100"))
+        self.assertEqual(compute_hourly_rate(None, None), Decimal("0"))
+
+    def test_period_is_priced_in_one_batch(self):
+        OvertimeBase.objects.create(user=self.users[0], backwage_base=Decimal("800"))
+        OvertimeBase.objects.create(user=self.users[1], backwage_base=Decimal("1600"))
+        TotalOvertime.objects.all().delete()
+
+        with self.assertNumQueries(4):
+            written = update_total_overtime([date(2025, 4, 1)])
+
+        self.assertEqual(written, 2)
+        total = TotalOvertime.objects.get(user=self.users[0], biweek_start=date(2025, 4, 1))
+        # 4 OT hours at 125% and 8 regular holiday hours at 200% of 100/hour; 30 late minutes and 1 undertime hour
+        self.assertEqual(total.total_regularot, Decimal("500.00"))
+        self.assertEqual(total.total_regularholiday, Decimal("1600.00"))
+        self.assertEqual(total.total_overtime, Decimal("2100.00"))
+        self.assertEqual((total.total_late, total.total_undertime), (Decimal("50.00"), Decimal("100.00")))
+        self.assertEqual(
+            TotalOvertime.objects.get(user=self.users[1], biweek_start=date(2025, 4, 1)).total_overtime,
+            Decimal("4200.00"),
+        )
+
+    def test_rate_change_reprices_only_unpaid_periods(self):
+        user = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Earnings.objects.create(user=user, basic_rate=Decimal("8700"))
+        paid = TotalOvertime.objects.get(user=user, biweek_start=date(2025, 4, 1))
+        Salary.objects.create(user_id=user, overtime_id=paid, pay_date=date(2025, 4, 15))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OvertimeBase.objects.create(user=user, backwage_base=Decimal("1600"))
+
+        paid.refresh_from_db()
+        self.assertEqual(paid.total_overtime, Decimal("2100.00"))
+        self.assertEqual(
+            TotalOvertime.objects.get(user=user, biweek_start=date(2025, 4, 16)).total_overtime,
+            Decimal("4200.00"),
+        )
+
+    def test_summary_change_recomputes_each_node_once(self):
+        user = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Earnings.objects.create(user=user, basic_rate=Decimal("8700"))
+
+        runs = []
+        run = graph.run
+        with mock.patch.object(graph, "run", side_effect=lambda dirty: runs.append(run(dirty)) or runs[-1]):
+            with self.captureOnCommitCallbacks(execute=True):
+                summary = AttendanceSummary.objects.get(user_id=user, date=date(2025, 4, 1))
+                summary.overtime_hours = 6
+                summary.save()
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(list(runs[0]), ["overtime_hours", "total_overtime"])
+        self.assertTrue(all(count == 1 for count, _ in runs[0].values()))
+        self.assertEqual(
+            TotalOvertime.objects.get(user=user, biweek_start=date(2025, 4, 1)).total_regularot, Decimal("750.00"),
+        )
+
+    def test_summary_change_leaves_paid_periods_and_issued_payrolls(self):
+        user = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Earnings.objects.create(user=user, basic_rate=Decimal("8700"))
+        with self.captureOnCommitCallbacks(execute=True):
+            salary = Salary.objects.create(user_id=user, pay_date=date(2025, 4, 15),
+                                           overtime_id=TotalOvertime.objects.get(user=user, biweek_start=date(2025, 4, 1)))
+        payroll = Payroll.objects.get(salary_id=salary)
+        self.assertEqual(Payslip.objects.filter(payroll_id=payroll).count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = AttendanceSummary.objects.get(user_id=user, date=date(2025, 4, 1))
+            summary.overtime_hours = 6
+            summary.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            salary.earnings_id = Earnings.objects.create(user=user, basic_rate=Decimal("17400"), allowance=0, ntax=0)
+            salary.save()
+
+        self.assertEqual(TotalOvertime.objects.get(id=salary.overtime_id_id).total_regularot, Decimal("500.00"))
+        refreshed = Payroll.objects.get(id=payroll.id)
+        self.assertEqual((refreshed.gross_pay, refreshed.net_pay), (payroll.gross_pay, payroll.net_pay))
+        self.assertEqual(Payslip.objects.filter(payroll_id=payroll).count(), 1)